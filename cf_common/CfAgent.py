@@ -0,0 +1,232 @@
+import json
+import logging
+import os
+import pathlib
+import socket
+import socketserver
+import threading
+
+log = logging.getLogger(__name__)
+
+# CfClient methods the agent runs for its clients
+client_methods = {
+    "get_test",
+    "fetch_test_template",
+    "post_test",
+    "update_test",
+    "list_tests",
+    "delete_test",
+    "get_queue",
+    "start_test",
+    "list_test_runs",
+    "get_test_run",
+    "fetch_test_run_statistics",
+    "stop_test",
+    "change_load",
+    "get_system_version",
+}
+# results kept for the lifetime of the agent, method to number of key arguments,
+# calls with more arguments, e.g. an outfile to write, are not cached
+cached_methods = {"fetch_test_template": 1, "get_system_version": 0}
+# agent methods that are not CfClient methods
+agent_methods = {"info", "clear_cache", "reconnect", "summary_reports", "shutdown"}
+
+
+class AgentResponse:
+    """Stands in for requests.Response returned by CfClient.delete_test"""
+
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+
+    def json(self):
+        return json.loads(self.text)
+
+    def __repr__(self):
+        return f"<Response [{self.status_code}]>"
+
+
+def encode_result(result):
+    if hasattr(result, "status_code") and hasattr(result, "text"):
+        return {"__response__": [result.status_code, result.text]}
+    return result
+
+
+def decode_result(result):
+    if isinstance(result, dict) and "__response__" in result:
+        return AgentResponse(*result["__response__"])
+    return result
+
+
+class AgentRequestHandler(socketserver.StreamRequestHandler):
+    # one JSON request and one JSON reply per line, many requests per connection
+    def handle(self):
+        for line in self.rfile:
+            reply = self.server.agent.call(json.loads(line))
+            self.wfile.write((json.dumps(reply, default=str) + "\n").encode())
+            self.wfile.flush()
+
+
+class AgentServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class CfAgent:
+    """Local agent holding a connected CfClient for the CLI scripts
+
+    Scripts connect with AgentClient over a Unix socket, so they do not log in to the
+    controller or import pandas on every run. Test templates and the controller
+    version are cached, summary reports are rendered in the agent.
+    """
+
+    def __init__(self, cf, socket_path):
+        self.cf = cf  # connected CfClient instance
+        self.socket_path = pathlib.Path(socket_path)
+        self.cache = {}
+        self.cache_lock = threading.Lock()
+        self.server = None
+
+    def info(self):
+        return {"controller_ip": self.cf.controller_ip, "pid": os.getpid()}
+
+    def clear_cache(self):
+        with self.cache_lock:
+            self.cache = {}
+
+    def reconnect(self):
+        self.cf.connect()
+        self.clear_cache()
+
+    @staticmethod
+    def summary_reports(report_csv_file, column_order, memory_budget,
+                        sub_report_tables, additional_reports, script_version,
+                        steady_states=None):
+        from cf_common.cf_functions import load_report, summary_reports
+
+        table = load_report(
+            pathlib.Path(report_csv_file), column_order, memory_budget, steady_states
+        )
+        report_files = summary_reports(
+            report_csv_file, table, sub_report_tables, additional_reports, script_version
+        )
+        return [str(f) for f in report_files]
+
+    def shutdown(self):
+        # shutdown waits for serve_forever, it can not run in a request thread
+        threading.Thread(target=self.server.shutdown).start()
+
+    def call(self, request):
+        """Runs one request
+
+        :param request: dict with method, args and kwargs keys
+        :return: dict with result, error and exception_state keys
+        """
+        method = request.get("method")
+        args = request.get("args", [])
+        kwargs = request.get("kwargs", {})
+        reply = {"result": None, "error": None, "exception_state": True}
+        try:
+            if method in agent_methods:
+                result = getattr(self, method)(*args, **kwargs)
+            elif method in client_methods:
+                result = self.call_client(method, args, kwargs)
+                reply["exception_state"] = self.cf.exception_state
+            else:
+                reply["error"] = f"unknown method: {method}"
+                return reply
+        except SystemExit:
+            # CfClient exits on request errors, details are printed and logged by the agent
+            reply["error"] = "exit"
+            reply["exception_state"] = False
+            return reply
+        except Exception as detailed_exception:
+            log.error(f"Agent request {method} failed: \n<{detailed_exception}>")
+            reply["error"] = repr(detailed_exception)
+            return reply
+        reply["result"] = encode_result(result)
+        return reply
+
+    def call_client(self, method, args, kwargs):
+        if method not in cached_methods or kwargs or len(args) > cached_methods[method]:
+            return getattr(self.cf, method)(*args, **kwargs)
+        key = json.dumps([method, args])
+        with self.cache_lock:
+            if key in self.cache:
+                return self.cache[key]
+        result = getattr(self.cf, method)(*args, **kwargs)
+        if self.cf.exception_state:
+            with self.cache_lock:
+                self.cache[key] = result
+        return result
+
+    def serve(self):
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+        self.server = AgentServer(str(self.socket_path), AgentRequestHandler)
+        self.server.agent = self
+        # only the user running the agent can use its controller session
+        os.chmod(self.socket_path, 0o600)
+        print(f"Agent listening on {self.socket_path}")
+        log.info(f"Agent listening on {self.socket_path}")
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            if self.socket_path.exists():
+                self.socket_path.unlink()
+
+
+class AgentClient:
+    """CfClient stand in that sends the requests to a running CfAgent
+
+    Each thread has its own connection, so it can be used from a pool of workers.
+    """
+
+    def __init__(self, socket_path):
+        self.socket_path = str(socket_path)
+        self.__local = threading.local()
+        info = self.call("info")
+        self.controller_ip = info["controller_ip"]
+
+    @property
+    def exception_state(self):
+        return getattr(self.__local, "exception_state", True)
+
+    @exception_state.setter
+    def exception_state(self, state):
+        self.__local.exception_state = state
+
+    def connection(self):
+        conn = getattr(self.__local, "conn", None)
+        if conn is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.connect(self.socket_path)
+            conn = sock.makefile("rwb")
+            self.__local.conn = conn
+        return conn
+
+    def call(self, method, *args, **kwargs):
+        conn = self.connection()
+        request = {"method": method, "args": list(args), "kwargs": kwargs}
+        conn.write((json.dumps(request, default=str) + "\n").encode())
+        conn.flush()
+        line = conn.readline()
+        if not line:
+            raise ConnectionError(f"agent closed the connection: {self.socket_path}")
+        reply = json.loads(line)
+        self.exception_state = reply["exception_state"]
+        if reply["error"] == "exit":
+            print(f"{method} request failed, see the agent output")
+            raise SystemExit(1)
+        if reply["error"] is not None:
+            raise RuntimeError(f"agent {method} failed: {reply['error']}")
+        return decode_result(reply["result"])
+
+    def connect(self):
+        # the agent is already connected to the controller
+        pass
+
+    def __getattr__(self, name):
+        if name in client_methods or name in agent_methods:
+            return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+        raise AttributeError(name)
@@ -0,0 +1,543 @@
+"""Benchmarks of the per tick and report hot paths
+
+Every benchmark is a function taking a BenchmarkContext and returning a list of
+results, one dict per measurement with name, seconds (best time per operation),
+median, operations and rows keys. Synthetic data is made from a simulated test,
+no controller is needed.
+
+Results are saved as JSON and compared with a baseline of earlier clean runs of
+the same machine, see previous_results and compare_results.
+"""
+import copy
+import csv
+import itertools
+import json
+import logging
+import os
+import pathlib
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from cf_common.CfReplay import ReplayResults
+from cf_common.CfRunTest import (
+    DetailedCsvReport,
+    RollingStats,
+    detailed_report_schema,
+    script_version,
+)
+
+log = logging.getLogger(__name__)
+
+# run_tests.csv row of the simulated test the synthetic data is made from
+benchmark_test_details = {
+    "name": "B01-HTTP-TPUT",
+    "id": "benchmark",
+    "type": "http_throughput",
+    "run": "Y",
+    "run_order": "1",
+    "goal_seek": "Y",
+    "ramp_seek": "N",
+    "ramp_kpi": "cps",
+    "ramp_value": "1000",
+    "ramp_step": "5",
+    "duration": "1800",
+    "startup": "5",
+    "rampup": "10",
+    "rampdown": "10",
+    "shutdown": "10",
+    "sustain_period": "30",
+    "kpi_1": "tps",
+    "kpi_2": "cps",
+    "kpi_and_or": "OR",
+    "load_type": "simusers",
+    "start_load": "5",
+    "incr_low": "5",
+    "incr_med": "3",
+    "incr_high": "2",
+    "low_threshold": "20",
+    "med_threshold": "5",
+    "high_threshold": "1",
+    "variance_sample_size": "3",
+    "max_variance": "0.03",
+    "capacity_adj": "auto",
+    "ramp_low": "40",
+    "ramp_med": "30",
+    "ramp_high": "20",
+    "living_simusers_max": "none",
+}
+
+# modules the library must import without, see import_time
+heavy_modules = ["pandas", "numpy", "jinja2"]
+
+
+class SampleResults(ReplayResults):
+    """Result file keeping the detailed report rows and statistics payloads"""
+
+    def __init__(self):
+        super().__init__()
+        self.statistics = []
+
+    def add_raw(self, kind, test_id, run_id, name, data):
+        if kind == "statistics":
+            self.statistics.append(data)
+
+
+class BenchmarkContext:
+    """Settings and synthetic data shared by the benchmarks
+
+    The simulated test is run once, detailed report files are generated on first
+    use in work_dir and removed by close().
+    """
+
+    def __init__(self, column_order, report_rows, matrix_rows, repeat=5,
+                 memory_budget=256000000, report_tables=None, work_dir=None):
+        self.column_order = column_order
+        self.report_rows = report_rows
+        self.matrix_rows = matrix_rows
+        self.repeat = max(int(repeat), 1)
+        self.memory_budget = memory_budget
+        self.report_tables = report_tables or [None]
+        self.temp_dir = None
+        if work_dir is None:
+            self.temp_dir = tempfile.TemporaryDirectory(prefix="cf_benchmark_")
+            work_dir = self.temp_dir.name
+        self.work_dir = pathlib.Path(work_dir)
+        self.detailed_files = {}
+        self._samples = None
+
+    @property
+    def samples(self):
+        if self._samples is None:
+            from cf_common.CfSimulator import simulate_test
+
+            self._samples = SampleResults()
+            self.run_test = simulate_test(dict(benchmark_test_details), self._samples)
+        return self._samples
+
+    def detailed_file(self, rows):
+        """Detailed csv file of rows lines, the simulated test repeated under other names"""
+        if rows not in self.detailed_files:
+            test_rows = self.samples.rows
+            report_csv_file = self.work_dir / f"benchmark_{rows}_Detailed.csv"
+            with open(report_csv_file, "w", newline="") as f:
+                writer = csv.writer(f, lineterminator="\n")
+                writer.writerow(list(detailed_report_schema))
+                for i in range(rows):
+                    row = list(test_rows[i % len(test_rows)])
+                    row[0] = f"T{i // len(test_rows):05d}-{row[0]}"
+                    writer.writerow(row)
+            self.detailed_files[rows] = report_csv_file
+        return self.detailed_files[rows]
+
+    def close(self):
+        if self.temp_dir is not None:
+            self.temp_dir.cleanup()
+            self.temp_dir = None
+
+
+def measure(func, operations=1, repeat=5):
+    """Times func, called repeat times
+
+    :param func: callable doing operations operations per call
+    :return: tuple of best and median seconds per operation
+    """
+    times = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) / operations)
+    return min(times), statistics.median(times)
+
+
+def result(name, best, median, operations, rows=None, failed=None):
+    """Result dict of a benchmark
+
+    :param operations: operations per timed call, seconds are per operation
+    :param rows: rows of the input, None if it has none
+    :param failed: reason the benchmark failed its check, counted as a regression
+    """
+    return {
+        "name": name,
+        "seconds": best,
+        "median": median,
+        "operations": operations,
+        "rows": rows,
+        "failed": failed,
+    }
+
+
+def rolling_stats(context):
+    """RollingStats.update and check_if_stable per sample"""
+    values = [row[6] for row in context.samples.rows] * 20
+    stats = RollingStats(3, 0)
+
+    def run():
+        for value in values:
+            stats.update(value)
+            stats.check_if_stable(0.03)
+
+    timing = measure(run, len(values), context.repeat)
+    return [result("rolling_stats", *timing, operations=len(values))]
+
+
+def client_stats(context):
+    """update_client_stats, decoding a statistics payload and assign_client_run_stats"""
+    payloads = context.samples.statistics
+    rt = context.run_test
+
+    def run():
+        for payload in payloads:
+            rt.update_client_stats(payload)
+
+    timing = measure(run, len(payloads), context.repeat)
+    return [result("client_stats", *timing, operations=len(payloads))]
+
+
+def append_file(context):
+    """DetailedCsvReport.append_file per line for each flush policy"""
+    rows = context.samples.rows
+    results = []
+    for flush_policy in ["tick", "interval", "phase"]:
+        report_dir = context.work_dir / f"append_{flush_policy}"
+        report_dir.mkdir(exist_ok=True)
+        detailed_report = DetailedCsvReport(report_dir, flush_policy=flush_policy)
+        detailed_report.append_columns()
+
+        def run():
+            for row in rows:
+                detailed_report.append_file(row)
+
+        timing = measure(run, len(rows), context.repeat)
+        detailed_report.close()
+        results.append(
+            result(f"append_file_{flush_policy}", *timing, operations=len(rows), rows=len(rows))
+        )
+    return results
+
+
+def report(context):
+    """Report construction and html rendering of synthetic detailed files"""
+    from cf_common.CfReport import Report
+    from cf_common.cf_functions import html_reports
+
+    results = []
+    for rows in context.report_rows:
+        report_csv_file = context.detailed_file(rows)
+        # large files are timed once
+        repeat = context.repeat if rows <= 100000 else 1
+        tables = []
+
+        def run_report():
+            tables[:] = [Report(report_csv_file, context.column_order, context.memory_budget)]
+
+        timing = measure(run_report, 1, repeat)
+        results.append(result(f"report_{rows}", *timing, operations=1, rows=rows))
+        html_report_file = context.work_dir / f"benchmark_{rows}.html"
+
+        def run_html():
+            html_reports(
+                tables[-1], context.report_tables, {html_report_file: None}, script_version
+            )
+
+        timing = measure(run_html, 1, repeat)
+        results.append(result(f"html_report_{rows}", *timing, operations=1, rows=rows))
+    return results
+
+
+def synthetic_template():
+    """Test template with every setting create_tests changes"""
+    return {
+        "config": {
+            "protocol": {
+                "method": "GET",
+                "bodySizeInBytes": 0,
+                "port": 80,
+                "connectionTermination": "RST",
+                "connection": {"type": "separate"},
+                "keepAlive": {"enabled": False, "count": 1, "delayTime": 0, "delayTimeUnit": "sec"},
+                "responseBodyType": {"type": "fixed", "config": {"type": "default", "bytes": 1}},
+                "supplemental": {
+                    "sslTls": {
+                        "enabled": False,
+                        "tlsv12": True,
+                        "tlsv13": False,
+                        "bytes": 16383,
+                        "certificate": "prime256v1",
+                        "ciphers": [],
+                        "supportedGroups": {"secp256r1": True, "secp384r1": False, "x25519": False},
+                        "signatureHashAlgorithmsList": [],
+                        "payloadEncryptionOffload": False,
+                    }
+                },
+            },
+            "loadSpecification": {"type": "SimUsers", "duration": 1800, "constraints": {}},
+        }
+    }
+
+
+def synthetic_base_test():
+    """Base test of create_tests with client and server network settings"""
+    network = {
+        "initialCongestionWindow": 10,
+        "receiveWindow": 65538,
+        "delayedAcks": {"bytes": 2920},
+        "retries": 3,
+        "inactivityTimer": 0,
+        "ipV4SegmentSize": 1460,
+        "ipV6SegmentSize": 1440,
+        "closeWithFin": False,
+    }
+    template = synthetic_template()
+    return {
+        "id": "benchmark-base",
+        "projectId": "benchmark",
+        "config": {
+            "queue": {"id": "benchmark"},
+            "debug": {},
+            "subnets": {"client": [], "server": []},
+            "criteria": {"enabled": True},
+            "networks": {"client": dict(network), "server": copy.deepcopy(network)},
+            "interfaces": {"client": [], "server": []},
+            "protocol": template["config"]["protocol"],
+            "virtualRouters": {},
+            "trafficPattern": "Pair",
+            "testType": "http_connections_per_second",
+            "loadSpecification": template["config"]["loadSpecification"],
+        },
+    }
+
+
+def synthetic_matrix(rows):
+    """create_tests matrix with at least rows rows"""
+    sizes = -(-rows // 8)
+    return {
+        "name": "B-{load}-{tls}-{object_size}",
+        "defaults": {
+            "delay_time": "0",
+            "delay_unit": "sec",
+            "object_type": "fixed-random",
+            "delayed_ack": "11680",
+            "rx_window": "65538",
+            "icw": "10",
+            "ipV4SegmentSize": "1460",
+            "ipV6SegmentSize": "1440",
+            "retries": "3",
+            "tls_record": "16383",
+            "payloadEncryptionOffload": "FALSE",
+            "http_method": "GET",
+            "post_size": "none",
+        },
+        "axes": {
+            "load": [
+                {"load": "CPS", "type": "http_connections_per_second", "connection_type": "separate",
+                 "keep_alive": "FALSE", "transactions_connection": "1"},
+                {"load": "TPUT", "type": "http_throughput", "connection_type": "keepalive",
+                 "keep_alive": "TRUE", "transactions_connection": "10"},
+            ],
+            "tls": [
+                {"tls": "NONE", "sslTls": "FALSE", "tls_version": "none", "certificate": "none",
+                 "ciphers": "none", "supportedGroups": "none", "signature_hash": "none"},
+                {"tls": "EC-DSA256", "sslTls": "TRUE", "tls_version": "tlsv12",
+                 "certificate": "prime256v1", "ciphers": "ECDHE-ECDSA-AES128-GCM-SHA256",
+                 "supportedGroups": "secp256r1", "signature_hash": "ECDSA_SECP256R1_SHA256"},
+                {"tls": "EC-DSA384", "sslTls": "TRUE", "tls_version": "tlsv13",
+                 "certificate": "secp384r1", "ciphers": "TLS_AES_256_GCM_SHA384",
+                 "supportedGroups": "secp384r1", "signature_hash": "ECDSA_SECP384R1_SHA384"},
+                {"tls": "RSA2048", "sslTls": "TRUE", "tls_version": "tlsv12",
+                 "certificate": "rsa2048", "ciphers": "AES128-GCM-SHA256",
+                 "supportedGroups": "x25519", "signature_hash": "RSA_PKCS1_SHA256"},
+            ],
+            "object_size": [str(1000 + i) for i in range(sizes)],
+        },
+    }
+
+
+def create_tests(context):
+    """CfCreateTest.update_config_changes per row of generated matrices"""
+    from cf_common.CfCreateTest import CfCreateTest
+    from cf_common.CfTestMatrix import TestMatrix
+
+    base = synthetic_base_test()
+    template = synthetic_template()
+    results = []
+    for rows in context.matrix_rows:
+        matrix_file = context.work_dir / f"benchmark_{rows}_matrix.json"
+        with open(matrix_file, "w") as f:
+            json.dump(synthetic_matrix(rows), f)
+        tests = [
+            CfCreateTest(copy.deepcopy(base), row, copy.deepcopy(template), "20.0.0")
+            for row in itertools.islice(TestMatrix(matrix_file), rows)
+        ]
+
+        def run():
+            for test in tests:
+                test.update_config_changes()
+
+        timing = measure(run, rows, context.repeat)
+        # errors of the last run
+        errors = sum(len(test.errors) for test in tests)
+        failed = None
+        if errors:
+            failed = f"{errors} unapplied settings"
+            log.error(f"benchmark matrix of {rows} rows has {failed}")
+        results.append(
+            result(f"create_tests_{rows}", *timing, operations=rows, rows=rows, failed=failed)
+        )
+    return results
+
+
+def import_time(context, project_dir=None):
+    """Import time of the library modules in a new interpreter
+
+    The result fails if pandas, numpy or jinja2 are loaded.
+    """
+    project_dir = project_dir or pathlib.Path(__file__).absolute().parent.parent
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import cf_common.CfRunTest, cf_common.cf_functions, cf_common.CfCreateTest\n"
+        "seconds = time.perf_counter() - start\n"
+        f"print(seconds, *[m for m in {heavy_modules!r} if m in sys.modules])\n"
+    )
+    times = []
+    loaded = []
+    for i in range(context.repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=project_dir,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.split()
+        times.append(float(output[0]))
+        loaded = output[1:]
+    failed = None
+    if loaded:
+        failed = f"library imports load {', '.join(loaded)}"
+        log.error(failed)
+    import_result = result(
+        "import_time", min(times), statistics.median(times), operations=1, failed=failed
+    )
+    import_result["heavy_modules"] = loaded
+    return [import_result]
+
+
+benchmarks = {
+    "rolling_stats": rolling_stats,
+    "client_stats": client_stats,
+    "append_file": append_file,
+    "report": report,
+    "create_tests": create_tests,
+    "import_time": import_time,
+}
+
+
+def run_benchmarks(context, names=None):
+    """Runs the benchmarks
+
+    :param names: benchmark names, see benchmarks, None for all
+    :return: list of result dicts
+    """
+    results = []
+    for name, benchmark in benchmarks.items():
+        if names is not None and name not in names:
+            continue
+        log.info(f"benchmark {name}")
+        for benchmark_result in benchmark(context):
+            log.info(f"benchmark result {benchmark_result}")
+            results.append(benchmark_result)
+    return results
+
+
+def benchmark_file(benchmark_dir):
+    return benchmark_dir / f"{time.strftime('%Y%m%d-%H%M%S')}_Benchmark.json"
+
+
+def save_results(results, benchmark_dir, regressions=None):
+    """Saves results with the machine they were measured on
+
+    :param regressions: names of regressed benchmarks, see compare_results
+    :return: pathlib.Path of the JSON file
+    """
+    results_file = benchmark_file(benchmark_dir)
+    with open(results_file, "w") as f:
+        json.dump(
+            {
+                "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "version": script_version,
+                "machine": machine(),
+                "regressions": regressions or [],
+                "results": results,
+            },
+            f,
+            indent=4,
+        )
+    return results_file
+
+
+def machine():
+    return {
+        "node": platform.node(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def previous_results(benchmark_dir, runs=5):
+    """Baseline of this machine, the median time of the last clean runs
+
+    Runs with regressions or failed results are saved but left out of the baseline,
+    a slowdown does not become the baseline of the next run, and a slowdown spread
+    over several runs is still caught against the median of the earlier runs.
+
+    :param runs: clean runs of each benchmark in the median
+    :return: dict of benchmark name to result dict, empty if none were saved
+    """
+    times = {}
+    for results_file in sorted(benchmark_dir.glob("*_Benchmark.json"), reverse=True):
+        try:
+            with open(results_file, "r") as f:
+                saved = json.load(f)
+        except ValueError as detailed_exception:
+            log.error(f"Ignoring benchmark results {results_file}: \n<{detailed_exception}>")
+            continue
+        if saved.get("machine") != machine() or saved.get("regressions"):
+            continue
+        if any(r.get("failed") for r in saved["results"]):
+            continue
+        for r in saved["results"]:
+            name_times = times.setdefault(r["name"], [])
+            if len(name_times) < runs:
+                name_times.append(r["seconds"])
+    return {
+        name: {"name": name, "seconds": statistics.median(name_times), "runs": len(name_times)}
+        for name, name_times in times.items()
+    }
+
+
+def compare_results(results, previous, tolerance=0.2):
+    """Adds the change against the baseline, see previous_results
+
+    A benchmark regressed when its best time is more than tolerance slower, or when
+    it failed its check.
+
+    :return: list of names of regressed benchmarks
+    """
+    regressions = []
+    for benchmark_result in results:
+        if benchmark_result.get("failed"):
+            regressions.append(benchmark_result["name"])
+        before = previous.get(benchmark_result["name"])
+        if before is None or not before["seconds"]:
+            benchmark_result["change"] = None
+            continue
+        change = benchmark_result["seconds"] / before["seconds"] - 1
+        benchmark_result["change"] = change
+        if change > tolerance and benchmark_result["name"] not in regressions:
+            regressions.append(benchmark_result["name"])
+    return regressions
@@ -2,35 +2,48 @@ import requests
 import json
 import logging
 import sys
+import threading
+from cf_common.CfLogging import LazyJson
 from requests.packages.urllib3.exceptions import InsecureRequestWarning
 from requests.adapters import HTTPAdapter
 from requests.packages.urllib3.util.retry import Retry
 
 requests.packages.urllib3.disable_warnings(InsecureRequestWarning)
 
-fmt_str = "[%(asctime)s] %(levelname)s %(lineno)d: %(message)s"
-logging.basicConfig(
-    filename="cf.log", filemode="w", level=logging.DEBUG, format=fmt_str
-)
 log = logging.getLogger(__name__)
-log.debug("start logging")
 
 
 class CfClient:
-    def __init__(self, controller_ip, username, password, verify_ssl):
+    def __init__(self, controller_ip, username, password, verify_ssl, pool_size=10,
+                 scheme="https"):
         log.debug("Initializing a new object of the CfClient class.")
+        self.__local = threading.local()
         self.log = logging.getLogger("requests.packages.urllib3")
         self.username = username
         self.password = password
         self.controller_ip = controller_ip
-        self.api = "https://" + self.controller_ip + "/api/v2"
+        self.api = scheme + "://" + self.controller_ip + "/api/v2"
         self.__session = requests.session()
         self.__session.verify = verify_ssl
         self.exception_state = True
         retries = Retry(
             total=5, backoff_factor=1, status_forcelist=[422, 500, 502, 503, 504]
         )
-        self.__session.mount("https://", HTTPAdapter(max_retries=retries))
+        self.__session.mount(
+            scheme + "://",
+            HTTPAdapter(
+                max_retries=retries, pool_connections=pool_size, pool_maxsize=pool_size
+            ),
+        )
+
+    @property
+    def exception_state(self):
+        # per thread, requests can be sent from several threads at once
+        return getattr(self.__local, "exception_state", True)
+
+    @exception_state.setter
+    def exception_state(self, state):
+        self.__local.exception_state = state
 
     def connect(self):
         self.exception_state = True
@@ -55,7 +68,7 @@ class CfClient:
         if "token" in dict_response:
             self.__session.headers["Authorization"] = "Bearer " + dict_response["token"]
 
-    def get_test(self, test_type, test_id, outfile):
+    def get_test(self, test_type, test_id, outfile=None):
         self.exception_state = True
         try:
             response = self.__session.get(
@@ -72,11 +85,12 @@ class CfClient:
             self.requests_error_handler("other", err, None)
 
         dict_response = response.json()
-        with open(outfile, "w") as f:
-            json.dump(dict_response, f, indent=4)
+        if outfile is not None:
+            with open(outfile, "w") as f:
+                json.dump(dict_response, f, indent=4)
         return dict_response
 
-    def fetch_test_template(self, test_type, outfile):
+    def fetch_test_template(self, test_type, outfile=None):
         self.exception_state = True
         try:
             response = self.__session.get(
@@ -93,14 +107,28 @@ class CfClient:
             self.requests_error_handler("other", err, None)
 
         dict_response = response.json()
-        with open(outfile, "w") as f:
-            json.dump(dict_response, f, indent=4)
+        if outfile is not None:
+            with open(outfile, "w") as f:
+                json.dump(dict_response, f, indent=4)
         return dict_response
 
-    def post_test(self, test_type, infile):
+    @staticmethod
+    def load_payload(payload):
+        """Returns payload if it is a dict, otherwise loads it from the json file path"""
+        if isinstance(payload, dict):
+            return payload
+        with open(payload, "r") as f:
+            return json.load(f)
+
+    def post_test(self, test_type, test):
+        """Creates a test
+
+        :param test_type: test type, e.g. http_throughput
+        :param test: test config dict or path of a json file with the config
+        :return: response dict
+        """
         self.exception_state = True
-        with open(infile, "r") as f:
-            intest = json.load(f)
+        intest = self.load_payload(test)
         try:
             response = self.__session.post(
                 self.api + "/tests/" + test_type + "/", json=intest
@@ -119,11 +147,16 @@ class CfClient:
         dict_response = response.json()
         return dict_response
 
-    def update_test(self, test_type, test_id, infile):
+    def update_test(self, test_type, test_id, test):
+        """Updates a test
+
+        :param test_type: test type, e.g. http_throughput
+        :param test_id: id of the test to update
+        :param test: test config dict, can be partial, or path of a json file
+        :return: response dict
+        """
         self.exception_state = True
-        with open(infile, "r") as f:
-            intest = json.load(f)
-            print(intest)
+        intest = self.load_payload(test)
         try:
             response = self.__session.put(
                 self.api + "/tests/" + test_type + "/" + test_id, json=intest
@@ -141,6 +174,37 @@ class CfClient:
         dict_response = response.json()
         return dict_response
 
+    def list_tests(self, test_type=None):
+        """Lists tests on the controller
+
+        :param test_type: test type, e.g. http_throughput, None for all test types
+        :return: list of test dicts
+        """
+        self.exception_state = True
+        url = self.api + "/tests"
+        if test_type is not None:
+            url += "/" + test_type
+        try:
+            response = self.__session.get(url)
+            response.raise_for_status()
+        except requests.exceptions.HTTPError as errh:
+            self.requests_error_handler("http", errh, response)
+        except requests.exceptions.ConnectionError as errc:
+            self.requests_error_handler("connection", errc, None)
+        except requests.exceptions.Timeout as errt:
+            self.requests_error_handler("timeout", errt, None)
+        except requests.exceptions.RequestException as err:
+            self.requests_error_handler("other", err, None)
+        self.exception_continue_check()
+        dict_response = response.json()
+        if isinstance(dict_response, dict):
+            # paged responses keep the tests in a list value
+            for value in dict_response.values():
+                if isinstance(value, list):
+                    return value
+            return []
+        return dict_response
+
     def delete_test(self, test_type, test_id):
         self.exception_state = True
         try:
@@ -277,8 +341,9 @@ class CfClient:
             self.requests_error_handler("other", err, None)
         self.exception_continue_check()
         dict_response = response.json()
-        log.debug(f"change load: {load} > {json.dumps(dict_response, indent=4)}"
-                  f"response: {response}")
+        log.debug(
+            "change load: %s > %sresponse: %s", load, LazyJson(dict_response), response
+        )
         return dict_response
 
     def get_system_version(self):
@@ -0,0 +1,48 @@
+import time
+
+
+class SystemClock:
+    """Wall clock used by CfRunTest when running tests on a controller"""
+
+    @staticmethod
+    def time():
+        return time.time()
+
+    @staticmethod
+    def sleep(seconds):
+        time.sleep(seconds)
+
+
+class VirtualClock:
+    """Clock that moves only when sleep is called
+
+    Used to replay or simulate tests at CPU speed, sleep returns at once and
+    advances time by the requested seconds.
+    """
+
+    def __init__(self, start=0.0):
+        self.now = float(start)
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class ScaledClock:
+    """Wall clock running scale times faster
+
+    Used against a local stand in controller, a 1800 second test takes 30 seconds
+    with scale 60. Clocks with the same origin agree across processes.
+    """
+
+    def __init__(self, scale=1.0, origin=None):
+        self.scale = float(scale)
+        self.origin = time.time() if origin is None else origin
+
+    def time(self):
+        return self.origin + (time.time() - self.origin) * self.scale
+
+    def sleep(self, seconds):
+        time.sleep(seconds / self.scale)
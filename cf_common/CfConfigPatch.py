@@ -0,0 +1,300 @@
+"""Create tests CSV columns to test config mapping
+
+Each rule sets one JSON pointer path in the test config. Rules are applied in order.
+
+Rule keys:
+- path: JSON pointer in the complete test, {column} is replaced by the column value
+- value: constant value, or
+- column: CSV column with the value and type: coercion applied to it, or
+- base: JSON pointer in the base test to copy the value from
+- op: "set" (default) or "fill" to set all existing keys of the object at path to value
+- when: dict of column to value or list of values, compared case insensitive
+- unless: dict of column to value or list of values that skip the rule
+- when_set: list of columns that must not be "none"
+- if_exists: JSON pointer that must exist in the config, otherwise the rule is skipped
+- min_version: lowest CyberFlood version, same format as CfCreateTest.cf_version
+
+Rules are compiled once per CSV header and CyberFlood version into a PatchPlan.
+"""
+import copy
+
+mixed_distributions = [200, 6000, 8000, 9000, 10000, 25000, 26000, 35000, 59000, 347000]
+object_types = ["fixed", "fixed-random", "mixed", "mixed-random"]
+tls_path = "/config/protocol/supplemental/sslTls"
+
+config_patch_rules = [
+    # network settings
+    {"path": "/config/networks/client/initialCongestionWindow", "column": "icw", "type": "int"},
+    {"path": "/config/networks/client/receiveWindow", "column": "rx_window", "type": "int"},
+    {"path": "/config/networks/client/delayedAcks/bytes", "column": "delayed_ack", "type": "int"},
+    {"path": "/config/networks/client/retries", "column": "retries", "type": "int"},
+    {"path": "/config/networks/client/inactivityTimer", "value": 0},
+    {"path": "/config/networks/server/initialCongestionWindow", "column": "icw", "type": "int"},
+    {"path": "/config/networks/server/receiveWindow", "column": "rx_window", "type": "int"},
+    {"path": "/config/networks/server/delayedAcks/bytes", "column": "delayed_ack", "type": "int"},
+    {"path": "/config/networks/server/retries", "column": "retries", "type": "int"},
+    {"path": "/config/networks/server/inactivityTimer", "value": 0},
+    {"path": "/config/networks/client/ipV4SegmentSize", "column": "ipV4SegmentSize", "type": "int"},
+    {"path": "/config/networks/client/ipV6SegmentSize", "column": "ipV6SegmentSize", "type": "int"},
+    {"path": "/config/networks/server/ipV4SegmentSize", "column": "ipV4SegmentSize", "type": "int"},
+    {"path": "/config/networks/server/ipV6SegmentSize", "column": "ipV6SegmentSize", "type": "int"},
+    # criteria
+    {"path": "/config/criteria/enabled", "value": False},
+    # close tcp connections with fin
+    {"path": "/config/protocol/connectionTermination", "value": "FIN"},
+    {"path": "/config/networks/client/closeWithFin", "value": True},
+    # http method
+    {"path": "/config/protocol/method", "value": "POST",
+     "when": {"http_method": "post"}, "min_version": 19300001},
+    {"path": "/config/protocol/bodySizeInBytes", "column": "post_size", "type": "int",
+     "when": {"http_method": "post"}, "min_version": 19300001},
+    # object size
+    {"path": "/config/protocol/responseBodyType",
+     "value": {"type": "fixed", "config": {"type": "default"}},
+     "when": {"object_type": "fixed"}, "when_set": ["object_size"]},
+    {"path": "/config/protocol/responseBodyType",
+     "value": {"type": "fixed", "config": {"type": "random", "pseudoRandom": True}},
+     "when": {"object_type": "fixed-random"}, "when_set": ["object_size"]},
+    {"path": "/config/protocol/responseBodyType/config/length", "column": "object_size",
+     "type": "random_length", "when": {"object_type": "fixed-random"}, "when_set": ["object_size"]},
+    {"path": "/config/protocol/responseBodyType/config/bytes", "column": "object_size", "type": "int",
+     "when": {"object_type": ["fixed", "fixed-random"]}, "when_set": ["object_size"]},
+    {"path": "/config/protocol/responseBodyType",
+     "value": {"type": "mixed", "config": {"type": "default", "distributions": mixed_distributions}},
+     "when": {"object_type": "mixed"}, "when_set": ["object_size"]},
+    {"path": "/config/protocol/responseBodyType",
+     "value": {"type": "mixed", "config": {"type": "random", "pseudoRandom": True, "length": 16000,
+                                           "distributions": mixed_distributions}},
+     "when": {"object_type": "mixed-random"}, "when_set": ["object_size"]},
+    {"path": "/config/protocol/responseBodyType/config/bytes", "column": "object_size", "type": "int",
+     "unless": {"object_type": object_types}, "when_set": ["object_size"]},
+    # transactions
+    {"path": "/config/protocol/connection/type", "column": "connection_type", "type": "connection_type"},
+    {"path": "/config/protocol/keepAlive/enabled", "column": "keep_alive", "type": "bool"},
+    {"path": "/config/protocol/keepAlive/count", "column": "transactions_connection", "type": "int"},
+    {"path": "/config/protocol/keepAlive/delayTime", "column": "delay_time", "type": "int"},
+    {"path": "/config/protocol/keepAlive/delayTimeUnit", "column": "delay_unit"},
+    # tls
+    {"path": tls_path + "/enabled", "column": "sslTls", "type": "bool", "when_set": ["sslTls"]},
+    {"path": "/config/protocol/port", "value": 443, "when": {"sslTls": "true"}},
+    {"path": tls_path + "/tlsv12", "value": False,
+     "when": {"sslTls": "true"}, "when_set": ["tls_version"]},
+    {"path": tls_path + "/tlsv13", "value": False,
+     "when": {"sslTls": "true"}, "when_set": ["tls_version"]},
+    {"path": tls_path + "/{tls_version}", "value": True,
+     "when": {"sslTls": "true"}, "when_set": ["tls_version"]},
+    {"path": tls_path + "/bytes", "column": "tls_record", "type": "int",
+     "when": {"sslTls": "true"}, "when_set": ["tls_record"]},
+    {"path": tls_path + "/certificate", "base": tls_path + "/certificate",
+     "when": {"certificate": "custom"}, "when_set": ["sslTls"]},
+    {"path": tls_path + "/certificate", "column": "certificate",
+     "unless": {"certificate": "custom"}, "when_set": ["sslTls", "certificate"]},
+    {"path": tls_path + "/ciphers", "column": "ciphers", "type": "list",
+     "when_set": ["sslTls", "ciphers"]},
+    {"path": tls_path + "/supportedGroups", "op": "fill", "value": False,
+     "when_set": ["sslTls", "supportedGroups"], "if_exists": tls_path + "/supportedGroups",
+     "min_version": 19300000},
+    {"path": tls_path + "/supportedGroups/{supportedGroups}", "value": True,
+     "when_set": ["sslTls", "supportedGroups"], "if_exists": tls_path + "/supportedGroups",
+     "min_version": 19300000},
+    {"path": tls_path + "/signatureHashAlgorithmsList", "column": "signature_hash", "type": "list",
+     "when_set": ["sslTls", "signature_hash"], "min_version": 19300000},
+    {"path": tls_path + "/payloadEncryptionOffload", "column": "payloadEncryptionOffload",
+     "type": "bool", "when_set": ["sslTls"], "min_version": 19400000},
+]
+
+
+def chk_none(value):
+    if isinstance(value, str) and value.lower() in {"none"}:
+        return None
+    return value
+
+
+def to_bool(value):
+    if value.lower() in {"true"}:
+        return True
+    elif value.lower() in {"false"}:
+        return False
+    return value
+
+
+def to_list(value):
+    if isinstance(value, list):
+        return value
+    return [value]
+
+
+def to_connection_type(value):
+    if value.lower() in {"keepalive"}:
+        return "keepAlive"
+    elif value.lower() in {"separateconnections", "separate"}:
+        return "separateConnections"
+    return value
+
+
+def to_random_length(value):
+    return min(int(value), 16000)
+
+
+coercions = {
+    "int": int,
+    "str": str,
+    "bool": to_bool,
+    "list": to_list,
+    "connection_type": to_connection_type,
+    "random_length": to_random_length,
+}
+
+
+def parse_pointer(pointer):
+    if pointer == "":
+        return []
+    return [
+        token.replace("~1", "/").replace("~0", "~") for token in pointer.split("/")[1:]
+    ]
+
+
+def resolve_pointer(doc, tokens):
+    for token in tokens:
+        if isinstance(doc, list):
+            doc = doc[int(token)]
+        else:
+            doc = doc[token]
+    return doc
+
+
+def lower_set(values):
+    if not isinstance(values, list):
+        values = [values]
+    return {str(v).lower() for v in values}
+
+
+class PatchStep:
+    """One compiled rule"""
+
+    def __init__(self, rule):
+        self.path = rule["path"]
+        self.tokens = parse_pointer(rule["path"])
+        # tokens taken from a column, e.g. {tls_version}
+        self.token_columns = {
+            i: t[1:-1] for i, t in enumerate(self.tokens) if t.startswith("{") and t.endswith("}")
+        }
+        self.op = rule.get("op", "set")
+        self.has_value = "value" in rule
+        self.value = rule.get("value")
+        self.column = rule.get("column")
+        self.coerce = coercions[rule.get("type", "str")] if self.column else None
+        self.base_tokens = parse_pointer(rule["base"]) if "base" in rule else None
+        self.when = [(k, lower_set(v)) for k, v in rule.get("when", {}).items()]
+        self.unless = [(k, lower_set(v)) for k, v in rule.get("unless", {}).items()]
+        self.when_set = rule.get("when_set", [])
+        self.if_exists = parse_pointer(rule["if_exists"]) if "if_exists" in rule else None
+
+    def columns(self):
+        columns = set(self.when_set) | set(self.token_columns.values())
+        columns |= {k for k, v in self.when} | {k for k, v in self.unless}
+        if self.column:
+            columns.add(self.column)
+        return columns
+
+    def applies(self, values, config):
+        for column in self.when_set:
+            if values[column] is None:
+                return False
+        for column, match in self.when:
+            if values[column] is None or values[column].lower() not in match:
+                return False
+        for column, match in self.unless:
+            if values[column] is not None and values[column].lower() in match:
+                return False
+        if self.if_exists is not None:
+            try:
+                resolve_pointer(config, self.if_exists)
+            except (KeyError, IndexError, TypeError, ValueError):
+                return False
+        return True
+
+    def apply(self, config, values, base):
+        """Applies the step to config
+
+        :return: error message or None
+        """
+        if self.has_value:
+            value = copy.deepcopy(self.value)
+        elif self.base_tokens is not None:
+            try:
+                value = copy.deepcopy(resolve_pointer(base, self.base_tokens))
+            except (KeyError, IndexError, TypeError, ValueError) as e:
+                return f"{self.path}: base test has no value at {e}"
+        else:
+            value = values[self.column]
+            if value is None:
+                return f"{self.column}: no value for {self.path}"
+            try:
+                value = self.coerce(value)
+            except (TypeError, ValueError) as e:
+                return f"{self.column}: {e}"
+        tokens = list(self.tokens)
+        for i, column in self.token_columns.items():
+            tokens[i] = values[column]
+        try:
+            parent = resolve_pointer(config, tokens[:-1])
+            if self.op == "fill":
+                target = parent[tokens[-1]]
+                for k in target:
+                    target[k] = copy.deepcopy(value)
+            elif isinstance(parent, list):
+                parent[int(tokens[-1])] = value
+            else:
+                parent[tokens[-1]] = value
+        except (KeyError, IndexError, TypeError, ValueError) as e:
+            return f"{self.path}: unable to set, {e!r} not found"
+        return None
+
+
+class PatchPlan:
+    """Rules compiled for one CSV header and CyberFlood version"""
+
+    def __init__(self, header, cf_version, rules=None):
+        if rules is None:
+            rules = config_patch_rules
+        self.header = set(header)
+        self.steps = []
+        self.errors = []
+        for rule in rules:
+            if cf_version < rule.get("min_version", 0):
+                continue
+            step = PatchStep(rule)
+            missing = step.columns() - self.header
+            if missing:
+                self.errors.append(f"{step.path}: missing column(s) {sorted(missing)}")
+                continue
+            self.steps.append(step)
+
+    def apply(self, config, row, base=None):
+        """Applies all rules to config in place
+
+        :param config: complete test config
+        :param row: create tests CSV row
+        :param base: base test config for rules copying from the base test
+        :return: list of error messages, empty if all rules applied
+        """
+        values = {k: chk_none(v) for k, v in row.items()}
+        errors = list(self.errors)
+        for step in self.steps:
+            if step.applies(values, config):
+                error = step.apply(config, values, base)
+                if error is not None:
+                    errors.append(error)
+        return errors
+
+
+plan_cache = {}
+
+
+def compile_patch_plan(header, cf_version):
+    """Returns the PatchPlan for a CSV header and CyberFlood version, compiled once"""
+    key = (tuple(header), cf_version)
+    if key not in plan_cache:
+        plan_cache[key] = PatchPlan(header, cf_version)
+    return plan_cache[key]
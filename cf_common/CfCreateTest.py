@@ -1,9 +1,17 @@
+import bisect
+import collections
+import copy
 import json
 import logging
+import os
 import pathlib
 import csv
+from concurrent.futures import ThreadPoolExecutor
 
 from cf_common.CfClient import *
+from cf_common.CfConfigPatch import compile_patch_plan
+from cf_common.CfTestRegistry import config_hash
+from cf_common.CfValidateTest import TestValidator, valid_ciphers, valid_signature_hashes
 
 
 class BaseTest:
@@ -29,37 +37,14 @@ class BaseTest:
 class CfCreateTest(BaseTest):
     def __init__(self, base, test_info, test_template, cf_ver):
         super().__init__(base)
+        self.test_info = test_info
         self.name = test_info["name"]
         self.type = test_info["type"]
-        self.connection_type = test_info["connection_type"]
-        self.keep_alive = test_info["keep_alive"]
-        self.transactions = self.chk_none(test_info["transactions_connection"])
-        self.delay_time = self.chk_none(test_info["delay_time"])
-        self.delay_time_unit = self.chk_none(test_info["delay_unit"])
-        self.object_type = self.chk_none(test_info["object_type"])
-        self.object_size = self.chk_none(test_info["object_size"])
-        self.delayed_ack = self.chk_none(test_info["delayed_ack"])
-        self.initial_congestion_window = self.chk_none(test_info["icw"])
-        self.rx_window = self.chk_none(test_info["rx_window"])
-        self.ipV4SegmentSize = self.chk_none(test_info["ipV4SegmentSize"])
-        self.ipV6SegmentSize = self.chk_none(test_info["ipV6SegmentSize"])
-        self.retries = self.chk_none(test_info["retries"])
-        self.tls = self.chk_none(test_info["sslTls"])
-        self.tls_version = self.chk_none(test_info["tls_version"])
-        self.certificate = self.chk_none(test_info["certificate"])
-        self.ciphers = self.chk_none(test_info["ciphers"])
-        self.supportedGroups = self.chk_none(test_info["supportedGroups"])
-        self.signature_hash = self.chk_none(test_info["signature_hash"])
-        self.tls_record = self.chk_none(test_info["tls_record"])
-        self.payload_encryption_offload = test_info["payloadEncryptionOffload"]
-        self.http_method = self.chk_none(test_info["http_method"])
-        self.post_size = self.chk_none(test_info["post_size"])
         self.name_suffix = test_info["name_suffix"]
         self.name = self.name + "_" + self.name_suffix
+        self.errors = []
 
-        self.existing_certificate = self.protocol["supplemental"]["sslTls"][
-            "certificate"
-        ]
+        self.base = base
         self.protocol = test_template["config"]["protocol"]
         self.existing_load_constraints = self.loadSpecification["constraints"]
         self.loadSpecification = test_template["config"]["loadSpecification"]
@@ -92,386 +77,328 @@ class CfCreateTest(BaseTest):
         with open(outfile, "w") as f:
             json.dump(self.complete_test(), f, indent=4)
 
-    def update_network_settings(self):
-        try:
-            self.networks["client"]["initialCongestionWindow"] = int(
-                self.initial_congestion_window
-            )
-            self.networks["client"]["receiveWindow"] = int(self.rx_window)
-            self.networks["client"]["delayedAcks"]["bytes"] = int(self.delayed_ack)
-            self.networks["client"]["retries"] = int(self.retries)
-            self.networks["client"]["inactivityTimer"] = 0
-            self.networks["server"]["initialCongestionWindow"] = int(
-                self.initial_congestion_window
+    def update_config_changes(self):
+        """Applies the CSV row to the test config with the compiled patch plan
+
+        :return: list of error messages, empty if all settings were applied
+        """
+        plan = compile_patch_plan(list(self.test_info), self.cf_version)
+        self.errors = plan.apply(self.complete_test(), self.test_info, self.base)
+        for error in self.errors:
+            print(f"\nUnable to set {error}")
+            log.error(f"{self.name}: unable to set {error}")
+        return self.errors
+
+
+class TemplateCache:
+    """Test templates by test type for one controller version
+
+    Templates are fetched once per test type and kept in memory. With a cache_file
+    they are also saved to disk, keyed by controller version, so later runs against
+    the same controller version do not fetch them again.
+    get returns a deep copy, each test can change its template.
+    ciphers and signature_hashes are accepted by the validators in addition to the
+    built in lists and the values of the template.
+    """
+
+    def __init__(self, cf, cf_version, cache_file=None, ciphers=(), signature_hashes=()):
+        self.cf = cf  # CfClient instance
+        self.cf_version = cf_version
+        self.cache_file = cache_file
+        self.ciphers = valid_ciphers | set(ciphers or [])
+        self.signature_hashes = valid_signature_hashes | set(signature_hashes or [])
+        self.file_cache = {}
+        self.templates = {}
+        self.validators = {}
+        if self.cache_file is not None and pathlib.Path(self.cache_file).is_file():
+            try:
+                with open(self.cache_file, "r") as f:
+                    self.file_cache = json.load(f)
+            except ValueError as e:
+                print(f"\nUnable to read template cache {self.cache_file}\n{e}")
+            self.templates = self.file_cache.get(self.cf_version, {})
+            log.info(
+                f"template cache: {list(self.templates)} for version {self.cf_version}"
             )
-            self.networks["server"]["receiveWindow"] = int(self.rx_window)
-            self.networks["server"]["delayedAcks"]["bytes"] = int(self.delayed_ack)
-            self.networks["server"]["retries"] = int(self.retries)
-            self.networks["server"]["inactivityTimer"] = 0
-        except Exception as e:
-            print(f"\nUnable to set network settings \n{e}")
-        try:
-            self.networks["client"]["ipV4SegmentSize"] = int(self.ipV4SegmentSize)
-            self.networks["client"]["ipV6SegmentSize"] = int(self.ipV6SegmentSize)
-            self.networks["server"]["ipV4SegmentSize"] = int(self.ipV4SegmentSize)
-            self.networks["server"]["ipV6SegmentSize"] = int(self.ipV6SegmentSize)
-        except Exception as e:
-            print(f"\nUnable to set MSS in network settings \n{e}")
-
-    def update_criteria_settings(self):
-        try:
-            self.criteria["enabled"] = False
-        except Exception as e:
-            print(f"\nUnable to set criteria settings \n{e}")
-
-    def update_load_constraints(self):
-        try:
-            self.loadSpecification["constraints"] = self.existing_load_constraints
-        except Exception as e:
-            print(f"\nUnable to set load constraints\n{e}")
 
-    def update_close_with_fin(self):
-        try:
-            self.protocol["connectionTermination"] = "FIN"
-            self.networks["client"]["closeWithFin"] = True
-        except Exception as e:
-            print(f"\nUnable to set close tcp connection close with fin settings \n{e}")
+    def get(self, test_type):
+        if test_type not in self.templates:
+            template = self.cf.fetch_test_template(test_type)
+            log.debug("\nTemplate response\n%s", LazyJson(template))
+            self.templates[test_type] = template
+            self.save()
+        return copy.deepcopy(self.templates[test_type])
+
+    def validator(self, test_type):
+        """Returns the TestValidator of a test type, built once from its template"""
+        if test_type not in self.validators:
+            if test_type not in self.templates:
+                self.get(test_type)
+            self.validators[test_type] = TestValidator(
+                self.templates[test_type], self.ciphers, self.signature_hashes
+            )
+        return self.validators[test_type]
 
-    def update_transactions(
-        self, connection_type, keep_alive, count, delay_time, delay_time_unit
+    def save(self):
+        if self.cache_file is None:
+            return
+        self.file_cache[self.cf_version] = self.templates
+        with open(self.cache_file, "w") as f:
+            json.dump(self.file_cache, f, indent=4)
+
+
+class BulkCreate:
+    """Creates tests from create tests CSV rows with bounded parallelism
+
+    Configs are built in the calling thread and posted by a pool of workers.
+    At most workers * 2 rows are in flight, results are returned in row order.
+    Rows with settings that could not be applied to the config, or that fail local
+    validation against the test template, are not posted.
+    A failing row is reported in its result and does not stop the other rows.
+    With a registry, rows with an unchanged config reuse the registered test and
+    changed rows update it in place. Registered tests no longer on the controller
+    are created again.
+    """
+
+    def __init__(
+        self, cf, base, templates, cf_version, debug_dir=None, workers=4, registry=None
     ):
-        if keep_alive.lower() in {"true"}:
-            keep_alive = True
-        elif keep_alive.lower() in {"false"}:
-            keep_alive = False
-        if connection_type.lower() in {"keepalive"}:
-            connection_type = "keepAlive"
-        elif connection_type.lower() in {"separateconnections", "separate"}:
-            connection_type = "separateConnections"
-
-        try:
-            self.protocol["connection"]["type"] = connection_type
-        except Exception as e:
-            print(f"\nUnable to set connection_type \n{e}")
-        try:
-            self.protocol["keepAlive"]["enabled"] = keep_alive
-        except Exception as e:
-            print(f"\nUnable to set keepAlive \n{e}")
+        self.cf = cf  # CfClient instance
+        self.base = base
+        self.templates = templates  # TemplateCache instance
+        self.cf_version = cf_version
+        self.debug_dir = debug_dir  # if set, generated configs are saved here
+        self.workers = max(int(workers), 1)
+        self.registry = registry  # TestRegistry instance, None to always create tests
+        self.controller_ids = {}  # test type: ids of the tests on the controller
+
+    def build(self, test):
+        """Builds the test config of one CSV row
+
+        :param test: create tests CSV row
+        :return: CfCreateTest instance
+        """
+        new = CfCreateTest(
+            copy.deepcopy(self.base),
+            test,
+            self.templates.get(test["type"]),
+            self.cf_version,
+        )
+        new.update_config_changes()
+        new.errors.extend(self.templates.validator(test["type"]).validate(new.complete_test()))
+        return new
+
+    def check(self, tests):
+        """Builds and validates the test configs without posting them
+
+        :param tests: iterable of create tests CSV rows
+        :return: list of result dicts of the rows that failed, empty if all are valid
+        """
+        failed = []
+        for row_num, test in enumerate(tests):
+            error = self.build_error(test)[1]
+            if error is not None:
+                failed.append({"row": row_num, "test": test, "response": None, "error": error})
+        return failed
+
+    def build_error(self, test):
+        """Builds the test config of one CSV row
+
+        :return: tuple of CfCreateTest instance and error message, None if valid
+        """
         try:
-            self.protocol["keepAlive"]["count"] = int(count)
+            new = self.build(test)
         except Exception as e:
-            print(f"\nUnable to set transaction count \n{e}")
-        try:
-            self.protocol["keepAlive"]["delayTime"] = int(delay_time)
-            self.protocol["keepAlive"]["delayTimeUnit"] = delay_time_unit
-        except Exception as e:
-            print(f"\nUnable to set per request delay_time and unit \n{e}")
-
-    def update_http_method(self, http_method, post_size):
-        if http_method.lower() == "post":
-            http_method = "POST"
-            try:
-                self.protocol["method"] = http_method
-            except Exception as e:
-                print(f"\nUnable to set POST method \n{e}")
+            return None, f"unable to build test config: {e!r}"
+        if new.errors:
+            return new, f"invalid test config: {'; '.join(new.errors)}"
+        return new, None
+
+    def post(self, row_num, test, new, entry=None):
+        """Creates the test, or updates the registered test entry in place
+
+        :return: result dict
+        """
+        result = {"row": row_num, "test": test, "response": None, "error": None}
+        config = new.complete_test()
+        result["hash"] = config_hash(test["type"], config)
+        if self.debug_dir is not None:
+            new.save_test(self.debug_dir / f"last_created_test_{row_num}.json")
+        response = None
+        if entry is not None:
             try:
-                self.protocol["bodySizeInBytes"] = int(post_size)
-            except Exception as e:
-                print(f"\nUnable to set POST bodySizeInBytes \n{e}")
-
-    def update_object_size(self, object_type, byte_size):
-        if object_type == "fixed":
-            # print(f'Changing object size to: {byte_size}')
-            try:
-                self.protocol["responseBodyType"]["type"] = "fixed"
-                self.protocol["responseBodyType"]["config"] = {}
-                self.protocol["responseBodyType"]["config"]["type"] = "default"
-                self.protocol["responseBodyType"]["config"]["bytes"] = int(byte_size)
-            except Exception as e:
-                print(f"\nUnable to set responseBodyType\n{e}")
-        elif object_type == "fixed-random":
-            # print(f'Changing object size to: {byte_size}')
-            if int(byte_size) <= 16000:
-                random_length = int(byte_size)
+                response = self.cf.update_test(test["type"], entry["id"], config)
+                result["action"] = "updated"
+            except SystemExit:
+                # test deleted from the controller, create it again
+                log.info(f"unable to update test {entry['id']}, creating {new.name}")
             else:
-                random_length = 16000
-            try:
-                self.protocol["responseBodyType"]["type"] = "fixed"
-                self.protocol["responseBodyType"]["config"] = {}
-                self.protocol["responseBodyType"]["config"]["type"] = "random"
-                self.protocol["responseBodyType"]["config"]["pseudoRandom"] = True
-                self.protocol["responseBodyType"]["config"]["length"] = int(
-                    random_length
-                )
-                self.protocol["responseBodyType"]["config"]["bytes"] = int(byte_size)
-            except Exception as e:
-                print(f"\nUnable to set responseBodyType\n{e}")
-        elif object_type == "mixed":
-            # print(f'Changing object size to: {byte_size}')
+                if isinstance(response, dict) and response.get("type") != "validation":
+                    response = dict(response)
+                    response.setdefault("id", entry["id"])
+                    response.setdefault("name", new.name)
+        if response is None:
             try:
-                self.protocol["responseBodyType"]["type"] = "mixed"
-                self.protocol["responseBodyType"]["config"] = {}
-                self.protocol["responseBodyType"]["config"]["type"] = "default"
-                self.protocol["responseBodyType"]["config"]["distributions"] = [
-                    200,
-                    6000,
-                    8000,
-                    9000,
-                    10000,
-                    25000,
-                    26000,
-                    35000,
-                    59000,
-                    347000,
-                ]
-            except Exception as e:
-                print(f"\nUnable to set responseBodyType\n{e}")
-        elif object_type == "mixed-random":
-            # print(f'Changing object size to: {byte_size}')
-            try:
-                self.protocol["responseBodyType"]["type"] = "mixed"
-                self.protocol["responseBodyType"]["config"] = {}
-                self.protocol["responseBodyType"]["config"]["type"] = "random"
-                self.protocol["responseBodyType"]["config"]["pseudoRandom"] = True
-                self.protocol["responseBodyType"]["config"]["length"] = 16000
-                self.protocol["responseBodyType"]["config"]["distributions"] = [
-                    200,
-                    6000,
-                    8000,
-                    9000,
-                    10000,
-                    25000,
-                    26000,
-                    35000,
-                    59000,
-                    347000,
-                ]
-            except Exception as e:
-                print(f"\nUnable to set responseBodyType\n{e}")
-        else:
-            # print(f'Changing object size to: {byte_size}')
+                response = self.cf.post_test(test["type"], config)
+                result["action"] = "created"
+            except SystemExit:
+                # CfClient exits on request errors, details are printed and logged
+                result["error"] = f"post request failed"
+                return result
+        log.debug(
+            "\n%s response\n%s", result["action"].capitalize(), LazyJson(response)
+        )
+        result["response"] = response
+        if response.get("type") == "validation":
+            result["error"] = f"validation failed: {json.dumps(response, indent=4)}"
+        elif "id" not in response:
+            result["error"] = f"unexpected response: {json.dumps(response, indent=4)}"
+        return result
+
+    def reuse(self, row_num, test, new):
+        """Returns the registered test if its config is unchanged
+
+        :return: tuple of result dict, None if the test has to be posted, and registry entry
+        """
+        if self.registry is None:
+            return None, None
+        entry = self.registry.get(test["name"])
+        if entry is None or entry["type"] != test["type"]:
+            return None, None
+        new_hash = config_hash(test["type"], new.complete_test())
+        if entry["hash"] != new_hash or entry["name"] != new.name:
+            return None, entry
+        controller_ids = self.existing_ids(test["type"])
+        if controller_ids is None:
+            # unable to list the tests, the update checks the test exists
+            return None, entry
+        if entry["id"] not in controller_ids:
+            log.info(f"registered test {entry['id']} not on the controller, creating {new.name}")
+            return None, None
+        result = {
+            "row": row_num,
+            "test": test,
+            "response": {"id": entry["id"], "name": entry["name"]},
+            "error": None,
+            "action": "reused",
+            "hash": new_hash,
+        }
+        return result, entry
+
+    def existing_ids(self, test_type):
+        """Ids of the tests of test_type on the controller, listed once per type
+
+        :return: set of test ids, None if the tests could not be listed
+        """
+        if test_type not in self.controller_ids:
             try:
-                self.protocol["responseBodyType"]["config"]["bytes"] = int(byte_size)
-            except Exception as e:
-                print(f"\nUnable to set responseBodyType bytes\n{e}")
-
-    def update_tls(
-        self,
-        tls,
-        tls_version,
-        certificate,
-        ciphers,
-        supported_groups,
-        signature_hash,
-        tls_record,
-        payload_encryption_offload,
-    ):
-        if tls.lower() in {"true"}:
-            tls = True
-        elif tls.lower() in {"false"}:
-            tls = False
-        try:
-            self.protocol["supplemental"]["sslTls"]["enabled"] = tls
-        except Exception as e:
-            print(f"\nUnable to set sslTls enabled state \n{e}")
-        if tls:
-            self.update_tls_base_setting(tls_version, tls_record)
-        if certificate is not None:
-            self.update_tls_certificate(certificate, self.existing_certificate)
-        if ciphers is not None:
-            self.update_tls_ciphers(ciphers)
-        if supported_groups is not None:
-            self.update_tls_supported_groups(supported_groups)
-        if signature_hash is not None:
-            self.update_tls_signature_hash(signature_hash)
-
-        self.update_tls_payload_encryption_offload(payload_encryption_offload)
-
-    def update_tls_base_setting(self, tls_version, tls_record):
-        try:
-            self.protocol["port"] = 443
-        except Exception as e:
-            print(f"\nUnable to set sslTls enabled state \n{e}")
-        if self.tls_version is not None:
-            try:
-                # Reset tlsv12 and tlsv13 back to false
-                self.protocol["supplemental"]["sslTls"]["tlsv12"] = False
-                self.protocol["supplemental"]["sslTls"]["tlsv13"] = False
-            except Exception as e:
-                print(f"\nUnable to set reset tls_version settings \n{e}")
-            try:
-                # using tls_version as var to set right tls key to true
-                self.protocol["supplemental"]["sslTls"][tls_version] = True
-            except Exception as e:
-                print(f"\nUnable to set tls_version \n{e}")
-        if tls_record is not None:
-            try:
-                self.protocol["supplemental"]["sslTls"]["bytes"] = int(tls_record)
-            except Exception as e:
-                print(f"\nUnable to set certificate \n{e}")
-
-    def update_tls_certificate(self, certificate, existing_certificate):
-        if certificate == "custom":
-            try:
-                self.protocol["supplemental"]["sslTls"][
-                    "certificate"
-                ] = existing_certificate
-            except Exception as e:
-                print(f"\nUnable to set custom certificate \n{e}")
-        else:
-            try:
-                self.protocol["supplemental"]["sslTls"]["certificate"] = certificate
-            except Exception as e:
-                print(f"\nUnable to set certificate \n{e}")
-
-    def update_tls_ciphers(self, ciphers):
-        cipher_list = []
-        if isinstance(ciphers, list):
-            cipher_list = ciphers
-        else:
-            cipher_list.append(ciphers)
-        try:
-            self.protocol["supplemental"]["sslTls"]["ciphers"] = cipher_list
-        except Exception as e:
-            print(f"\nUnable to set ciphers \n{e}")
-
-    def update_tls_supported_groups(self, supported_groups):
-        if self.cf_version < 19300000:
-            log.info(f"Not setting TLS supported group. CF version is below {19300000}")
-            return
-        # check if supportedGroups exists in test config
-        # set all supportedGroup options to False
-        if "supportedGroups" in self.protocol["supplemental"]["sslTls"]:
-            for k, v in self.protocol["supplemental"]["sslTls"][
-                "supportedGroups"
-            ].items():
-                self.protocol["supplemental"]["sslTls"]["supportedGroups"][k] = False
-            try:
-                # using supportedGroups as var to set right group key to true
-                self.protocol["supplemental"]["sslTls"]["supportedGroups"][
-                    supported_groups
-                ] = True
-            except Exception as e:
-                print(f"\nUnable to set supportedGroups \n{e}")
-
-    def update_tls_signature_hash(self, signature_hash):
-        if self.cf_version < 19300000:
-            log.info(f"Not setting TLS signature hash. CF version is below {19300000}")
-            return
-        signature_hash_list = []
-        if isinstance(signature_hash, list):
-            signature_hash_list = signature_hash
-        else:
-            signature_hash_list.append(signature_hash)
-        try:
-            self.protocol["supplemental"]["sslTls"][
-                "signatureHashAlgorithmsList"
-            ] = signature_hash_list
-        except Exception as e:
-            print(f"\nUnable to set TLS signature hash \n{e}")
-
-    def update_tls_payload_encryption_offload(self, payload_encryption_offload):
-        if self.cf_version < 19400000:
-            log.info(
-                f"Not setting payloadEncryptionOffload. "
-                f"CF version is below {19400000}"
+                tests = self.cf.list_tests(test_type)
+            except SystemExit:
+                # CfClient exits on request errors, details are printed and logged
+                tests = None
+            self.controller_ids[test_type] = (
+                None if tests is None else {t.get("id") for t in tests}
             )
-            return
-        if payload_encryption_offload.lower() in {"true"}:
-            payload_encryption_offload = True
-        elif payload_encryption_offload.lower() in {"false"}:
-            payload_encryption_offload = False
-        try:
-            self.protocol["supplemental"]["sslTls"][
-                "payloadEncryptionOffload"
-            ] = payload_encryption_offload
-        except Exception as e:
-            print(f"\nUnable to set payloadEncryptionOffload state \n{e}")
+        return self.controller_ids[test_type]
+
+    def run(self, tests):
+        """Creates tests, yields results in the order of tests
+
+        :param tests: iterable of create tests CSV rows, can be a generator
+        :return: generator of dicts with row, test, response, error and action keys
+        """
+        in_flight = collections.deque()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for row_num, test in enumerate(tests):
+                new, error = self.build_error(test)
+                if error is None:
+                    result, entry = self.reuse(row_num, test, new)
+                    if result is None:
+                        future = pool.submit(self.post, row_num, test, new, entry)
+                        in_flight.append((future, None))
+                    else:
+                        in_flight.append((None, result))
+                else:
+                    result = {"row": row_num, "test": test, "response": None, "error": error}
+                    in_flight.append((None, result))
+                while len(in_flight) > self.workers * 2:
+                    yield self.next_result(in_flight)
+            while in_flight:
+                yield self.next_result(in_flight)
+
+    def next_result(self, in_flight):
+        future, result = in_flight.popleft()
+        if future is not None:
+            result = future.result()
+        if self.registry is not None and result["error"] is None:
+            self.registry.add(result["test"], result["response"], result["hash"])
+        return result
 
-    @staticmethod
-    def chk_none(value):
-        if isinstance(value, (int, float)):
-            return value
-        elif value.lower() in {"none"}:
-            return None
-        else:
-            return value
 
-    def update_config_changes(self):
-        self.update_network_settings()
-        self.update_criteria_settings()
-        # self.update_load_constraints()
-        self.update_close_with_fin()
-        if 19300000 < self.cf_version:
-            self.update_http_method(self.http_method, self.post_size)
-        if self.object_size is not None:
-            self.update_object_size(self.object_type, self.object_size)
-        if self.keep_alive is not None:
-            self.update_transactions(
-                self.connection_type,
-                self.keep_alive,
-                self.transactions,
-                self.delay_time,
-                self.delay_time_unit,
-            )
-        if self.tls is not None:
-            self.update_tls(
-                self.tls,
-                self.tls_version,
-                self.certificate,
-                self.ciphers,
-                self.supportedGroups,
-                self.signature_hash,
-                self.tls_record,
-                self.payload_encryption_offload,
-            )
+class TestsToRun:
+    """Tests to run CSV rows of created tests
 
+    Each created test gets the settings of the reference test with the longest name
+    that is a prefix of the created test name, the first reference test if none is.
+    Rows are kept in memory and written once with write.
+    """
 
-class TestsToRun:
     def __init__(self, reference_to_run_csv_file, test_to_run_csv_file):
         self.test_to_run_csv_file = test_to_run_csv_file
         with open(reference_to_run_csv_file, "r") as f:
             self.reference_tests = list(csv.DictReader(f))
-        # write headers to tests to run csv file
-        with open(self.test_to_run_csv_file, "w") as f:
-            # self.tests_to_run_headers = (f'name, id, type, run, goal_seek, duration, startup, rampup, rampdown,	'
-            #                  f'shutdown, sustain_period, load_type, start_load, incr_low, incr_med, incr_high, '
-            #                  f'low_threshold, med_threshold, high_threshold')
-            f.write(self.test_header_csv_line(self.reference_tests))
+        # first reference test of each name, names sorted for prefix search
+        self.reference_by_name = {}
+        for test in self.reference_tests:
+            self.reference_by_name.setdefault(test["name"], test)
+        self.reference_names = sorted(self.reference_by_name)
+        self.header = self.test_header(self.reference_tests)
+        self.rows = []
+
+    def longest_prefix(self, name):
+        """Returns the longest reference test name that is a prefix of name, or None"""
+        names = self.reference_names
+        prefix = name
+        while True:
+            i = bisect.bisect_right(names, prefix) - 1
+            if i < 0:
+                return None
+            if name.startswith(names[i]):
+                return names[i]
+            # a shorter reference name matching name is a prefix of the common part
+            common = os.path.commonprefix([name, names[i]])
+            if not common:
+                return None
+            prefix = common
 
     def add_test(self, new_test_dict, test_type):
-        test_ref_match = False
-        for test in self.reference_tests:
-            if new_test_dict["name"].startswith(test["name"]):
-                test_csv_info = self.test_csv_line_values(
-                    test, new_test_dict, test_type
-                )
-                test_ref_match = True
-                print(f"{test['name']}\n{test_csv_info}")
-                with open(self.test_to_run_csv_file, "a") as f:
-                    f.write(test_csv_info)
-        if not test_ref_match:
-            test_csv_info = self.test_csv_line_values(
-                self.reference_tests[0], new_test_dict, test_type
-            )
-            print(f"{test['name']}\n{test_csv_info}")
-            with open(self.test_to_run_csv_file, "a") as f:
-                f.write(test_csv_info)
+        ref_name = self.longest_prefix(new_test_dict["name"])
+        if ref_name is None:
+            test = self.reference_tests[0]
+        else:
+            test = self.reference_by_name[ref_name]
+        row = self.test_row_values(test, new_test_dict, test_type)
+        print(f"{test['name']}\n{','.join(row)}")
+        self.rows.append(row)
+
+    def write(self):
+        with open(self.test_to_run_csv_file, "w", newline="") as f:
+            writer = csv.writer(f, lineterminator="\n")
+            writer.writerow(self.header)
+            writer.writerows(self.rows)
 
     @staticmethod
-    def test_header_csv_line(reference_tests):
-        csv_line = f"name,id,type,"
+    def test_header(reference_tests):
+        header = ["name", "id", "type"]
         for key in reference_tests[0]:
             if key not in {"name", "id", "type"}:
-                csv_line = csv_line + key + ","
-        csv_line = csv_line[:-1] + "\n"  # remove last comma and add end line
-        return csv_line
+                header.append(key)
+        return header
 
     @staticmethod
-    def test_csv_line_values(reference_test, new_test_dict, test_type):
-        csv_line = f"{new_test_dict['name']},{new_test_dict['id']},{test_type},"
+    def test_row_values(reference_test, new_test_dict, test_type):
+        row = [new_test_dict["name"], new_test_dict["id"], test_type]
         for key, value in reference_test.items():
             if key not in {"name", "id", "type"}:
-                csv_line = csv_line + value + ","
-        csv_line = csv_line[:-1] + "\n"  # remove last comma and add end line
-        return csv_line
+                row.append(value)
+        return row
@@ -0,0 +1,138 @@
+import datetime
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+log = logging.getLogger(__name__)
+
+# DELETE status codes, a test that no longer exists counts as deleted
+deleted_status = {200, 202, 204}
+missing_status = {404}
+
+
+def test_created_at(test):
+    """Creation time of a controller test as epoch seconds
+
+    :param test: test dict from CfClient.list_tests
+    :return: float or None if the test has no creation time
+    """
+    for key in ("createdAt", "created_at", "created", "updatedAt", "updated_at"):
+        value = test.get(key)
+        if value is None:
+            continue
+        if isinstance(value, (int, float)):
+            # milliseconds since epoch
+            return value / 1000 if value > 1e11 else float(value)
+        try:
+            created = datetime.datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError:
+            continue
+        if created.tzinfo is None:
+            created = created.replace(tzinfo=datetime.timezone.utc)
+        return created.timestamp()
+    return None
+
+
+class StaleTests:
+    """Selects generated tests to purge from a controller test list
+
+    A test is stale if its name ends with one of the name suffixes, and it is older
+    than older_than_days. Both filters are optional, but at least one is required.
+    Without name suffixes only the created_ids tests, the ones create_tests made,
+    can be stale, hand built tests are never selected by age alone. keep_ids tests,
+    e.g. the tests of the run tests csv files, are never stale.
+    """
+
+    def __init__(
+        self, name_suffixes=None, older_than_days=None, keep_ids=None, now=None,
+        created_ids=None,
+    ):
+        if isinstance(name_suffixes, str):
+            name_suffixes = [name_suffixes]
+        if not name_suffixes and older_than_days is None:
+            raise ValueError("name_suffixes or older_than_days is required")
+        self.name_endings = tuple(f"_{suffix}" for suffix in name_suffixes or [])
+        self.older_than_days = older_than_days
+        self.keep_ids = set(keep_ids or [])
+        self.created_ids = set(created_ids or [])
+        now = time.time() if now is None else now
+        self.cutoff = None
+        if older_than_days is not None:
+            self.cutoff = now - older_than_days * 86400
+
+    def is_stale(self, test):
+        if test.get("id") in self.keep_ids:
+            return False
+        if self.name_endings:
+            if not str(test.get("name", "")).endswith(self.name_endings):
+                return False
+        elif test.get("id") not in self.created_ids:
+            return False
+        if self.cutoff is not None:
+            created = test_created_at(test)
+            if created is None or created > self.cutoff:
+                return False
+        return True
+
+    def select(self, tests, test_type=None):
+        """Returns the stale tests with their type
+
+        :param tests: test dicts from CfClient.list_tests
+        :param test_type: type of the tests if they were listed by type
+        :return: list of dicts with id, type and name keys
+        """
+        stale = []
+        for test in tests:
+            if self.is_stale(test):
+                stale.append(
+                    {
+                        "id": test["id"],
+                        "type": test.get("type", test_type),
+                        "name": test.get("name", ""),
+                    }
+                )
+        return stale
+
+
+class BulkDelete:
+    """Deletes tests with a pool of workers
+
+    The DELETE status code tells if the test was deleted, there is no GET first.
+    Results are returned in the order of tests.
+    """
+
+    def __init__(self, cf, workers=8):
+        self.cf = cf  # CfClient instance
+        self.workers = max(int(workers), 1)
+
+    def delete(self, test):
+        result = {"test": test, "status": None, "deleted": False, "error": None}
+        try:
+            response = self.cf.delete_test(test["type"], test["id"])
+        except Exception as e:
+            # CfClient.delete_test has no response to return on connection errors
+            result["error"] = f"delete request failed: {e!r}"
+            return result
+        result["status"] = response.status_code
+        if response.status_code in deleted_status:
+            result["deleted"] = True
+        elif response.status_code in missing_status:
+            result["deleted"] = True
+            result["error"] = "test not found"
+        else:
+            result["error"] = f"unexpected status {response.status_code}: {response.text}"
+        return result
+
+    def run(self, tests):
+        """Deletes tests, yields results in the order of tests
+
+        :param tests: list of dicts with id, type and name keys
+        :return: generator of dicts with test, status, deleted and error keys
+        """
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for result in pool.map(self.delete, tests):
+                log.debug(
+                    f"delete {result['test']['id']} {result['test']['name']}: "
+                    f"{result['status']} {result['error']}"
+                )
+                yield result
@@ -0,0 +1,121 @@
+import math
+
+from jinja2 import Environment
+
+table_template_str = """<style type="text/css">
+{%- for s in styles %}
+#T_{{ table_id }} {{ s.selector }} { {% for p in s.props %}{{ p[0] }}: {{ p[1] }}; {% endfor %}}
+{%- endfor %}
+{%- for col in columns if col in column_props %}
+#T_{{ table_id }} td.col-{{ col }} { {% for k, v in column_props[col].items() %}{{ k }}: {{ v }}; {% endfor %}}
+{%- endfor %}
+</style>
+<table id="T_{{ table_id }}">
+<thead>
+<tr>
+{%- for col in columns %}
+<th class="col_heading">{{ col }}</th>
+{%- endfor %}
+</tr>
+</thead>
+<tbody>
+{%- for row in rows %}
+<tr>
+{%- for col in columns %}
+<td class="col-{{ col }}">{{ row[col] | cell }}</td>
+{%- endfor %}
+</tr>
+{%- endfor %}
+</tbody>
+</table>
+"""
+
+template_cache = {}
+
+
+def cell_value(value):
+    """Formats a summary value the same way as the pandas Styler default"""
+    if isinstance(value, float):
+        if math.isnan(value):
+            return "nan"
+        return f"{value:.6g}"
+    return value
+
+
+def table_template():
+    """Returns the compiled table template, compiled once per process"""
+    if "table" not in template_cache:
+        env = Environment(autoescape=False)
+        env.filters["cell"] = cell_value
+        template_cache["table"] = env.from_string(table_template_str)
+    return template_cache["table"]
+
+
+class HtmlReport:
+    """Renders the html reports of a Report summary
+
+    The summary rows are converted once. Every sub table is filtered once and
+    streamed into all report files, one per column selection.
+    """
+
+    def __init__(self, report):
+        self.report = report
+        self.styles = report.style_a()
+        self.column_props = report.column_props
+        self.columns = list(report.df_results.columns)
+        self.rows = report.df_results.to_dict("records")
+        self.template = table_template()
+
+    def select_columns(self, filter_columns):
+        if filter_columns is None:
+            return self.columns
+        return [col for col in self.columns if col in filter_columns]
+
+    def filter_rows(self, test_name_contains):
+        if test_name_contains is None:
+            return self.rows
+        return [row for row in self.rows if test_name_contains in str(row["test_name"])]
+
+    def write(self, sub_report_tables, report_files, script_version):
+        """Writes all html report files in one pass over the sub tables
+
+        :param sub_report_tables: test name filters, None for all tests
+        :param report_files: dict of html file path to list of columns
+        :param script_version: version added at the end of each file
+        :return: None
+        """
+        files = {}
+        try:
+            for html_report_file, filter_columns in report_files.items():
+                files[html_report_file] = (
+                    open(html_report_file, "w"),
+                    self.select_columns(filter_columns),
+                )
+            for table_num, sub_table in enumerate(sub_report_tables):
+                rows = self.filter_rows(sub_table)
+                # check if there are results in a table before adding it to the html file
+                if len(rows) == 0:
+                    continue
+                if sub_table is None:
+                    table_filter = f"<h3>ALL TESTS - including above tests</h3>"
+                else:
+                    table_filter = f"<h3>{sub_table}</h3>"
+                for f, columns in files.values():
+                    f.write(table_filter)
+                    for chunk in self.template.generate(
+                        table_id=f"t{table_num}",
+                        styles=self.styles,
+                        column_props=self.column_props,
+                        columns=columns,
+                        rows=rows,
+                    ):
+                        f.write(chunk)
+
+            script_version_html = f"\n<body>" \
+                                  f"\n<p>Script version: {script_version}</p>" \
+                                  f"\n</body>"
+            for f, columns in files.values():
+                f.write(script_version_html)
+        finally:
+            for f, columns in files.values():
+                f.close()
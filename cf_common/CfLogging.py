@@ -0,0 +1,120 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import pathlib
+import queue
+import sys
+import time
+
+log = logging.getLogger(__name__)
+
+log_format = "[%(asctime)s] %(levelname)s %(lineno)d: %(message)s"
+
+# queue handler and listener of the running process, logging is set up once per process
+queue_handler = None
+listener = None
+
+
+class LazyJson:
+    """Log argument serialized only if the record is emitted
+
+    log.debug("response: %s", LazyJson(response)) does not call json.dumps when
+    debug logging is disabled, an f-string would serialize the payload every time.
+    """
+
+    __slots__ = ("value", "indent")
+
+    def __init__(self, value, indent=4):
+        self.value = value
+        self.indent = indent
+
+    def __str__(self):
+        return json.dumps(self.value, indent=self.indent, default=str)
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that leaves the formatting to the listener thread
+
+    The stock prepare formats the record in the logging thread, LazyJson arguments
+    would be serialized on the control loop. Arguments are formatted when the file
+    handler writes the record, values changed after the call are logged changed.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def run_log_file(log_file, log_dir=None, per_run=True, script=None, start_time=None):
+    """Log file of a run
+
+    :param log_file: log file name, e.g. cf.log
+    :param log_dir: directory of the log file, None for the current directory
+    :param per_run: add the script name and start time to the file name
+    :return: pathlib.Path
+    """
+    log_file = pathlib.Path(log_file)
+    if log_dir is not None:
+        log_file = pathlib.Path(log_dir) / log_file.name
+    if not per_run:
+        return log_file
+    if script is None:
+        script = pathlib.Path(sys.argv[0]).stem or "python"
+    time_stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(start_time))
+    return log_file.with_name(f"{log_file.stem}_{script}_{time_stamp}{log_file.suffix}")
+
+
+def setup_logging(log_file="cf.log", level=logging.DEBUG, per_run=False,
+                  max_bytes=0, backup_count=0, log_dir=None):
+    """Logs to a rotating file from a background thread
+
+    Records are put on a queue unformatted by the logging threads, a QueueListener
+    thread formats them and writes the file. Importing the modules does not log.
+
+    :param log_file: log file name, e.g. cf.log
+    :param level: logging level or level name, e.g. "INFO"
+    :param per_run: one log file per run, named after the script and start time
+    :param max_bytes: rotate the log file at this size, 0 to never rotate
+    :param backup_count: number of rotated files kept
+    :param log_dir: directory of the log file, None for the current directory
+    :return: pathlib.Path of the log file
+    """
+    global queue_handler, listener
+    if listener is not None:
+        return pathlib.Path(listener.handlers[0].baseFilename)
+    log_file = run_log_file(log_file, log_dir, per_run)
+    log_file.parent.mkdir(parents=True, exist_ok=True)
+    file_handler = logging.handlers.RotatingFileHandler(
+        log_file, maxBytes=max_bytes, backupCount=backup_count, delay=True
+    )
+    if not per_run:
+        if backup_count and log_file.is_file() and log_file.stat().st_size:
+            # keep the log of the previous run instead of overwriting it
+            file_handler.doRollover()
+        elif log_file.is_file():
+            log_file.write_text("")
+    file_handler.setFormatter(logging.Formatter(log_format))
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    root = logging.getLogger()
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    listener = logging.handlers.QueueListener(log_queue, file_handler)
+    listener.start()
+    # write the queued records before the process exits
+    atexit.register(stop_logging)
+    log.debug("start logging")
+    return log_file
+
+
+def stop_logging():
+    global queue_handler, listener
+    if listener is None:
+        return
+    logging.getLogger().removeHandler(queue_handler)
+    queue_handler = None
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+    listener = None
@@ -0,0 +1,193 @@
+"""Live metrics of the running test in Prometheus text format
+
+CfRunTest hands every detailed report line to MetricsExporter.add_sample, which
+only keeps a reference to it. The text is rendered in the HTTP server thread when
+/metrics is scraped, once per sample, so the control loop never waits on a scrape.
+"""
+import http.server
+import logging
+import math
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# detailed report columns exported as gauges
+metric_columns = {
+    "seconds": "Seconds elapsed in the test",
+    "current_load": "Current load",
+    "desired_load": "Desired load",
+    "tps": "Successful transactions per second",
+    "cps": "Established connections per second",
+    "open_conns": "Open connections",
+    "total_bandwidth": "Receive and transmit bandwidth",
+    "rx_bandwidth": "Receive bandwidth",
+    "tx_bandwidth": "Transmit bandwidth",
+    "tcp_avg_ttfb": "Average time to first byte in ms",
+    "tcp_avg_tt_synack": "Average time to syn ack in ms",
+    "url_response_time": "Average response time per url in ms",
+    "txn_error_rate": "Unsuccessful transactions in percent",
+    "successful_txn": "Successful transactions",
+    "unsuccessful_txn": "Unsuccessful transactions",
+    "aborted_txn": "Aborted transactions",
+    "simusers_alive": "Simusers alive",
+    "client_cpu": "Client cpu utilization in percent",
+    "client_mem": "Client memory used in percent",
+    "client_pkt_mem": "Client packet memory used",
+    "client_rcv_queue": "Client receive queue length",
+    "server_cpu": "Server cpu utilization in percent",
+    "server_mem": "Server memory used in percent",
+    "server_pkt_mem": "Server packet memory used",
+    "server_rcv_queue": "Server receive queue length",
+}
+# detailed report columns exported as 0 or 1
+stable_columns = {
+    "seek_ready": "Load is stable and ready for the next goal seek step",
+    "tps_stable": "Transactions per second are stable",
+    "cps_stable": "Connections per second are stable",
+    "conns_stable": "Open connections are stable",
+    "ttfb_stable": "Time to first byte is stable",
+    "bw_stable": "Bandwidth is stable",
+}
+# detailed report columns used as labels of every metric
+label_columns = {"test_name": "test", "test_id": "test_id", "run_id": "run_id",
+                 "load_type": "load_type"}
+
+
+class NullMetrics:
+    """Default metrics of CfRunTest, samples are not exported"""
+
+    def add_sample(self, csv_list, poll_seconds=None):
+        pass
+
+    def end_test(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def metric_value(value):
+    """Sample value as text, None if it is not a number"""
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    if math.isnan(value):
+        return "NaN"
+    return repr(value)
+
+
+class MetricsRequestHandler(http.server.BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        data = self.server.exporter.render()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MetricsServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+
+class MetricsExporter:
+    """Serves the last sample of the running test on http://host:port/metrics
+
+    :param port: TCP port, 0 for a free port
+    :param host: address to listen on, the default only serves the local host
+    """
+
+    def __init__(self, port, host="127.0.0.1"):
+        from cf_common.CfRunTest import detailed_report_schema
+
+        self.columns = list(detailed_report_schema)
+        self.sample = None
+        self.samples = 0
+        self.active = False
+        self.rendered = (None, b"")
+        self.server = MetricsServer((host, port), MetricsRequestHandler)
+        self.server.exporter = self
+        self.address = f"{host}:{self.server.server_address[1]}"
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, name="metrics", daemon=True
+        )
+        self.thread.start()
+        log.info(f"metrics exporter on http://{self.address}/metrics")
+
+    def add_sample(self, csv_list, poll_seconds=None):
+        """Publishes a detailed report line, called from the control loop
+
+        :param csv_list: detailed report line, see detailed_report_schema
+        :param poll_seconds: duration of the statistics request of the line
+        """
+        self.samples += 1
+        self.active = True
+        # one assignment, the server thread sees either the old or the new sample
+        self.sample = (csv_list, poll_seconds, time.time(), self.samples, self.active)
+
+    def end_test(self):
+        self.active = False
+        if self.sample is not None:
+            self.sample = self.sample[:4] + (False,)
+
+    def render(self):
+        """Prometheus text of the last sample, rendered once per sample"""
+        sample = self.sample
+        rendered_sample, data = self.rendered
+        if sample is rendered_sample and data:
+            return data
+        lines = []
+
+        def add(name, help_text, value, labels="", metric_type="gauge"):
+            if value is None:
+                return
+            lines.append(f"# HELP cf_{name} {help_text}")
+            lines.append(f"# TYPE cf_{name} {metric_type}")
+            lines.append(f"cf_{name}{labels} {value}")
+
+        add("harness_samples_total", "Samples published by the harness", self.samples,
+            metric_type="counter")
+        if sample is not None:
+            csv_list, poll_seconds, sample_time, samples, active = sample
+            values = dict(zip(self.columns, csv_list))
+            labels = ",".join(
+                f'{label}="{label_value(values.get(column))}"'
+                for column, label in label_columns.items()
+            )
+            labels = "{" + labels + "}"
+            add("test_active", "1 while the test runs", "1" if active else "0", labels)
+            lines.append("# HELP cf_phase Phase of the test")
+            lines.append("# TYPE cf_phase gauge")
+            lines.append(
+                f'cf_phase{labels[:-1]},phase="{label_value(values.get("state"))}"}} 1'
+            )
+            for column, help_text in metric_columns.items():
+                add(column, help_text, metric_value(values.get(column)), labels)
+            for column, help_text in stable_columns.items():
+                add(column, help_text, metric_value(bool(values.get(column))), labels)
+            add("harness_poll_seconds", "Duration of the last statistics request",
+                metric_value(poll_seconds), labels)
+            add("harness_last_sample_timestamp_seconds", "Time of the last sample",
+                metric_value(sample_time), labels)
+        data = ("\n".join(lines) + "\n").encode()
+        self.rendered = (sample, data)
+        return data
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
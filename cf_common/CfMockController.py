@@ -0,0 +1,176 @@
+import http.server
+import json
+import logging
+import multiprocessing
+import threading
+import time
+import urllib.parse
+
+from cf_common.CfClock import ScaledClock
+from cf_common.CfSimulator import DutModel, SimulatedClient
+
+log = logging.getLogger(__name__)
+
+mock_version = "20.0.0.0"
+
+
+class MockControllerHandler(http.server.BaseHTTPRequestHandler):
+    # keep alive, CfClient reuses its connections
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.reply("GET")
+
+    def do_POST(self):
+        self.reply("POST")
+
+    def do_PUT(self):
+        self.reply("PUT")
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length) if length else b""
+        if not body:
+            return {}
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            return json.loads(body)
+        return {k: v[0] for k, v in urllib.parse.parse_qs(body.decode()).items()}
+
+    def reply(self, method):
+        body = self.read_body()
+        path = urllib.parse.urlparse(self.path).path
+        parts = path.strip("/").split("/")[2:]  # after api/v2
+        if self.server.latency > 0:
+            time.sleep(self.server.latency)
+        try:
+            with self.server.lock:
+                status, result = 200, self.server.route(method, parts, body)
+        except KeyError as detailed_exception:
+            status, result = 404, {"message": f"not found: {detailed_exception}"}
+        if result is None:
+            status, result = 404, {"message": f"unknown request: {method} {path}"}
+        data = json.dumps(result).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MockControllerServer(http.server.ThreadingHTTPServer):
+    """HTTP stand in of the controller API used by CfClient
+
+    Requests are answered by a SimulatedClient after latency seconds, the DUT and
+    the test runs are simulated on its clock.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, simulator, latency=0.0):
+        super().__init__(address, MockControllerHandler)
+        self.simulator = simulator
+        self.latency = latency
+        self.lock = threading.Lock()
+
+    def route(self, method, parts, body):
+        """Result of an API request
+
+        :param parts: path segments after /api/v2
+        :return: response dict, None for an unknown request
+        """
+        cf = self.simulator
+        if not parts:
+            return None
+        if method == "POST" and parts == ["token"]:
+            return {"token": "mock"}
+        if method == "GET" and parts == ["system", "version"]:
+            return {"version": mock_version}
+        if parts[0] == "queues" and len(parts) == 2:
+            return cf.get_queue(parts[1])
+        if parts[0] == "tests" and len(parts) == 3:
+            if method == "PUT" and parts[2] == "start":
+                return cf.start_test(parts[1])
+            if method == "GET":
+                return cf.get_test(parts[1], parts[2])
+            if method == "PUT":
+                return cf.update_test(parts[1], parts[2], body)
+        if parts[0] == "test_runs":
+            if len(parts) == 1 and method == "GET":
+                return cf.list_test_runs()
+            if len(parts) == 2 and method == "GET":
+                return cf.get_test_run(parts[1])
+            if len(parts) == 3 and parts[2] == "statistics":
+                return cf.fetch_test_run_statistics(parts[1])
+            if len(parts) == 3 and parts[2] == "stop":
+                return cf.stop_test(parts[1])
+            if len(parts) == 3 and parts[2] == "changeload":
+                return cf.change_load(parts[1], int(float(body["load"])))
+        return None
+
+
+def serve_mock_controller(conn, model_settings, tests, scale, origin, latency):
+    """Runs a MockControllerServer on a free local port until the process ends
+
+    :param conn: multiprocessing connection, the port is sent to it
+    :param model_settings: DutModel settings
+    :param tests: list of (test type, test id, name) known by the controller
+    """
+    simulator = SimulatedClient(DutModel(**model_settings), ScaledClock(scale, origin))
+    for test_type, test_id, name in tests:
+        simulator.get_test(test_type, test_id)["name"] = name
+    server = MockControllerServer(("127.0.0.1", 0), simulator, latency)
+    conn.send(server.server_address[1])
+    server.serve_forever()
+
+
+class MockController:
+    """Stand in controller in its own process
+
+    The process keeps the CPU time and allocations of the controller out of the
+    measurements of the process running the tests.
+    """
+
+    def __init__(self, model_settings, tests, scale=1.0, origin=None, latency=0.0):
+        self.model_settings = model_settings
+        self.tests = tests
+        self.scale = scale
+        self.origin = time.time() if origin is None else origin
+        self.latency = latency
+        self.process = None
+        self.address = None
+
+    def start(self):
+        """Starts the controller process
+
+        :return: controller address, e.g. 127.0.0.1:40123
+        """
+        context = multiprocessing.get_context("spawn")
+        conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=serve_mock_controller,
+            args=(
+                child_conn,
+                self.model_settings,
+                self.tests,
+                self.scale,
+                self.origin,
+                self.latency,
+            ),
+            daemon=True,
+        )
+        self.process.start()
+        if not conn.poll(30):
+            self.stop()
+            raise RuntimeError("mock controller did not start")
+        self.address = f"127.0.0.1:{conn.recv()}"
+        log.info(f"mock controller at {self.address}, pid {self.process.pid}")
+        return self.address
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join()
+            self.process = None
@@ -0,0 +1,209 @@
+"""Harness overhead of a test suite run against a stand in controller
+
+OverheadMonitor is passed to CfRunTest as its clock. The time between two sleeps
+is one tick of harness work: main thread CPU time, wall time, time waiting for
+controller requests and peak traced allocations are recorded per tick.
+
+The period of a tick is the time from its sleep to the next sleep, its overrun is
+the period beyond the sleep asked for. The jitter is the change of the overrun
+from the previous tick of the test, the variation of the period around the
+cadence the test asked for.
+
+Requests go through MeasuredClient, a new test starts with the first get_test
+request after a start_test request.
+"""
+import logging
+import time
+import tracemalloc
+
+log = logging.getLogger(__name__)
+
+
+def percentile(values, p):
+    """Nearest rank percentile, p from 0 to 100, None for no values"""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(int(round(p / 100 * (len(values) - 1))), len(values) - 1)]
+
+
+def distribution(values, factor=1.0):
+    """mean, p50, p99 and max of values multiplied by factor, e.g. 1000 for ms"""
+    if not values:
+        return {"mean": None, "p50": None, "p99": None, "max": None}
+    return {
+        "mean": sum(values) / len(values) * factor,
+        "p50": percentile(values, 50) * factor,
+        "p99": percentile(values, 99) * factor,
+        "max": max(values) * factor,
+    }
+
+
+class OverheadMonitor:
+    """Clock for CfRunTest recording the harness work between its sleeps
+
+    :param clock: clock the tests run on, e.g. ScaledClock
+    :param trace_allocations: trace allocations with tracemalloc, slows the harness
+    """
+
+    def __init__(self, clock, trace_allocations=True):
+        self.clock = clock
+        self.scale = getattr(clock, "scale", 1.0)
+        self.trace_allocations = trace_allocations
+        self.ticks = []
+        self.tests = []
+        self.request_seconds = 0.0
+        self.last_request = None
+        self.wall_mark = None
+        self.cpu_mark = None
+        self.sleep_start = None
+        self.requested = None
+        self.memory_mark = 0
+        self.memory_start = None
+        self.memory_end = None
+        self.suite_start = None
+        self.suite_end = None
+
+    def start(self):
+        if self.trace_allocations:
+            tracemalloc.start()
+            self.memory_start = tracemalloc.get_traced_memory()[0]
+        self.suite_start = time.perf_counter()
+
+    def stop(self):
+        self.suite_end = time.perf_counter()
+        if self.trace_allocations:
+            self.memory_end = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+
+    def time(self):
+        return self.clock.time()
+
+    def sleep(self, seconds):
+        now = time.perf_counter()
+        if self.wall_mark is not None:
+            period = now - self.sleep_start
+            tick = {
+                "test": len(self.tests),
+                "cpu": time.thread_time() - self.cpu_mark,
+                "wall": now - self.wall_mark,
+                "requests": self.request_seconds,
+                "period": period,
+                # sleep start to sleep start against the sleep asked for
+                "period_overrun": period - self.requested / self.scale,
+            }
+            if self.ticks and self.ticks[-1]["test"] == tick["test"]:
+                tick["jitter"] = abs(tick["period_overrun"] - self.ticks[-1]["period_overrun"])
+            if self.trace_allocations:
+                current, peak = tracemalloc.get_traced_memory()
+                tick["allocated"] = peak - self.memory_mark
+            self.ticks.append(tick)
+        self.sleep_start = now
+        self.requested = seconds
+        self.clock.sleep(seconds)
+        self.mark()
+
+    def mark(self):
+        self.wall_mark = time.perf_counter()
+        self.cpu_mark = time.thread_time()
+        self.request_seconds = 0.0
+        if self.trace_allocations:
+            tracemalloc.reset_peak()
+            self.memory_mark = tracemalloc.get_traced_memory()[0]
+
+    def request(self, method, seconds, result):
+        """Called by MeasuredClient after each controller request"""
+        now = time.perf_counter()
+        if method == "get_test" and (not self.tests or self.tests[-1]["started"]):
+            # first request of a new CfRunTest, the previous test is done
+            start = now - seconds
+            self.tests.append(
+                {
+                    "start": start,
+                    "gap": None if self.last_request is None else start - self.last_request,
+                    "end": None,
+                    "started": False,
+                    "elapsed": 0,
+                    "requests": 0,
+                    "request_seconds": 0.0,
+                }
+            )
+            self.wall_mark = None
+        self.request_seconds += seconds
+        self.last_request = now
+        if self.tests:
+            test = self.tests[-1]
+            test["end"] = now
+            test["requests"] += 1
+            test["request_seconds"] += seconds
+            if method == "start_test":
+                test["started"] = True
+            elif method == "fetch_test_run_statistics":
+                for i in result.get("client", []):
+                    if i.get("type") == "timeElapsed":
+                        test["elapsed"] = i.get("value") or 0
+
+    def summary(self):
+        """Overhead of the suite
+
+        Traffic is the time elapsed on the controller, in wall seconds. Overhead is
+        the suite time that was not traffic: controller requests, test setup and stop,
+        reports between tests and harness work.
+
+        :return: dict
+        """
+        suite_seconds = self.suite_end - self.suite_start
+        traffic_seconds = sum(t["elapsed"] for t in self.tests) / self.scale
+        overhead_seconds = suite_seconds - traffic_seconds
+        ticks = self.ticks
+        summary = {
+            "scale": self.scale,
+            "tests": len(self.tests),
+            "ticks": len(ticks),
+            "tick_cpu_ms": distribution([t["cpu"] for t in ticks], 1000),
+            "tick_wall_ms": distribution([t["wall"] for t in ticks], 1000),
+            "tick_requests_ms": distribution([t["requests"] for t in ticks], 1000),
+            "tick_harness_ms": distribution([t["wall"] - t["requests"] for t in ticks], 1000),
+            "tick_period_ms": distribution([t["period"] for t in ticks], 1000),
+            "tick_period_overrun_ms": distribution([t["period_overrun"] for t in ticks], 1000),
+            "tick_jitter_ms": distribution([t["jitter"] for t in ticks if "jitter" in t], 1000),
+            "between_tests_s": distribution([t["gap"] for t in self.tests if t["gap"] is not None]),
+            "requests": sum(t["requests"] for t in self.tests),
+            "request_seconds": sum(t["request_seconds"] for t in self.tests),
+            "suite_seconds": suite_seconds,
+            "traffic_seconds": traffic_seconds,
+            "overhead_seconds": overhead_seconds,
+            "overhead_fraction": overhead_seconds / suite_seconds if suite_seconds else None,
+            # same tests at clock scale 1, the harness work does not scale with the clock
+            "real_time_overhead_fraction": (
+                overhead_seconds / (overhead_seconds + traffic_seconds * self.scale)
+                if suite_seconds else None
+            ),
+        }
+        if self.trace_allocations:
+            summary["tick_allocated_kib"] = distribution(
+                [t["allocated"] for t in ticks], 1 / 1024
+            )
+            summary["memory_growth_kib"] = (self.memory_end - self.memory_start) / 1024
+        return summary
+
+
+class MeasuredClient:
+    """CfClient wrapper timing every request for an OverheadMonitor"""
+
+    def __init__(self, cf, monitor):
+        self.cf = cf
+        self.monitor = monitor
+
+    def __getattr__(self, name):
+        attribute = getattr(self.cf, name)
+        if not callable(attribute):
+            return attribute
+
+        def measured(*args, **kwargs):
+            start = time.perf_counter()
+            result = attribute(*args, **kwargs)
+            self.monitor.request(name, time.perf_counter() - start, result)
+            return result
+
+        return measured
@@ -0,0 +1,148 @@
+"""Opt in profiling of the test phases and report steps
+
+CfRunTest and run_test_list enter a phase for each part of a test, e.g. setup,
+startup, control, ramp_seek, goal_seek, sustain, stop and the report steps.
+PhaseProfiler keeps one cProfile profile per phase of the current test, a phase
+entered again, like goal_seek every interval, adds to its profile. Nested phases
+pause the outer one, a function is counted in the innermost phase only.
+
+At the end of a test the profiles are written as <nn>_<test name>_<phase>.prof,
+readable with pstats or snakeviz, and a top N summary with the allocation growth
+of the test is appended to profile_summary.txt.
+"""
+import contextlib
+import cProfile
+import logging
+import pathlib
+import pstats
+import re
+import time
+import tracemalloc
+
+log = logging.getLogger(__name__)
+
+
+class NullProfiler:
+    """Default profiler of CfRunTest, phases are not profiled"""
+
+    @staticmethod
+    def phase(name):
+        return contextlib.nullcontext()
+
+    def end_test(self, test_name):
+        pass
+
+    def close(self):
+        pass
+
+
+class PhaseProfiler:
+    """Profiles the phases of each test with cProfile and tracemalloc
+
+    :param profile_dir: directory of the profile files, created if missing
+    :param top: functions and allocation sites in the summary
+    :param trace_allocations: trace allocations with tracemalloc, slows the harness
+    """
+
+    def __init__(self, profile_dir, top=20, trace_allocations=True):
+        self.profile_dir = pathlib.Path(profile_dir)
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        self.summary_file = self.profile_dir / "profile_summary.txt"
+        self.top = top
+        self.trace_allocations = trace_allocations
+        self.profiles = {}
+        self.phase_stats = {}
+        self.stack = []
+        self.tests = 0
+        self.started_tracing = False
+        self.snapshot = None
+        if trace_allocations:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.started_tracing = True
+            self.snapshot = self.take_snapshot()
+
+    @staticmethod
+    def take_snapshot():
+        return tracemalloc.take_snapshot().filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+            )
+        )
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        if self.stack:
+            self.profiles[self.stack[-1]].disable()
+        profile = self.profiles.setdefault(name, cProfile.Profile())
+        stats = self.phase_stats.setdefault(
+            name, {"entries": 0, "seconds": 0.0, "growth": 0}
+        )
+        self.stack.append(name)
+        memory = tracemalloc.get_traced_memory()[0] if self.trace_allocations else 0
+        start = time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            stats["entries"] += 1
+            stats["seconds"] += time.perf_counter() - start
+            if self.trace_allocations:
+                stats["growth"] += tracemalloc.get_traced_memory()[0] - memory
+            self.stack.pop()
+            if self.stack:
+                self.profiles[self.stack[-1]].enable()
+
+    def top_functions(self, profile):
+        """Lines of the functions with the most own time"""
+        stats = pstats.Stats(profile).stats
+        rows = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)
+        lines = []
+        for (file_name, line, function), (cc, nc, tt, ct, callers) in rows[: self.top]:
+            lines.append(
+                f"    {tt:9.4f}s {ct:9.4f}s {nc:>8} "
+                f"{pathlib.Path(file_name).name}:{line}({function})"
+            )
+        return lines
+
+    def end_test(self, test_name):
+        """Writes the profiles of the test and starts new ones for the next test
+
+        :param test_name: test name, used in the file names
+        :return: None
+        """
+        self.tests += 1
+        file_name = re.sub(r"[^\w.-]", "_", str(test_name))
+        prefix = f"{self.tests:02d}_{file_name}"
+        lines = [f"== {prefix}"]
+        for name, profile in self.profiles.items():
+            stats = self.phase_stats[name]
+            profile_file = self.profile_dir / f"{prefix}_{name}.prof"
+            profile.dump_stats(profile_file)
+            lines.append(
+                f"-- {name}: {stats['entries']} entries, {stats['seconds']:.3f}s, "
+                f"memory growth {stats['growth'] / 1024:,.1f} KiB, {profile_file.name}"
+            )
+            lines.append(f"    {'tottime':>10} {'cumtime':>10} {'calls':>8} function")
+            lines.extend(self.top_functions(profile))
+        if self.trace_allocations:
+            snapshot = self.take_snapshot()
+            lines.append("-- allocation growth of the test")
+            for stat in snapshot.compare_to(self.snapshot, "lineno")[: self.top]:
+                lines.append(f"    {stat}")
+            self.snapshot = snapshot
+        with open(self.summary_file, "a") as f:
+            f.write("\n".join(lines) + "\n\n")
+        log.info(f"profiles of {test_name} written to {self.profile_dir}")
+        self.profiles = {}
+        self.phase_stats = {}
+
+    def close(self):
+        if self.profiles:
+            self.end_test("unfinished")
+        if self.started_tracing:
+            tracemalloc.stop()
+            self.started_tracing = False
@@ -0,0 +1,163 @@
+import gzip
+import json
+import logging
+import queue
+import threading
+import time
+import zlib
+
+log = logging.getLogger(__name__)
+
+# record kinds written by CfRunTest
+raw_kinds = ["test_details", "test_config", "queue", "test_run", "statistics"]
+
+
+def raw_archive_file(report_csv_file):
+    """Raw archive next to the detailed csv file, e.g. 20201120-1530_Raw.jsonl.gz"""
+    name = report_csv_file.stem
+    if name.endswith("_Detailed"):
+        name = name[: -len("_Detailed")]
+    return report_csv_file.with_name(f"{name}_Raw.jsonl.gz")
+
+
+class RawArchive:
+    """Append only archive of the raw controller payloads of a run
+
+    One gzip compressed JSON line per payload with time, kind, test_id, run_id, name
+    and data keys. Payloads are queued and serialized by a writer thread, the queue
+    is bounded by max_queue records, payloads are dropped and counted when it is full
+    so the control loop never waits on the disk.
+
+    flush() waits for the queued payloads and sync flushes the gzip stream, the file
+    can be read up to that point even if the run is interrupted.
+    """
+
+    def __init__(self, archive_file, max_queue=1024, compresslevel=6):
+        self.archive_file = archive_file
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.dropped = 0
+        self.written = 0
+        self.error = None
+        self.file = gzip.open(archive_file, "ab", compresslevel=compresslevel)
+        self.thread = threading.Thread(
+            target=self.write_records, name="raw-archive", daemon=True
+        )
+        self.thread.start()
+
+    def add(self, kind, test_id, run_id, name, data):
+        record = {
+            "time": time.time(),
+            "kind": kind,
+            "test_id": test_id,
+            "run_id": run_id,
+            "name": name,
+            "data": data,
+        }
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped == 1:
+                log.error(f"Raw archive queue full, dropping payloads: {self.archive_file}")
+
+    def write_records(self):
+        while True:
+            record = self.queue.get()
+            try:
+                if record is None:
+                    return
+                if isinstance(record, threading.Event):
+                    self.file.flush(zlib.Z_SYNC_FLUSH)
+                    record.set()
+                    continue
+                line = json.dumps(record, separators=(",", ":"), default=str)
+                self.file.write(line.encode("utf-8") + b"\n")
+                self.written += 1
+            except Exception as detailed_exception:
+                # keep consuming the queue, the run is more important than the archive
+                if self.error is None:
+                    log.error(
+                        f"Exception occurred writing the raw archive {self.archive_file}: "
+                        f"\n<{detailed_exception}>"
+                    )
+                self.error = detailed_exception
+                if isinstance(record, threading.Event):
+                    record.set()
+            finally:
+                self.queue.task_done()
+
+    def flush(self, timeout=30):
+        if not self.thread.is_alive():
+            return
+        flushed = threading.Event()
+        self.queue.put(flushed)
+        flushed.wait(timeout)
+
+    def close(self):
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        self.file.close()
+        if self.dropped:
+            report_error = f"Raw archive dropped {self.dropped} payloads: {self.archive_file}"
+            log.error(report_error)
+            print(report_error)
+
+
+class RawArchiveReader:
+    """Iterates the records of a raw archive lazily, one line at a time
+
+    The archive of an interrupted run has no gzip trailer, records are read up to
+    the last complete line.
+    """
+
+    def __init__(self, archive_file):
+        self.archive_file = archive_file
+
+    def records(self, kind=None, name=None, run_id=None):
+        """Archive records in the order they were written
+
+        :param kind: only records of this kind, e.g. "statistics"
+        :param name: only records of this test name
+        :param run_id: only records of this test run id
+        :return: generator of dicts with time, kind, test_id, run_id, name and data keys
+        """
+        with gzip.open(self.archive_file, "rb") as f:
+            try:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    record = json.loads(line)
+                    if kind is not None and record["kind"] != kind:
+                        continue
+                    if name is not None and record["name"] != name:
+                        continue
+                    if run_id is not None and record["run_id"] != run_id:
+                        continue
+                    yield record
+            except (EOFError, gzip.BadGzipFile, zlib.error) as detailed_exception:
+                log.debug(
+                    f"Raw archive {self.archive_file} ends early: \n<{detailed_exception}>"
+                )
+
+    def runs(self):
+        """Test runs in the archive
+
+        :return: list of dicts with run_id, test_id, name and samples keys
+        """
+        runs = {}
+        for record in self.records(kind="statistics"):
+            run = runs.setdefault(
+                record["run_id"],
+                {
+                    "run_id": record["run_id"],
+                    "test_id": record["test_id"],
+                    "name": record["name"],
+                    "samples": 0,
+                },
+            )
+            run["samples"] += 1
+        return list(runs.values())
+
+    def __iter__(self):
+        return self.records()
@@ -0,0 +1,192 @@
+import contextlib
+import copy
+import csv
+import io
+import logging
+
+from cf_common.CfClock import VirtualClock
+from cf_common.CfRawArchive import RawArchiveReader
+from cf_common.CfRunTest import CfRunTest, detailed_report_schema
+
+log = logging.getLogger(__name__)
+
+
+def stat_value(stats, stat_type, sub_type=None, side="client"):
+    """Value of a counter in a raw statistics payload
+
+    :param stats: fetch_test_run_statistics payload
+    :param stat_type: counter type, e.g. timeElapsed or sum
+    :param sub_type: counter sub type, e.g. desiredLoadSpecCount
+    :return: value or None if the payload has no such counter
+    """
+    for i in stats.get(side, []):
+        if i.get("type") == stat_type and i.get("subType") == sub_type:
+            return i.get("value")
+    return None
+
+
+def load_changes(stats_list):
+    """Load changes of a run, from the desired load of its statistics
+
+    The seconds are of the first sample with the new desired load, a few samples
+    after the load change was requested.
+
+    :param stats_list: statistics payloads in run order
+    :return: list of dicts with seconds and load keys
+    """
+    changes = []
+    last_load = None
+    for stats in stats_list:
+        load = stat_value(stats, "sum", "desiredLoadSpecCount")
+        if load is None:
+            continue
+        if last_load is not None and load != last_load:
+            changes.append({"seconds": stat_value(stats, "timeElapsed"), "load": load})
+        last_load = load
+    return changes
+
+
+class ReplayClient:
+    """CfClient stand in that answers CfRunTest from an archived test run
+
+    Statistics and test run updates are returned in the order they were archived,
+    load changes and stop requests are recorded but do not change the samples.
+    When the statistics run out, the last sample is returned with no time remaining
+    so the test stops.
+    """
+
+    def __init__(self, reader, run_id):
+        self.controller_ip = "replay"
+        self.exception_state = True
+        self.reader = reader
+        self.run_id = run_id
+        self.first = {}
+        for record in reader.records(run_id=run_id):
+            if record["kind"] == "statistics":
+                break
+            self.first.setdefault(record["kind"], record["data"])
+        missing = {"test_details", "test_config", "queue", "test_run"} - set(self.first)
+        if missing:
+            raise ValueError(
+                f"run {run_id} in {reader.archive_file} can not be replayed, "
+                f"missing {', '.join(sorted(missing))}"
+            )
+        self.test_details = self.first["test_details"]
+        self.test_runs = reader.records(kind="test_run", run_id=run_id)
+        # the first test run record is the start_test response
+        next(self.test_runs)
+        self.statistics = reader.records(kind="statistics", run_id=run_id)
+        self.last_test_run = self.first["test_run"]
+        self.last_stats = None
+        self.load_changes = []
+        self.stopped_at = None
+
+    def get_test(self, test_type, test_id, outfile=None):
+        return copy.deepcopy(self.first["test_config"])
+
+    def get_queue(self, queue_id):
+        return copy.deepcopy(self.first["queue"])
+
+    def update_test(self, test_type, test_id, config):
+        return {"id": test_id}
+
+    def start_test(self, test_id):
+        return copy.deepcopy(self.first["test_run"])
+
+    def get_test_run(self, run_id):
+        record = next(self.test_runs, None)
+        if record is not None:
+            self.last_test_run = record["data"]
+        elif self.stopped_at is not None:
+            self.last_test_run = dict(self.last_test_run, status="finished")
+        return self.last_test_run
+
+    def fetch_test_run_statistics(self, run_id):
+        record = next(self.statistics, None)
+        if record is None:
+            # end of the archived run
+            stats = copy.deepcopy(self.last_stats or {"client": [], "server": []})
+            for i in stats.get("client", []):
+                if i.get("type") == "timeRemaining":
+                    i["value"] = 0
+            return stats
+        self.last_stats = record["data"]
+        return self.last_stats
+
+    def elapsed(self):
+        if self.last_stats is None:
+            return 0
+        return stat_value(self.last_stats, "timeElapsed")
+
+    def change_load(self, run_id, load):
+        self.load_changes.append({"seconds": self.elapsed(), "load": load})
+        return {}
+
+    def stop_test(self, run_id):
+        self.stopped_at = self.elapsed()
+        return {}
+
+    def list_test_runs(self):
+        return []
+
+
+class ReplayResults:
+    """Result file of replayed tests, the detailed report rows are kept in memory"""
+
+    def __init__(self):
+        self.rows = []
+
+    def append_file(self, csv_list):
+        self.rows.append(csv_list)
+
+    def add_raw(self, kind, test_id, run_id, name, data):
+        pass
+
+    def end_test(self):
+        pass
+
+    def write(self, csv_file):
+        with open(csv_file, "w", newline="") as f:
+            writer = csv.writer(f, lineterminator="\n")
+            writer.writerow(list(detailed_report_schema))
+            writer.writerows(self.rows)
+
+
+def replay_run(reader, run_id, overrides=None, results=None, quiet=True):
+    """Runs the control logic of CfRunTest on an archived test run
+
+    The run_tests.csv row of the run is used with overrides applied, e.g.
+    {"max_variance": "0.02"}, to see which load changes other settings would make.
+
+    :param reader: RawArchiveReader or archive file
+    :param run_id: test run id, see RawArchiveReader.runs()
+    :param overrides: run_tests.csv columns to change
+    :param results: ReplayResults to add the detailed report rows to
+    :param quiet: do not print the test progress
+    :return: dict with name, run_id, original, replay, stopped_at and phase keys
+    """
+    if not isinstance(reader, RawArchiveReader):
+        reader = RawArchiveReader(reader)
+    if results is None:
+        results = ReplayResults()
+    cf = ReplayClient(reader, run_id)
+    test_details = dict(cf.test_details)
+    test_details.update({k: str(v) for k, v in (overrides or {}).items()})
+    progress = contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext()
+    with progress:
+        rt = CfRunTest(cf, test_details, results, None, clock=VirtualClock())
+        rt.control_test()
+    log.info(
+        f"replayed {rt.name} {run_id}: {len(cf.load_changes)} load changes, "
+        f"stopped at {cf.stopped_at}s"
+    )
+    return {
+        "name": rt.name,
+        "run_id": run_id,
+        "original": load_changes(
+            r["data"] for r in reader.records(kind="statistics", run_id=run_id)
+        ),
+        "replay": cf.load_changes,
+        "stopped_at": cf.stopped_at,
+        "phase": rt.phase,
+    }
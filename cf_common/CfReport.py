@@ -0,0 +1,493 @@
+import logging
+import pathlib
+
+import numpy as np
+import pandas as pd
+
+from cf_common.CfRunTest import detailed_report_schema
+
+log = logging.getLogger(__name__)
+
+default_steady_states = ["steady"]
+
+
+class Report:
+    """Summary of a detailed csv report, one row per test
+
+    Only the columns the summary needs are loaded, strings as categoricals and
+    numbers downcast. Files larger than memory_budget bytes are read in chunks of
+    chunk_rows lines and reduced per test as they stream.
+    """
+
+    # steady state mean values
+    mean_cols = [
+        "cps",
+        "tps",
+        "total_bandwidth",
+        "open_conns",
+        "tcp_avg_tt_synack",
+        "tcp_avg_ttfb",
+        "url_response_time",
+        "client_cpu",
+        "client_pkt_mem",
+        "client_rcv_queue",
+        "server_cpu",
+        "server_pkt_mem",
+        "server_rcv_queue",
+    ]
+    # maximum values for all states
+    max_cols = [
+        "successful_txn",
+        "unsuccessful_txn",
+        "aborted_txn",
+        "total_tcp_established",
+        "total_tcp_attempted",
+        "seconds",
+        "current_load",
+        "t_run",
+        "t_start",
+        "t_tx",
+        "t_stop",
+    ]
+    # steady vs. all state max, reported with _max added to column name
+    max_compare_cols = ["cps", "tps", "total_bandwidth"]
+    # small values rounded to one digit, safe to keep as float32
+    float32_cols = {
+        "tcp_avg_tt_synack",
+        "tcp_avg_ttfb",
+        "url_response_time",
+        "client_cpu",
+        "server_cpu",
+    }
+
+    # html table column styles
+    column_props = {
+        "test_name": {"width": "20em", "min-width": "14em", "text-align": "left"},
+        "cps": {"width": "6em", "min-width": "5em", "text-align": "right"},
+        "tps": {"width": "6em", "min-width": "5em", "text-align": "right"},
+        "cps_max": {"width": "6em", "min-width": "5em", "text-align": "right"},
+        "tps_max": {"width": "6em", "min-width": "5em", "text-align": "right"},
+        "total_bandwidth": {
+            "width": "8em",
+            "min-width": "7em",
+            "text-align": "right",
+        },
+        "total_bandwidth_max": {
+            "width": "8em",
+            "min-width": "7em",
+            "text-align": "right",
+        },
+        "open_conns": {"width": "8em", "min-width": "7em", "text-align": "right"},
+        "tcp_avg_tt_synack": {
+            "width": "3.7em",
+            "min-width": "3.7em",
+            "text-align": "right",
+        },
+        "tcp_avg_ttfb": {
+            "width": "3.7em",
+            "min-width": "3.7em",
+            "text-align": "right",
+        },
+        "url_response_time": {
+            "width": "3.7em",
+            "min-width": "3.7em",
+            "text-align": "right",
+        },
+        "report": {"width": "3.7em", "min-width": "3.7em", "text-align": "right"},
+        "successful_txn": {
+            "width": "8em",
+            "min-width": "7em",
+            "text-align": "right",
+        },
+        "total_tcp_established": {
+            "width": "5em",
+            "min-width": "5em",
+            "text-align": "right",
+        },
+        "total_tcp_attempted": {
+            "width": "5em",
+            "min-width": "5em",
+            "text-align": "right",
+        },
+        "seconds": {"width": "3.7em", "min-width": "3.7em", "text-align": "right"},
+        "tps_stdy_min": {"width": "3.2em", "min-width": "3.2em", "text-align": "right"},
+        "tps_stdy_max": {"width": "3.2em", "min-width": "3.2em", "text-align": "right"},
+        "tps_stdy_delta": {
+            "width": "3.2em",
+            "min-width": "3.2em",
+            "text-align": "right",
+        },
+        "client_cpu": {"width": "3em", "min-width": "3em", "text-align": "right"},
+        "server_cpu": {"width": "3em", "min-width": "3em", "text-align": "right"},
+        "client_pkt_mem": {
+            "width": "3.5em",
+            "min-width": "3.5em",
+            "text-align": "right",
+        },
+        "client_rcv_queue": {
+            "width": "3.5em",
+            "min-width": "3.5em",
+            "text-align": "right",
+        },
+        "server_pkt_mem": {
+            "width": "3.9em",
+            "min-width": "3.9em",
+            "text-align": "right",
+        },
+        "server_rcv_queue": {
+            "width": "3.9em",
+            "min-width": "3.9em",
+            "text-align": "right",
+        },
+        "current_load": {
+            "width": "3.7em",
+            "min-width": "3.7em",
+            "text-align": "right",
+        },
+        "unsuccessful_txn": {
+            "width": "3.8em",
+            "min-width": "3.8em",
+            "text-align": "right",
+        },
+        "aborted_txn": {
+            "width": "3.5em",
+            "min-width": "3.5em",
+            "text-align": "right",
+        },
+        "max_tps_seconds": {
+            "width": "3.7em",
+            "min-width": "3.7em",
+            "text-align": "right",
+        },
+        "max_tps_load": {
+            "width": "3.7em",
+            "min-width": "3.7em",
+            "text-align": "right",
+        },
+        "t_run": {"width": "3em", "min-width": "3.7em", "text-align": "right"},
+        "t_start": {"width": "3em", "min-width": "3em", "text-align": "right"},
+        "t_tx": {"width": "3em", "min-width": "3em", "text-align": "right"},
+        "t_stop": {"width": "3em", "min-width": "3em", "text-align": "right"},
+        "version": {"width": "3em", "min-width": "3em", "text-align": "right"},
+    }
+
+    def __init__(
+        self,
+        report_csv_file,
+        column_order,
+        memory_budget=256000000,
+        chunk_rows=200000,
+        results=None,
+        chunks=None,
+        steady_states=None,
+    ):
+        """
+        :param results: formatted summary rows, e.g. from a summary cache.
+         When set the detailed csv file is not read.
+        :param chunks: iterable of DataFrames with detailed report rows, e.g.
+         from ResultsStore.detailed_frames. When set the detailed csv file is not read.
+        :param steady_states: states averaged as the steady state, default ["steady"],
+         e.g. ["steady", "goalseek"] to include the goal seek samples
+        """
+        self.report_csv_file = report_csv_file
+        self.steady_states = list(steady_states or default_steady_states)
+        self.col_order = column_order
+        self.memory_budget = memory_budget
+        self.chunk_rows = chunk_rows
+        self.chunks = chunks
+        self.df_base = None
+        if results is None:
+            self.unique_tests = []
+            self.results = []
+            self.process_results()
+            self.format_results()
+        else:
+            self.results = results
+            self.unique_tests = [d["test_name"] for d in results]
+        self.df_results = pd.DataFrame(self.results)
+        self.df_results = self.df_results.reindex(columns=self.col_order)
+        self.df_filter = pd.DataFrame(self.df_results)
+
+    def report_columns(self):
+        return (
+            {"test_name", "state", "version", "report"}
+            | set(self.mean_cols)
+            | set(self.max_cols)
+            | set(self.max_compare_cols)
+        )
+
+    def read_detailed_csv(self, chunksize=None):
+        """Reads the detailed csv with only the summary columns and typed strings
+
+        :param chunksize: None to read the whole file, otherwise rows per chunk
+        :return: DataFrame or iterator of DataFrames
+        """
+        use_cols = self.report_columns()
+        dtypes = {
+            k: "category"
+            for k, v in detailed_report_schema.items()
+            if k in use_cols and v in {"category", "str"}
+        }
+        return pd.read_csv(
+            self.report_csv_file,
+            usecols=lambda c: c in use_cols,
+            dtype=dtypes,
+            chunksize=chunksize,
+        )
+
+    def downcast(self, df):
+        for col in df.columns:
+            col_type = detailed_report_schema.get(col)
+            if col_type == "int":
+                df[col] = pd.to_numeric(df[col], downcast="integer")
+            elif col_type == "float" and col in self.float32_cols:
+                df[col] = df[col].astype("float32")
+        return df
+
+    def process_results(self):
+        if self.chunks is not None:
+            chunks = self.chunks
+        elif self.memory_budget is not None and (
+            pathlib.Path(self.report_csv_file).stat().st_size > self.memory_budget
+        ):
+            log.info(
+                f"Reading {self.report_csv_file} in chunks of {self.chunk_rows} rows"
+            )
+            chunks = self.read_detailed_csv(chunksize=self.chunk_rows)
+        else:
+            self.df_base = self.downcast(self.read_detailed_csv())
+            chunks = [self.df_base]
+
+        totals = {}
+        for chunk in chunks:
+            self.reduce_chunk(self.downcast(chunk), totals)
+        self.unique_tests = list(totals)
+
+        for name, t in totals.items():
+            d = {}
+            d["test_name"] = name
+            for col in self.mean_cols:
+                count = t["steady_count"][col]
+                d[col] = t["steady_sum"][col] / count if count else np.nan
+            for col in self.max_cols:
+                d[col] = t["max"][col]
+            # seconds is the maximum of the steady state
+            d["seconds"] = t["steady_max"]["seconds"]
+            for col in self.max_compare_cols:
+                d[col + "_max"] = t["max"][col]
+            # current_load and seconds at max tps
+            d["max_tps_load"] = t["max_tps_load"]
+            d["max_tps_seconds"] = t["max_tps_seconds"]
+            d["version"] = t["version"]
+            d["report"] = t["report"]
+
+            # min and max tps from steady phase
+            d["tps_stdy_min"] = t["steady_min"]["tps"]
+            d["tps_stdy_max"] = t["steady_max"]["tps"]
+            if d["tps_stdy_min"] != 0 and not pd.isna(d["tps_stdy_min"]):
+                d["tps_stdy_delta"] = round(
+                    ((d["tps_stdy_max"] - d["tps_stdy_min"]) / d["tps_stdy_min"])
+                    * 100,
+                    3,
+                )
+            else:
+                d["tps_stdy_delta"] = 0
+
+            self.results.append(d)
+
+    @staticmethod
+    def combine(func, total, value):
+        """Applies min or max to a running total, skipping missing values"""
+        if pd.isna(total):
+            return value
+        if pd.isna(value):
+            return total
+        return func(total, value)
+
+    def reduce_chunk(self, df, totals):
+        """Adds the per test aggregates of one chunk of rows to totals
+
+        :param df: chunk of the detailed report
+        :param totals: dict of test name to running aggregates, updated in place
+        :return: None
+        """
+        df_steady = df[df.state.isin(self.steady_states)]
+        by_test = df.groupby("test_name", observed=True)
+        by_test_steady = df_steady.groupby("test_name", observed=True)
+        chunk_max = by_test[self.max_cols + self.max_compare_cols].max()
+        steady_sum = by_test_steady[self.mean_cols].sum()
+        steady_count = by_test_steady[self.mean_cols].count()
+        steady_max = by_test_steady[["seconds", "tps"]].max()
+        steady_min = by_test_steady[["tps"]].min()
+        versions = by_test["version"].first()
+        reports = by_test["report"].last()
+        df_tps = df.dropna(subset=["tps"])
+        max_tps_rows = df_tps.loc[
+            df_tps.groupby("test_name", observed=True)["tps"].idxmax()
+        ].set_index("test_name")
+
+        for name in df["test_name"].dropna().unique().tolist():
+            t = totals.get(name)
+            if t is None:
+                t = {
+                    "steady_sum": dict.fromkeys(self.mean_cols, 0.0),
+                    "steady_count": dict.fromkeys(self.mean_cols, 0),
+                    "max": dict.fromkeys(self.max_cols + self.max_compare_cols, np.nan),
+                    "steady_max": {"seconds": np.nan, "tps": np.nan},
+                    "steady_min": {"tps": np.nan},
+                    "max_tps": np.nan,
+                    "max_tps_load": np.nan,
+                    "max_tps_seconds": np.nan,
+                    "version": np.nan,
+                    "report": np.nan,
+                }
+                totals[name] = t
+            for col in t["max"]:
+                t["max"][col] = self.combine(max, t["max"][col], chunk_max.at[name, col])
+            if name in steady_sum.index:
+                for col in self.mean_cols:
+                    t["steady_sum"][col] += float(steady_sum.at[name, col])
+                    t["steady_count"][col] += int(steady_count.at[name, col])
+                for col in t["steady_max"]:
+                    t["steady_max"][col] = self.combine(
+                        max, t["steady_max"][col], steady_max.at[name, col]
+                    )
+                t["steady_min"]["tps"] = self.combine(
+                    min, t["steady_min"]["tps"], steady_min.at[name, "tps"]
+                )
+            if name in max_tps_rows.index:
+                row = max_tps_rows.loc[name]
+                if pd.isna(t["max_tps"]) or row["tps"] > t["max_tps"]:
+                    t["max_tps"] = row["tps"]
+                    t["max_tps_load"] = row["current_load"]
+                    t["max_tps_seconds"] = row["seconds"]
+            if pd.isna(t["version"]):
+                t["version"] = versions.get(name, np.nan)
+            if not pd.isna(reports.get(name, np.nan)):
+                t["report"] = reports[name]
+
+    def reset_df_filter(self):
+        self.df_filter = pd.DataFrame(self.df_results)
+
+    def filter_rows_containing(self, test_name_contains):
+        if test_name_contains is not None:
+            self.df_filter = self.df_filter[
+                self.df_filter.test_name.str.contains(test_name_contains)
+            ].copy()
+
+    def filter_columns(self, filtered_columns):
+        if filtered_columns is not None:
+            self.df_filter.drop(
+                self.df_filter.columns.difference(filtered_columns), 1, inplace=True
+            )
+
+    def format_results(self):
+        for row_num, row in enumerate(self.results):
+            for key, value in row.items():
+                if key in {
+                    "cps",
+                    "tps",
+                    "total_bandwidth",
+                    "open_conns",
+                    "successful_txn",
+                    "unsuccessful_txn",
+                    "aborted_txn",
+                    "total_tcp_established",
+                    "total_tcp_attempted",
+                    "tps_stdy_min",
+                    "tps_stdy_max",
+                    "cps_max",
+                    "tps_max",
+                    "total_bandwidth_max",
+                    "max_tps_load",
+                    "client_mem",
+                    "client_pkt_mem",
+                    "client_rcv_queue",
+                    "server_mem",
+                    "server_pkt_mem",
+                    "server_rcv_queue",
+                    "t_run",
+                    "t_start",
+                    "t_tx",
+                    "t_stop",
+                }:
+                    self.results[row_num][key] = f"{value:,.0f}"
+                elif key in {
+                    "tcp_avg_ttfb",
+                    "url_response_time",
+                    "tcp_avg_tt_synack",
+                    "client_cpu",
+                    "server_cpu",
+                }:
+                    self.results[row_num][key] = f"{value:,.1f}"
+                elif key in {"tps_stdy_delta"}:
+                    self.results[row_num][key] = f"{value:,.2f}"
+                elif key in {"report"}:
+                    self.results[row_num][key] = f'<a href="{value}">link</a>'
+
+    @staticmethod
+    def style_a():
+        styles = [
+            # table properties
+            dict(
+                selector=" ",
+                props=[
+                    ("margin", "0"),
+                    ("width", "100%"),
+                    ("font-family", '"Helvetica", "Arial", sans-serif'),
+                    ("border-collapse", "collapse"),
+                    ("border", "none"),
+                    ("border", "2px solid #ccf"),
+                    # ("min-width", "600px"),
+                    ("overflow", "auto"),
+                    ("overflow-x", "auto"),
+                ],
+            ),
+            # header color - optional
+            dict(
+                selector="thead",
+                props=[
+                    ("background-color", "SkyBlue"),
+                    ("width", "100%")
+                    # ("display", "table") # adds fixed scrollbar
+                    # ("position", "fixed")
+                ],
+            ),
+            # background shading
+            dict(
+                selector="tbody tr:nth-child(even)",
+                props=[("background-color", "#fff")],
+            ),
+            dict(
+                selector="tbody tr:nth-child(odd)", props=[("background-color", "#eee")]
+            ),
+            # cell spacing
+            dict(selector="td", props=[("padding", ".5em")]),
+            # header cell properties
+            dict(
+                selector="th",
+                props=[
+                    ("font-size", "100%"),
+                    ("text-align", "center"),
+                    ("min-width", "25px"),
+                    ("max-width", "50px"),
+                    ("word-wrap", "break-word"),
+                ],
+            ),
+            # render hover last to override background-color
+            dict(selector="tbody tr:hover", props=[("background-color", "SkyBlue")]),
+        ]
+        return styles
+
+    def html_table(self, selected_style):
+        # html = ''
+        all_columns = set(self.df_filter.columns)
+        html = self.df_filter.style.set_properties(
+            subset="test_name", **self.column_props["test_name"]
+        )
+        for k, v in self.column_props.items():
+            if k in all_columns:
+                html = html.set_properties(subset=k, **v)
+        html = html.set_table_styles(selected_style).hide_index().render()
+
+        return html
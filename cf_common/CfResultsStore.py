@@ -0,0 +1,301 @@
+import logging
+import os
+import sqlite3
+import time
+
+from cf_common.CfRunTest import detailed_report_schema
+
+log = logging.getLogger(__name__)
+
+# detailed report columns kept once per test instead of per sample
+test_columns = [
+    "test_name",
+    "test_id",
+    "run_id",
+    "test_type_v1",
+    "test_type_v2",
+    "load_type",
+    "version",
+]
+sample_columns = [k for k in detailed_report_schema if k not in test_columns]
+sql_types = {
+    "category": "TEXT",
+    "str": "TEXT",
+    "bool": "INTEGER",
+    "int": "INTEGER",
+    "float": "REAL",
+}
+
+
+class ResultsStore:
+    """SQLite store of detailed results across test runs
+
+    - runs: one row per run_tests.py execution, keyed by the detailed csv time stamp,
+      the seconds and the process id
+    - tests: one row per test executed in a run
+    - samples: one row per control interval, same values as the detailed csv file
+
+    Samples are written with the detailed csv file and committed when it flushes.
+    """
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self.conn = sqlite3.connect(str(db_file))
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.create_tables()
+        self.run_key = None
+        self.test_pks = {}
+        self.sample_insert = (
+            f"INSERT INTO samples (test_pk, logged_at, {', '.join(sample_columns)}) "
+            f"VALUES ({', '.join(['?'] * (len(sample_columns) + 2))})"
+        )
+        self.sample_index = [
+            list(detailed_report_schema).index(k) for k in sample_columns
+        ]
+        self.test_index = {
+            k: list(detailed_report_schema).index(k) for k in test_columns
+        }
+
+    def create_tables(self):
+        sample_cols = ",\n".join(
+            f"{k} {sql_types[detailed_report_schema[k]]}" for k in sample_columns
+        )
+        self.conn.executescript(
+            f"""
+            CREATE TABLE IF NOT EXISTS runs (
+                run_key TEXT PRIMARY KEY,
+                started_at REAL,
+                label TEXT,
+                controller_version TEXT,
+                script_version REAL,
+                report_file TEXT
+            );
+            CREATE TABLE IF NOT EXISTS tests (
+                test_pk INTEGER PRIMARY KEY,
+                run_key TEXT REFERENCES runs(run_key),
+                started_at REAL,
+                test_name TEXT,
+                test_id TEXT,
+                run_id TEXT,
+                test_type_v1 TEXT,
+                test_type_v2 TEXT,
+                load_type TEXT,
+                version REAL
+            );
+            CREATE TABLE IF NOT EXISTS samples (
+                test_pk INTEGER REFERENCES tests(test_pk),
+                logged_at REAL,
+                {sample_cols}
+            );
+            CREATE INDEX IF NOT EXISTS runs_started_at ON runs(started_at);
+            CREATE INDEX IF NOT EXISTS tests_test_name ON tests(test_name, started_at);
+            CREATE INDEX IF NOT EXISTS tests_test_id ON tests(test_id);
+            CREATE INDEX IF NOT EXISTS tests_run_id ON tests(run_id);
+            CREATE INDEX IF NOT EXISTS tests_run_key ON tests(run_key);
+            CREATE INDEX IF NOT EXISTS samples_test_pk ON samples(test_pk, seconds);
+            CREATE INDEX IF NOT EXISTS samples_logged_at ON samples(logged_at);
+            """
+        )
+        self.conn.commit()
+
+    def start_run(
+        self,
+        run_key,
+        report_file=None,
+        script_version=None,
+        controller_version=None,
+        label=None,
+    ):
+        """Adds a run, samples added after this belong to it
+
+        :param run_key: run name, e.g. the detailed report time stamp
+        :param label: free text to group runs, e.g. DUT firmware build
+        :return: run key of the run, run_key with the seconds and process id
+        """
+        started_at = time.time()
+        # the report time stamp has minute resolution, runs in the same minute
+        # must not share a key
+        run_key = f"{run_key}{time.strftime('%S', time.localtime(started_at))}-{os.getpid()}"
+        taken = self.conn.execute(
+            "SELECT COUNT(*) FROM runs WHERE run_key = ? OR run_key LIKE ?",
+            (run_key, f"{run_key}-%"),
+        ).fetchone()[0]
+        if taken:
+            run_key = f"{run_key}-{taken}"
+        self.run_key = run_key
+        self.test_pks = {}
+        self.conn.execute(
+            "INSERT INTO runs VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                run_key,
+                started_at,
+                label,
+                controller_version,
+                script_version,
+                None if report_file is None else str(report_file),
+            ),
+        )
+        self.conn.commit()
+        return run_key
+
+    def test_pk(self, csv_list):
+        key = (
+            csv_list[self.test_index["test_name"]],
+            csv_list[self.test_index["run_id"]],
+        )
+        test_pk = self.test_pks.get(key)
+        if test_pk is None:
+            values = [csv_list[self.test_index[k]] for k in test_columns]
+            cursor = self.conn.execute(
+                f"INSERT INTO tests (run_key, started_at, {', '.join(test_columns)}) "
+                f"VALUES (?, ?, {', '.join(['?'] * len(test_columns))})",
+                [self.run_key, time.time()] + values,
+            )
+            test_pk = cursor.lastrowid
+            self.test_pks[key] = test_pk
+        return test_pk
+
+    def add_sample(self, csv_list):
+        """Adds one detailed report line
+
+        :param csv_list: values in detailed_report_schema order
+        :return: None
+        """
+        try:
+            values = [self.test_pk(csv_list), time.time()]
+            values.extend(csv_list[i] for i in self.sample_index)
+            self.conn.execute(self.sample_insert, values)
+        except sqlite3.Error as detailed_exception:
+            log.error(
+                f"Exception occurred writing to the results store: \n<{detailed_exception}>\n"
+            )
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+    # queries
+    def runs(self, limit=None, label=None):
+        """Runs newest first
+
+        :return: list of dicts
+        """
+        query = "SELECT * FROM runs"
+        params = []
+        if label is not None:
+            query += " WHERE label = ?"
+            params.append(label)
+        query += " ORDER BY started_at DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(int(limit))
+        return [dict(row) for row in self.conn.execute(query, params)]
+
+    def latest_run(self):
+        runs = self.runs(limit=1)
+        return runs[0] if runs else None
+
+    def tests(self, test_name=None, test_id=None, run_id=None, run_key=None, limit=None):
+        """Tests newest first, optionally filtered
+
+        :param test_name: test name without name suffix matches all suffixes
+        :return: list of dicts with test and run columns
+        """
+        query = (
+            "SELECT tests.*, runs.label, runs.controller_version "
+            "FROM tests JOIN runs ON tests.run_key = runs.run_key"
+        )
+        where = []
+        params = []
+        if test_name is not None:
+            # exact name or name followed by _name_suffix, as index range scans
+            where.append(
+                "(tests.test_name = ? OR "
+                "(tests.test_name >= ? AND tests.test_name < ?))"
+            )
+            params.extend([test_name, test_name + "_", test_name + "`"])
+        if test_id is not None:
+            where.append("tests.test_id = ?")
+            params.append(test_id)
+        if run_id is not None:
+            where.append("tests.run_id = ?")
+            params.append(run_id)
+        if run_key is not None:
+            where.append("tests.run_key = ?")
+            params.append(run_key)
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY tests.started_at DESC"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(int(limit))
+        return [dict(row) for row in self.conn.execute(query, params)]
+
+    def test_history(self, test_name, limit=10, state="steady"):
+        """Steady state averages and maximums of a test across runs, newest first
+
+        For example the last 10 firmware builds of T02-HTTP-CPS-16K:
+        store.test_history("T02-HTTP-CPS-16K", 10)
+
+        :return: list of dicts
+        """
+        history = []
+        for test in self.tests(test_name=test_name, limit=limit):
+            row = self.conn.execute(
+                "SELECT AVG(CASE WHEN state = ? THEN tps END) AS tps, "
+                "AVG(CASE WHEN state = ? THEN cps END) AS cps, "
+                "AVG(CASE WHEN state = ? THEN total_bandwidth END) AS total_bandwidth, "
+                "AVG(CASE WHEN state = ? THEN open_conns END) AS open_conns, "
+                "AVG(CASE WHEN state = ? THEN tcp_avg_ttfb END) AS tcp_avg_ttfb, "
+                "MAX(tps) AS tps_max, MAX(cps) AS cps_max, "
+                "MAX(total_bandwidth) AS total_bandwidth_max, "
+                "MAX(current_load) AS current_load, COUNT(*) AS samples "
+                "FROM samples WHERE test_pk = ?",
+                (state, state, state, state, state, test["test_pk"]),
+            ).fetchone()
+            test.update(dict(row))
+            history.append(test)
+        return history
+
+    def samples(self, test_pk):
+        """Samples of one test in time order
+
+        :return: iterator of dicts
+        """
+        cursor = self.conn.execute(
+            "SELECT * FROM samples WHERE test_pk = ? ORDER BY seconds, logged_at",
+            (test_pk,),
+        )
+        for row in cursor:
+            yield dict(row)
+
+    def detailed_frames(self, run_key, chunk_rows=200000):
+        """Samples of a run as DataFrames with the detailed csv columns
+
+        Can be passed to Report as chunks instead of reading the csv file.
+
+        :return: iterator of pandas DataFrames
+        """
+        import pandas as pd
+
+        columns = ", ".join(
+            f"tests.{k}" if k in test_columns else f"samples.{k}"
+            for k in detailed_report_schema
+        )
+        query = (
+            f"SELECT {columns} FROM samples "
+            f"JOIN tests ON samples.test_pk = tests.test_pk "
+            f"WHERE tests.run_key = ? ORDER BY samples.rowid"
+        )
+        for chunk in pd.read_sql_query(
+            query, self.conn, params=(run_key,), chunksize=chunk_rows
+        ):
+            for col, col_type in detailed_report_schema.items():
+                if col_type == "category":
+                    chunk[col] = chunk[col].astype("category")
+            yield chunk
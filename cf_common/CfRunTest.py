@@ -1,20 +1,26 @@
+import csv
 import json
 import logging
 import time
-import sys
 import os
-import numpy as np
-import pandas as pd
 import pathlib
-import sys
 import math
 
 script_version = 1.79
 
-project_dir = pathlib.Path().absolute().parent
-sys.path.append(str(project_dir))
-
 from cf_common.CfClient import *
+from cf_common.CfClock import SystemClock
+from cf_common.CfMetrics import NullMetrics
+from cf_common.CfProfile import NullProfiler
+
+
+def __getattr__(name):
+    # Report needs pandas, it is only imported when a summary report is made
+    if name == "Report":
+        from cf_common.CfReport import Report
+
+        return Report
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class RollingStats:
@@ -144,11 +150,20 @@ class RollingStats:
 
 
 class CfRunTest:
-    def __init__(self, cf, test_details, result_file, temp_file_dir):
+    def __init__(self, cf, test_details, result_file, temp_file_dir, debug_files=False,
+                 clock=None, profiler=None, metrics=None):
         log.info(f"script version: {script_version}")
         self.cf = cf  # CfClient instance
+        self.clock = SystemClock() if clock is None else clock  # time and sleep
+        # phases of the test, see CfProfile
+        self.profiler = NullProfiler() if profiler is None else profiler
+        # live samples of the test, see CfMetrics
+        self.metrics = NullMetrics() if metrics is None else metrics
+        self.poll_seconds = None  # duration of the last statistics request
+        self.test_details = test_details
         self.result_file = result_file
         self.temp_dir = temp_file_dir
+        self.debug_files = debug_files  # save test config and load update to temp_dir
         self.test_id = test_details["id"]
         self.type_v2 = test_details["type"]
         self.in_name = test_details["name"]
@@ -202,38 +217,39 @@ class CfRunTest:
         else:
             self.in_goal_seek = False
 
-        self.test_config = self.get_test_config()
-        self.queue_id = self.test_config["config"]["queue"]["id"]
-        self.queue_info = self.get_queue(self.queue_id)
-        self.queue_capacity = int(self.queue_info["capacity"])
-        log.info(f"queue_capacity: {self.queue_capacity}")
-        self.core_count = self.core_count_lookup(self.queue_info)
-        log.info(f"core_count: {self.core_count}")
-        self.client_port_count = len(self.test_config["config"]["interfaces"]["client"])
-        log.info(f"client_port_count: {self.client_port_count}")
-        self.server_port_count = len(self.test_config["config"]["interfaces"]["server"])
-        log.info(f"server_port_count: {self.server_port_count}")
-        self.client_core_count = int(
-            self.core_count
-            / (self.client_port_count + self.server_port_count)
-            * self.client_port_count
-        )
-        log.info(f"client_core_count: {self.client_core_count}")
-        self.in_capacity_adjust = self.check_capacity_adjust(
-            test_details["capacity_adj"],
-            self.in_load_type,
-            self.client_port_count,
-            self.client_core_count,
-        )
-        log.info(f"in_capacity_adjust: {self.in_capacity_adjust}")
-        self.load_constraints = {"enabled": False}
-        if not self.update_config_load():
-            report_error = f"unknown load_type with test type"
-            log.debug(report_error)
-            print(report_error)
-        self.test_config = self.get_test_config()
+        with self.profiler.phase("setup"):
+            self.test_config = self.get_test_config()
+            self.queue_id = self.test_config["config"]["queue"]["id"]
+            self.queue_info = self.get_queue(self.queue_id)
+            self.queue_capacity = int(self.queue_info["capacity"])
+            log.info(f"queue_capacity: {self.queue_capacity}")
+            self.core_count = self.core_count_lookup(self.queue_info)
+            log.info(f"core_count: {self.core_count}")
+            self.client_port_count = len(self.test_config["config"]["interfaces"]["client"])
+            log.info(f"client_port_count: {self.client_port_count}")
+            self.server_port_count = len(self.test_config["config"]["interfaces"]["server"])
+            log.info(f"server_port_count: {self.server_port_count}")
+            self.client_core_count = int(
+                self.core_count
+                / (self.client_port_count + self.server_port_count)
+                * self.client_port_count
+            )
+            log.info(f"client_core_count: {self.client_core_count}")
+            self.in_capacity_adjust = self.check_capacity_adjust(
+                test_details["capacity_adj"],
+                self.in_load_type,
+                self.client_port_count,
+                self.client_core_count,
+            )
+            log.info(f"in_capacity_adjust: {self.in_capacity_adjust}")
+            self.load_constraints = {"enabled": False}
+            if not self.update_config_load():
+                report_error = f"unknown load_type with test type"
+                log.debug(report_error)
+                print(report_error)
+            self.test_config = self.get_test_config()
 
-        self.test_run = self.start_test_run()
+            self.test_run = self.start_test_run()
         if not self.test_started:
             report_error = f"test did not start\n{json.dumps(self.test_run, indent=4)}"
             log.debug(report_error)
@@ -256,6 +272,10 @@ class CfRunTest:
         self.progress = self.test_run.get("progress")
         self.time_elapsed = self.test_run.get("timeElapsed")
         self.time_remaining = self.test_run.get("timeRemaining")
+        self.archive_raw("test_details", self.test_details)
+        self.archive_raw("test_config", self.test_config)
+        self.archive_raw("queue", self.queue_info)
+        self.archive_raw("test_run", self.test_run)
 
         self.run_link = (
             "https://"
@@ -360,8 +380,8 @@ class CfRunTest:
         self.kpi_2_list = []
         self.ramp_seek_kpi = self.rolling_tps
 
-        self.start_time = time.time()
-        self.timer = time.time() - self.start_time
+        self.start_time = self.clock.time()
+        self.timer = self.clock.time() - self.start_time
         self.time_to_run = 0
         self.time_to_start = 0
         self.time_to_activity = 0
@@ -394,12 +414,17 @@ class CfRunTest:
         if present:
             return int(value)
 
+    def debug_file(self, file_name):
+        if self.debug_files:
+            return self.temp_dir / file_name
+        return None
+
     def get_test_config(self):
         try:
             response = self.cf.get_test(
-                self.type_v2, self.test_id, self.temp_dir / "running_test_config.json"
+                self.type_v2, self.test_id, self.debug_file("running_test_config.json")
             )
-            log.debug(f"{json.dumps(response, indent=4)}")
+            log.debug("%s", LazyJson(response))
         except Exception as detailed_exception:
             log.error(
                 f"Exception occurred when retrieving the test: "
@@ -410,7 +435,7 @@ class CfRunTest:
     def get_queue(self, queue_id):
         try:
             response = self.cf.get_queue(queue_id)
-            log.debug(f"{json.dumps(response, indent=4)}")
+            log.debug("%s", LazyJson(response))
         except Exception as detailed_exception:
             log.error(
                 f"Exception occurred when retrieving test queue informationn: "
@@ -485,14 +510,13 @@ class CfRunTest:
                 }
             }
         }
-        with open(self.temp_dir / "test_load_update.json", "w") as f:
-            json.dump(load_update, f, indent=4)
+        if self.debug_files:
+            with open(self.temp_dir / "test_load_update.json", "w") as f:
+                json.dump(load_update, f, indent=4)
 
-        response = self.cf.update_test(
-            self.type_v2, self.test_id, self.temp_dir / "test_load_update.json"
-        )
+        response = self.cf.update_test(self.type_v2, self.test_id, load_update)
 
-        log.info(f"{json.dumps(response, indent=4)}")
+        log.info("%s", LazyJson(response))
         return True
 
     def update_load_constraints(self):
@@ -533,7 +557,7 @@ class CfRunTest:
     def start_test_run(self):
         try:
             response = self.cf.start_test(self.test_id)
-            log.info(f"{json.dumps(response, indent=4)}")
+            log.info("%s", LazyJson(response))
             self.test_started = True
         except Exception as detailed_exception:
             log.error(
@@ -543,8 +567,12 @@ class CfRunTest:
             self.test_started = False
         return response
 
+    def archive_raw(self, kind, data):
+        self.result_file.add_raw(kind, self.test_id, self.id, self.name, data)
+
     def update_test_run(self):
         self.test_run_update = self.cf.get_test_run(self.id)
+        self.archive_raw("test_run", self.test_run_update)
         self.status = self.test_run_update.get("status")  # main run status 'running'
         self.sub_status = self.test_run_update.get("subStatus")
         self.score = self.test_run_update.get("score")
@@ -614,7 +642,10 @@ class CfRunTest:
             log.info(f"goal seek phase: {self.phase}")
 
     def update_run_stats(self):
+        poll_start = time.perf_counter()
         get_run_stats = self.cf.fetch_test_run_statistics(self.id)
+        self.poll_seconds = time.perf_counter() - poll_start
+        self.archive_raw("statistics", get_run_stats)
         # log.debug(f'{get_run_stats}')
         self.update_client_stats(get_run_stats)
         self.update_server_stats(get_run_stats)
@@ -824,8 +855,8 @@ class CfRunTest:
         log.debug("Inside the RunTest/wait_for_running_status method.")
         i = 0
         while True:
-            time.sleep(4)
-            self.timer = int(round(time.time() - self.start_time))
+            self.clock.sleep(4)
+            self.timer = int(round(self.clock.time() - self.start_time))
             i += 4
             if not self.update_test_run():
                 return False
@@ -851,7 +882,7 @@ class CfRunTest:
                 return False
         self.time_to_run = self.timer
         log.debug(f"Test {self.name} successfully went to running status.")
-        log.debug(json.dumps(self.test_run_update, indent=4))
+        log.debug("%s", LazyJson(self.test_run_update))
         self.run_id = self.test_run_update.get("runId")
         self.report_link = (
             "https://"
@@ -875,9 +906,7 @@ class CfRunTest:
         # look for running status and compare ID
         for run in test_runs:
             if run["status"] == "running":
-                log.debug(
-                    f"check_running_tests found running test: {json.dumps(run, indent=4)}"
-                )
+                log.debug("check_running_tests found running test: %s", LazyJson(run))
                 # if waiting and running test IDs match, change the running test
                 if self.test_id == run["testId"]:
                     log.debug(
@@ -904,8 +933,8 @@ class CfRunTest:
         log.debug("Inside the RunTest/wait_for_running_sub_status method.")
         i = 0
         while True:
-            time.sleep(4)
-            self.timer = int(round(time.time() - self.start_time))
+            self.clock.sleep(4)
+            self.timer = int(round(self.clock.time() - self.start_time))
             i += 4
             if not self.update_test_run():
                 return False
@@ -926,7 +955,7 @@ class CfRunTest:
                 return False
         self.time_to_start = self.timer - self.time_to_run
         log.debug(f"Test {self.name} successfully went to traffic state.")
-        log.debug(json.dumps(self.test_run_update, indent=4))
+        log.debug("%s", LazyJson(self.test_run_update))
         return True
 
     def stop_wait_for_finished_status(self):
@@ -942,8 +971,8 @@ class CfRunTest:
 
         i = 0
         while True:
-            time.sleep(4)
-            self.timer = int(round(time.time() - self.start_time))
+            self.clock.sleep(4)
+            self.timer = int(round(self.clock.time() - self.start_time))
             i += 4
             if not self.update_test_run():
                 return False
@@ -982,7 +1011,7 @@ class CfRunTest:
         test_generates_activity = False
         i = 0
         while not test_generates_activity:
-            self.timer = int(round(time.time() - self.start_time))
+            self.timer = int(round(self.clock.time() - self.start_time))
             self.update_test_run()
             self.update_run_stats()
             # self.print_test_status()
@@ -1003,14 +1032,13 @@ class CfRunTest:
                 log.error(error_msg)
                 print(error_msg)
                 return False
-            time.sleep(4)
+            self.clock.sleep(4)
             i = i + 4
             print(f"")
         self.time_to_activity = self.timer - self.time_to_start - self.time_to_run
         return True
 
-    @staticmethod
-    def countdown(t):
+    def countdown(self, t):
         """countdown function
 
         Can be used after load increase for results to update
@@ -1022,7 +1050,7 @@ class CfRunTest:
             mins, secs = divmod(t, 60)
             time_format = "{:02d}:{:02d}".format(mins, secs)
             print(time_format, end="\r")
-            time.sleep(1)
+            self.clock.sleep(1)
             t -= 1
 
     def goal_seek(self):
@@ -1279,16 +1307,23 @@ class CfRunTest:
         :return: True if test completed successfully
         """
         # exit control_test if test does not go into running state
-        if not self.wait_for_running_status():
+        with self.profiler.phase("startup"):
+            running = self.wait_for_running_status()
+        if not running:
             log.info(f"control_test end, wait_for_running_status False")
             return False
         # exit control_test if test does not go into running state
-        if not self.wait_for_running_sub_status():
+        with self.profiler.phase("startup"):
+            running = self.wait_for_running_sub_status()
+        if not running:
             log.info(f"control_test end, wait_for_running_sub_status False")
             return False
         # exit control_test if test does not have successful transactions
-        if not self.wait_for_test_activity():
-            self.stop_wait_for_finished_status()
+        with self.profiler.phase("startup"):
+            active = self.wait_for_test_activity()
+        if not active:
+            with self.profiler.phase("stop"):
+                self.stop_wait_for_finished_status()
             log.info(f"control_test end, wait_for_test_activity False")
             return False
         self.check_ramp_seek_kpi()
@@ -1297,31 +1332,39 @@ class CfRunTest:
         # self.countdown(12)
         # test control loop - runs until self.stop is set to True
         while not self.stop:
-            self.update_run_stats()
-            self.update_phase()
-            self.check_stop_conditions()
-            self.update_rolling_averages()
-
-            # print stats if test is running
-            if self.sub_status is None:
-                self.print_test_stats()
-                self.save_results()
-
-            if self.in_ramp_seek and not self.ramp_seek_complete:
-                log.info(f"control_test going to ramp_seek")
-                self.control_test_ramp_seek(self.ramp_seek_kpi, self.in_ramp_seek_value)
-
-            if self.in_goal_seek and self.ramp_seek_complete:
-                log.info(f"control_test going to goal_seek")
-                self.control_test_goal_seek_kpi(self.kpi_1, self.kpi_2,
-                                                self.in_kpi_and_or)
-            print(f"")
-            time.sleep(4)
+            with self.profiler.phase("control"):
+                self.update_run_stats()
+                self.update_phase()
+                self.check_stop_conditions()
+                self.update_rolling_averages()
+
+                # print stats if test is running
+                if self.sub_status is None:
+                    self.print_test_stats()
+                    self.save_results()
+
+                if self.in_ramp_seek and not self.ramp_seek_complete:
+                    log.info(f"control_test going to ramp_seek")
+                    with self.profiler.phase("ramp_seek"):
+                        self.control_test_ramp_seek(
+                            self.ramp_seek_kpi, self.in_ramp_seek_value
+                        )
+
+                if self.in_goal_seek and self.ramp_seek_complete:
+                    log.info(f"control_test going to goal_seek")
+                    with self.profiler.phase("goal_seek"):
+                        self.control_test_goal_seek_kpi(self.kpi_1, self.kpi_2,
+                                                        self.in_kpi_and_or)
+                print(f"")
+            self.clock.sleep(4)
         # if goal_seek is yes enter sustained steady phase
         if self.in_goal_seek and self.in_sustain_period > 0:
-            self.sustain_test()
+            with self.profiler.phase("sustain"):
+                self.sustain_test()
         # stop test and wait for finished status
-        if self.stop_wait_for_finished_status():
+        with self.profiler.phase("stop"):
+            stopped = self.stop_wait_for_finished_status()
+        if stopped:
             self.time_to_stop = self.timer - self.time_to_stop_start
             self.save_results()
             return True
@@ -1454,8 +1497,8 @@ class CfRunTest:
     def sustain_test(self):
         self.phase = "steady"
         while self.in_sustain_period > 0:
-            self.timer = int(round(time.time() - self.start_time))
-            sustain_period_loop_time_start = time.time()
+            self.timer = int(round(self.clock.time() - self.start_time))
+            sustain_period_loop_time_start = self.clock.time()
             self.update_run_stats()
             if self.time_remaining < 30 and self.in_goal_seek:
                 self.phase = "timeout"
@@ -1469,9 +1512,9 @@ class CfRunTest:
                 self.print_test_stats()
                 self.save_results()
 
-            time.sleep(4)
+            self.clock.sleep(4)
             self.in_sustain_period = self.in_sustain_period - (
-                time.time() - sustain_period_loop_time_start
+                self.clock.time() - sustain_period_loop_time_start
             )
         self.phase = "stopping"
         # self.stop_wait_for_finished_status()
@@ -1541,74 +1584,128 @@ class CfRunTest:
             self.report_link,
         ]
         self.result_file.append_file(csv_list)
+        self.metrics.add_sample(csv_list, self.poll_seconds)
+
+
+# column name and value type of every field in the detailed csv report, in file order
+# types: category (repeated strings), str, bool, int, float
+detailed_report_schema = {
+    "test_name": "category",
+    "seconds": "int",
+    "state": "category",
+    "current_load": "int",
+    "desired_load": "int",
+    "seek_ready": "bool",
+    "tps": "float",
+    "tps_stable": "bool",
+    "tps_delta": "float",
+    "successful_txn": "int",
+    "unsuccessful_txn": "int",
+    "aborted_txn": "int",
+    "txn_error_rate": "float",
+    "cps": "float",
+    "cps_stable": "bool",
+    "cps_delta": "float",
+    "open_conns": "int",
+    "conns_stable": "bool",
+    "conns_delta": "float",
+    "tcp_avg_tt_synack": "float",
+    "tcp_avg_ttfb": "float",
+    "ttfb_stable": "bool",
+    "ttfb_delta": "float",
+    "url_response_time": "float",
+    "total_tcp_established": "int",
+    "total_tcp_attempted": "int",
+    "total_bandwidth": "float",
+    "bw_stable": "bool",
+    "bw_delta": "float",
+    "rx_bandwidth": "float",
+    "tx_bandwidth": "float",
+    "rx_packet_rate": "float",
+    "tx_packet_rate": "float",
+    "tcp_closed": "int",
+    "tcp_reset": "int",
+    "tcp_error": "int",
+    "simusers_alive": "int",
+    "simusers_animating": "int",
+    "simusers_blocking": "int",
+    "simusers_sleeping": "int",
+    "client_cpu": "float",
+    "client_mem": "float",
+    "client_pkt_mem": "float",
+    "client_rcv_queue": "int",
+    "server_cpu": "float",
+    "server_mem": "float",
+    "server_pkt_mem": "float",
+    "server_rcv_queue": "int",
+    "test_type_v1": "category",
+    "test_type_v2": "category",
+    "load_type": "category",
+    "test_id": "category",
+    "run_id": "category",
+    "t_run": "int",
+    "t_start": "int",
+    "t_tx": "int",
+    "t_stop": "int",
+    "version": "float",
+    "report": "str",
+}
 
 
 class DetailedCsvReport:
-    def __init__(self, report_location):
+    """Writes the detailed csv report, one line per control interval
+
+    The file stays open for the whole run. When lines are written to disk is set by
+    flush_policy:
+    - "tick": flush after every line (default, same durability as before)
+    - "interval": flush every flush_interval lines
+    - "phase": flush when the state column changes
+    end_test() always flushes and fsyncs, call it when a test ends.
+
+    sidecar can be set to "parquet" or "arrow" to also write a typed columnar copy
+    of the report next to the csv file (requires pyarrow).
+
+    store can be a ResultsStore, every line is also added to it and committed on flush.
+
+    raw_archive keeps the raw controller payloads of the run in a compressed
+    <time stamp>_Raw.jsonl.gz file next to the csv file, see CfRawArchive.
+    """
+
+    def __init__(
+        self,
+        report_location,
+        flush_policy="tick",
+        flush_interval=10,
+        sidecar=None,
+        store=None,
+        raw_archive=False,
+    ):
         log.debug("Initializing detailed csv result files.")
         self.time_stamp = time.strftime("%Y%m%d-%H%M")
         self.report_csv_file = report_location / f"{self.time_stamp}_Detailed.csv"
-        self.columns = [
-            "test_name",
-            "seconds",
-            "state",
-            "current_load",
-            "desired_load",
-            "seek_ready",
-            "tps",
-            "tps_stable",
-            "tps_delta",
-            "successful_txn",
-            "unsuccessful_txn",
-            "aborted_txn",
-            "txn_error_rate",
-            "cps",
-            "cps_stable",
-            "cps_delta",
-            "open_conns",
-            "conns_stable",
-            "conns_delta",
-            "tcp_avg_tt_synack",
-            "tcp_avg_ttfb",
-            "ttfb_stable",
-            "ttfb_delta",
-            "url_response_time",
-            "total_tcp_established",
-            "total_tcp_attempted",
-            "total_bandwidth",
-            "bw_stable",
-            "bw_delta",
-            "rx_bandwidth",
-            "tx_bandwidth",
-            "rx_packet_rate",
-            "tx_packet_rate",
-            "tcp_closed",
-            "tcp_reset",
-            "tcp_error",
-            "simusers_alive",
-            "simusers_animating",
-            "simusers_blocking",
-            "simusers_sleeping",
-            "client_cpu",
-            "client_mem",
-            "client_pkt_mem",
-            "client_rcv_queue",
-            "server_cpu",
-            "server_mem",
-            "server_pkt_mem",
-            "server_rcv_queue",
-            "test_type_v1",
-            "test_type_v2",
-            "load_type",
-            "test_id",
-            "run_id",
-            "t_run",
-            "t_start",
-            "t_tx",
-            "t_stop",
-            "version",
-            "report",
-        ]
+        self.columns = list(detailed_report_schema)
+        self.flush_policy = flush_policy
+        self.flush_interval = max(int(flush_interval), 1)
+        self.lines_since_flush = 0
+        self.last_state = None
+        self.file = None
+        self.writer = None
+        self.sidecar = None
+        self.store = store
+        if sidecar is not None:
+            self.sidecar = ColumnarSidecar(self.report_csv_file, sidecar)
+            if not self.sidecar.enabled:
+                self.sidecar = None
+        self.raw_archive = None
+        if raw_archive:
+            from cf_common.CfRawArchive import RawArchive, raw_archive_file
+
+            self.raw_archive = RawArchive(raw_archive_file(self.report_csv_file))
+
+    def open_file(self):
+        if self.file is None:
+            self.file = open(self.report_csv_file, "a", newline="")
+            self.writer = csv.writer(self.file, lineterminator="\n")
 
     def append_columns(self):
         """
@@ -1616,9 +1713,9 @@ class DetailedCsvReport:
         :return: no specific return value.
         """
         try:
-            csv_header = ",".join(map(str, self.columns)) + "\n"
-            with open(self.report_csv_file, "a") as f:
-                f.write(csv_header)
+            self.open_file()
+            self.writer.writerow(self.columns)
+            self.file.flush()
         except Exception as detailed_exception:
             log.error(
                 f"Exception occurred  writing to the detailed report file: \n<{detailed_exception}>\n"
@@ -1634,356 +1731,168 @@ class DetailedCsvReport:
         :return: no specific return value.
         """
         try:
-            csv_line = ",".join(map(str, csv_list)) + "\n"
-            with open(self.report_csv_file, "a") as f:
-                f.write(csv_line)
+            self.open_file()
+            self.writer.writerow(csv_list)
+            self.lines_since_flush += 1
+            state = csv_list[2]
+            if self.flush_policy == "interval":
+                if self.lines_since_flush >= self.flush_interval:
+                    self.flush()
+            elif self.flush_policy == "phase":
+                if state != self.last_state:
+                    self.flush()
+            else:
+                self.flush()
+            self.last_state = state
+            if self.sidecar is not None:
+                self.sidecar.append(csv_list)
+            if self.store is not None:
+                self.store.add_sample(csv_list)
         except Exception as detailed_exception:
             log.error(
                 f"Exception occurred  writing to the detailed report file: \n<{detailed_exception}>\n"
             )
 
+    def add_raw(self, kind, test_id, run_id, name, data):
+        """
+        Queues a raw controller payload for the raw archive.
+        :return: no specific return value.
+        """
+        if self.raw_archive is not None:
+            self.raw_archive.add(kind, test_id, run_id, name, data)
 
-class Report:
-    def __init__(self, report_csv_file, column_order):
-        self.report_csv_file = report_csv_file
-        self.col_order = column_order
-        self.df_base = pd.read_csv(self.report_csv_file)
-        self.df_steady = self.df_base[self.df_base.state == "steady"].copy()
-        self.unique_tests = self.df_base["test_name"].unique().tolist()
-        self.results = []
-        self.process_results()
-        self.format_results()
-        self.df_results = pd.DataFrame(self.results)
-        self.df_results = self.df_results.reindex(columns=self.col_order)
-        self.df_filter = pd.DataFrame(self.df_results)
-
-    def process_results(self):
-        for name in self.unique_tests:
-            d = {}
-            d["test_name"] = name
-
-            # get mean values from steady state
-            mean_cols = [
-                "cps",
-                "tps",
-                "total_bandwidth",
-                "open_conns",
-                "tcp_avg_tt_synack",
-                "tcp_avg_ttfb",
-                "url_response_time",
-                "client_cpu",
-                "client_pkt_mem",
-                "client_rcv_queue",
-                "server_cpu",
-                "server_pkt_mem",
-                "server_rcv_queue",
-            ]
-            for col in mean_cols:
-                d[col] = self.df_steady.loc[
-                    self.df_steady["test_name"] == name, col
-                ].mean()
-
-            # get maximum values for all states
-            max_cols = [
-                "successful_txn",
-                "unsuccessful_txn",
-                "aborted_txn",
-                "total_tcp_established",
-                "total_tcp_attempted",
-                "seconds",
-                "current_load",
-                "t_run",
-                "t_start",
-                "t_tx",
-                "t_stop",
-            ]
-            for col in max_cols:
-                d[col] = self.df_base.loc[self.df_base["test_name"] == name, col].max()
-
-            max_steady_cols = ["seconds"]
-            for col in max_steady_cols:
-                d[col] = self.df_steady.loc[
-                    self.df_steady["test_name"] == name, col
-                ].max()
-
-            # checks steady vs. all state max, add _max to column name
-            max_compare_cols = ["cps", "tps", "total_bandwidth"]
-            for col in max_compare_cols:
-                col_name = col + "_max"
-                d[col_name] = self.df_base.loc[
-                    self.df_base["test_name"] == name, col
-                ].max()
-            # find current_load and seconds for max tps
-            d["max_tps_load"] = self.df_base.loc[
-                self.df_base["tps"] == d["tps_max"], "current_load"
-            ].iloc[0]
-            d["max_tps_seconds"] = self.df_base.loc[
-                self.df_base["tps"] == d["tps_max"], "seconds"
-            ].iloc[0]
-            # get script version from test
-            d["version"] = self.df_base.loc[self.df_base["test_name"] == name, "version"].iloc[0]
-
-            # get report link for current test - changed to take from last row in test
-            # d["report"] = self.df_base.loc[self.df_base["tps"] == d["tps_max"], "report"].iloc[0]
-            d["report"] = self.df_base.loc[self.df_base["test_name"] == name, "report"].iloc[-1]
-
-            # find min and max tps from steady phase
-            max_steady_compare = ["tps"]
-            for col in max_steady_compare:
-                col_name_min = col + "_stdy_min"
-                col_name_max = col + "_stdy_max"
-                col_name_delta = col + "_stdy_delta"
-                d[col_name_min] = self.df_steady.loc[
-                    self.df_steady["test_name"] == name, col
-                ].min()
-                d[col_name_max] = self.df_steady.loc[
-                    self.df_steady["test_name"] == name, col
-                ].max()
-
-                if d[col_name_min] != 0:
-                    d[col_name_delta] = (
-                        (d[col_name_max] - d[col_name_min]) / d[col_name_min]
-                    ) * 100
-
-                    d[col_name_delta] = round(d[col_name_delta], 3)
-                else:
-                    d[col_name_delta] = 0
-
-            self.results.append(d)
-
-    def reset_df_filter(self):
-        self.df_filter = pd.DataFrame(self.df_results)
-
-    def filter_rows_containing(self, test_name_contains):
-        if test_name_contains is not None:
-            self.df_filter = self.df_filter[
-                self.df_filter.test_name.str.contains(test_name_contains)
-            ].copy()
-
-    def filter_columns(self, filtered_columns):
-        if filtered_columns is not None:
-            self.df_filter.drop(
-                self.df_filter.columns.difference(filtered_columns), 1, inplace=True
+    def flush(self, fsync=False):
+        if self.file is None:
+            return
+        self.file.flush()
+        if fsync:
+            os.fsync(self.file.fileno())
+        if self.store is not None:
+            self.store.commit()
+        self.lines_since_flush = 0
+
+    def end_test(self):
+        """
+        Flushes and fsyncs the report file and sidecar at the end of a test.
+        :return: no specific return value.
+        """
+        try:
+            self.flush(fsync=True)
+            if self.sidecar is not None:
+                self.sidecar.flush()
+            if self.raw_archive is not None:
+                self.raw_archive.flush()
+        except Exception as detailed_exception:
+            log.error(
+                f"Exception occurred  flushing the detailed report file: \n<{detailed_exception}>\n"
             )
 
-    def format_results(self):
-        for row_num, row in enumerate(self.results):
-            for key, value in row.items():
-                if key in {
-                    "cps",
-                    "tps",
-                    "total_bandwidth",
-                    "open_conns",
-                    "successful_txn",
-                    "unsuccessful_txn",
-                    "aborted_txn",
-                    "total_tcp_established",
-                    "total_tcp_attempted",
-                    "tps_stdy_min",
-                    "tps_stdy_max",
-                    "cps_max",
-                    "tps_max",
-                    "total_bandwidth_max",
-                    "max_tps_load",
-                    "client_mem",
-                    "client_pkt_mem",
-                    "client_rcv_queue",
-                    "server_mem",
-                    "server_pkt_mem",
-                    "server_rcv_queue",
-                    "t_run",
-                    "t_start",
-                    "t_tx",
-                    "t_stop",
-                }:
-                    self.results[row_num][key] = f"{value:,.0f}"
-                elif key in {
-                    "tcp_avg_ttfb",
-                    "url_response_time",
-                    "tcp_avg_tt_synack",
-                    "client_cpu",
-                    "server_cpu",
-                }:
-                    self.results[row_num][key] = f"{value:,.1f}"
-                elif key in {"tps_stdy_delta"}:
-                    self.results[row_num][key] = f"{value:,.2f}"
-                elif key in {"report"}:
-                    self.results[row_num][key] = f'<a href="{value}">link</a>'
+    def close(self):
+        self.end_test()
+        if self.sidecar is not None:
+            self.sidecar.close()
+        if self.store is not None:
+            self.store.close()
+        if self.raw_archive is not None:
+            self.raw_archive.close()
+            self.raw_archive = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            self.writer = None
+
+
+class ColumnarSidecar:
+    """Typed columnar copy of the detailed report in parquet or arrow ipc format
+
+    Lines are buffered and written as one record batch when batch_rows is reached
+    or flush is called. The file is only complete after close.
+    """
 
-    @staticmethod
-    def style_a():
-        styles = [
-            # table properties
-            dict(
-                selector=" ",
-                props=[
-                    ("margin", "0"),
-                    ("width", "100%"),
-                    ("font-family", '"Helvetica", "Arial", sans-serif'),
-                    ("border-collapse", "collapse"),
-                    ("border", "none"),
-                    ("border", "2px solid #ccf"),
-                    # ("min-width", "600px"),
-                    ("overflow", "auto"),
-                    ("overflow-x", "auto"),
-                ],
-            ),
-            # header color - optional
-            dict(
-                selector="thead",
-                props=[
-                    ("background-color", "SkyBlue"),
-                    ("width", "100%")
-                    # ("display", "table") # adds fixed scrollbar
-                    # ("position", "fixed")
-                ],
-            ),
-            # background shading
-            dict(
-                selector="tbody tr:nth-child(even)",
-                props=[("background-color", "#fff")],
-            ),
-            dict(
-                selector="tbody tr:nth-child(odd)", props=[("background-color", "#eee")]
-            ),
-            # cell spacing
-            dict(selector="td", props=[("padding", ".5em")]),
-            # header cell properties
-            dict(
-                selector="th",
-                props=[
-                    ("font-size", "100%"),
-                    ("text-align", "center"),
-                    ("min-width", "25px"),
-                    ("max-width", "50px"),
-                    ("word-wrap", "break-word"),
-                ],
-            ),
-            # render hover last to override background-color
-            dict(selector="tbody tr:hover", props=[("background-color", "SkyBlue")]),
-        ]
-        return styles
-
-    def html_table(self, selected_style):
-        # Style
-        props = {
-            "test_name": {"width": "20em", "min-width": "14em", "text-align": "left"},
-            "cps": {"width": "6em", "min-width": "5em", "text-align": "right"},
-            "tps": {"width": "6em", "min-width": "5em", "text-align": "right"},
-            "cps_max": {"width": "6em", "min-width": "5em", "text-align": "right"},
-            "tps_max": {"width": "6em", "min-width": "5em", "text-align": "right"},
-            "total_bandwidth": {
-                "width": "8em",
-                "min-width": "7em",
-                "text-align": "right",
-            },
-            "total_bandwidth_max": {
-                "width": "8em",
-                "min-width": "7em",
-                "text-align": "right",
-            },
-            "open_conns": {"width": "8em", "min-width": "7em", "text-align": "right"},
-            "tcp_avg_tt_synack": {
-                "width": "3.7em",
-                "min-width": "3.7em",
-                "text-align": "right",
-            },
-            "tcp_avg_ttfb": {
-                "width": "3.7em",
-                "min-width": "3.7em",
-                "text-align": "right",
-            },
-            "url_response_time": {
-                "width": "3.7em",
-                "min-width": "3.7em",
-                "text-align": "right",
-            },
-            "report": {"width": "3.7em", "min-width": "3.7em", "text-align": "right"},
-            "successful_txn": {
-                "width": "8em",
-                "min-width": "7em",
-                "text-align": "right",
-            },
-            "total_tcp_established": {
-                "width": "5em",
-                "min-width": "5em",
-                "text-align": "right",
-            },
-            "total_tcp_attempted": {
-                "width": "5em",
-                "min-width": "5em",
-                "text-align": "right",
-            },
-            "seconds": {"width": "3.7em", "min-width": "3.7em", "text-align": "right"},
-            "tps_stdy_min": {"width": "3.2em", "min-width": "3.2em", "text-align": "right"},
-            "tps_stdy_max": {"width": "3.2em", "min-width": "3.2em", "text-align": "right"},
-            "tps_stdy_delta": {
-                "width": "3.2em",
-                "min-width": "3.2em",
-                "text-align": "right",
-            },
-            "client_cpu": {"width": "3em", "min-width": "3em", "text-align": "right"},
-            "server_cpu": {"width": "3em", "min-width": "3em", "text-align": "right"},
-            "client_pkt_mem": {
-                "width": "3.5em",
-                "min-width": "3.5em",
-                "text-align": "right",
-            },
-            "client_rcv_queue": {
-                "width": "3.5em",
-                "min-width": "3.5em",
-                "text-align": "right",
-            },
-            "server_pkt_mem": {
-                "width": "3.9em",
-                "min-width": "3.9em",
-                "text-align": "right",
-            },
-            "server_rcv_queue": {
-                "width": "3.9em",
-                "min-width": "3.9em",
-                "text-align": "right",
-            },
-            "current_load": {
-                "width": "3.7em",
-                "min-width": "3.7em",
-                "text-align": "right",
-            },
-            "unsuccessful_txn": {
-                "width": "3.8em",
-                "min-width": "3.8em",
-                "text-align": "right",
-            },
-            "aborted_txn": {
-                "width": "3.5em",
-                "min-width": "3.5em",
-                "text-align": "right",
-            },
-            "max_tps_seconds": {
-                "width": "3.7em",
-                "min-width": "3.7em",
-                "text-align": "right",
-            },
-            "max_tps_load": {
-                "width": "3.7em",
-                "min-width": "3.7em",
-                "text-align": "right",
-            },
-            "t_run": {"width": "3em", "min-width": "3.7em", "text-align": "right"},
-            "t_start": {"width": "3em", "min-width": "3em", "text-align": "right"},
-            "t_tx": {"width": "3em", "min-width": "3em", "text-align": "right"},
-            "t_stop": {"width": "3em", "min-width": "3em", "text-align": "right"},
-            "version": {"width": "3em", "min-width": "3em", "text-align": "right"},
+    def __init__(self, report_csv_file, file_format, batch_rows=256):
+        self.enabled = False
+        self.file_format = file_format.lower()
+        self.batch_rows = batch_rows
+        self.rows = []
+        self.writer = None
+        try:
+            import pyarrow as pa
+        except ImportError:
+            report_error = f"pyarrow is not installed, {file_format} sidecar disabled"
+            log.error(report_error)
+            print(report_error)
+            return
+        if self.file_format == "parquet":
+            self.file = report_csv_file.with_suffix(".parquet")
+        elif self.file_format == "arrow":
+            self.file = report_csv_file.with_suffix(".arrow")
+        else:
+            report_error = f"unknown sidecar format: {file_format}"
+            log.error(report_error)
+            print(report_error)
+            return
+        self.pa = pa
+        arrow_types = {
+            "category": pa.dictionary(pa.int32(), pa.string()),
+            "str": pa.string(),
+            "bool": pa.bool_(),
+            "int": pa.int64(),
+            "float": pa.float64(),
         }
-
-        # html = ''
-        all_columns = set(self.df_filter.columns)
-        html = self.df_filter.style.set_properties(
-            subset="test_name", **props["test_name"]
+        self.schema = pa.schema(
+            [(k, arrow_types[v]) for k, v in detailed_report_schema.items()]
         )
-        for k, v in props.items():
-            if k in all_columns:
-                html = html.set_properties(subset=k, **v)
-        html = html.set_table_styles(selected_style).hide_index().render()
+        self.enabled = True
 
-        return html
+    @staticmethod
+    def typed_value(value_type, value):
+        if value is None:
+            return None
+        try:
+            if value_type == "int":
+                return int(value)
+            if value_type == "float":
+                return float(value)
+            if value_type == "bool":
+                return bool(value)
+        except (TypeError, ValueError):
+            return None
+        return str(value)
+
+    def append(self, csv_list):
+        self.rows.append(csv_list)
+        if len(self.rows) >= self.batch_rows:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        pa = self.pa
+        arrays = []
+        for i, (name, value_type) in enumerate(detailed_report_schema.items()):
+            values = [self.typed_value(value_type, row[i]) for row in self.rows]
+            if value_type == "category":
+                arrays.append(
+                    pa.array(values, type=pa.string()).dictionary_encode()
+                )
+            else:
+                arrays.append(pa.array(values, type=self.schema.field(name).type))
+        batch = pa.RecordBatch.from_arrays(arrays, schema=self.schema)
+        if self.writer is None:
+            if self.file_format == "parquet":
+                import pyarrow.parquet as pq
+
+                self.writer = pq.ParquetWriter(str(self.file), self.schema)
+            else:
+                self.writer = pa.ipc.new_file(str(self.file), self.schema)
+        if self.file_format == "parquet":
+            self.writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            self.writer.write_batch(batch)
+        self.rows = []
+
+    def close(self):
+        self.flush()
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
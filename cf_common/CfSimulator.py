@@ -0,0 +1,390 @@
+import contextlib
+import io
+import itertools
+import logging
+import math
+import random
+
+from cf_common.CfClock import VirtualClock
+
+log = logging.getLogger(__name__)
+
+# run ids are unique in the process, simulate_test makes a client per test and
+# the raw archive of a suite tells the runs apart by id
+run_numbers = itertools.count(1)
+
+# load types where the controller reports the achieved rate as the current load,
+# for simusers the current load is the number of simusers
+rate_load_types = {"bandwidth", "connections", "connections/second", "simusers/second"}
+
+
+class DutModel:
+    """Device under test, turns an offered load into the statistics of a sample
+
+    - capacity: transactions per second ceiling of the DUT, throughput bends
+      smoothly towards it with the knee exponent
+    - txns_per_load: transactions per second of one simuser
+    - txns_per_conn: transactions per connection
+    - object_bytes: bytes of the object of a transaction
+    - latency_ms: time to first byte when idle, it grows as 1 / (1 - utilization)
+    - noise: relative standard deviation of the rates
+    - error_onset: utilization where failed transactions start, they grow linearly
+      to max_error_rate at full utilization
+    - ramp_time: time constant in seconds of the current load following the
+      desired load
+
+    Rate load types offer transactions in their own units: connections or new
+    simusers per second times txns_per_conn, a bandwidth in kbps of object_bytes objects, and open
+    connections each doing a transaction per idle time to first byte.
+
+    Samples only depend on the seed and the calls made, the same test gives the
+    same statistics.
+    """
+
+    def __init__(
+        self,
+        capacity=50000,
+        txns_per_load=100,
+        latency_ms=1.0,
+        noise=0.01,
+        error_onset=0.9,
+        max_error_rate=0.02,
+        ramp_time=4,
+        knee=8,
+        txns_per_conn=1,
+        object_bytes=16000,
+        seed=0,
+    ):
+        self.capacity = capacity
+        self.txns_per_load = txns_per_load
+        self.latency_ms = latency_ms
+        self.noise = noise
+        self.error_onset = error_onset
+        self.max_error_rate = max_error_rate
+        self.ramp_time = ramp_time
+        self.knee = knee
+        self.txns_per_conn = txns_per_conn
+        self.object_bytes = object_bytes
+        self.seed = seed
+        self.random = random.Random(seed)
+
+    def served(self, offered):
+        """Transactions per second the DUT serves for an offered rate"""
+        if offered <= 0:
+            return 0.0
+        return offered / (1 + (offered / self.capacity) ** self.knee) ** (1 / self.knee)
+
+    def error_rate(self, utilization):
+        """Fraction of failed transactions at a utilization"""
+        if utilization <= self.error_onset:
+            return 0.0
+        return self.max_error_rate * min(
+            (utilization - self.error_onset) / (1 - self.error_onset), 1
+        )
+
+    def peak_tps(self, steps=2000):
+        """Highest successful transactions per second without noise, the true capacity"""
+        peak = 0.0
+        for i in range(1, steps + 1):
+            served = self.served(self.capacity * 3 * i / steps)
+            utilization = min(served / self.capacity, 0.99)
+            peak = max(peak, served * (1 - self.error_rate(utilization)))
+        return peak
+
+    def jitter(self, value):
+        if self.noise <= 0:
+            return value
+        return max(value * self.random.gauss(1, self.noise), 0)
+
+    def follow(self, current, desired, seconds):
+        """Current load after seconds of moving towards the desired load"""
+        if self.ramp_time <= 0:
+            return desired
+        return desired + (current - desired) * math.exp(-seconds / self.ramp_time)
+
+    def offered_tps(self, load, load_type="simusers"):
+        """Transactions per second offered by a load in the units of its load type"""
+        load_type = str(load_type).lower()
+        if load_type in {"connections/second", "simusers/second"}:
+            # a new simuser opens one connection
+            return load * self.txns_per_conn
+        if load_type == "bandwidth":
+            return load * 1000 / (self.object_bytes * 8)
+        if load_type == "connections":
+            return load / (self.latency_ms / 1000)
+        return load * self.txns_per_load
+
+    def sample(self, load, seconds, load_type="simusers"):
+        """Rates of a sample interval at a load
+
+        :param load: load in load units, e.g. simusers
+        :param seconds: interval length in seconds
+        :param load_type: load specification type, e.g. SimUsers or Bandwidth
+        :return: dict with tps, failed_tps, cps, conns, ttfb, utilization and bandwidth keys
+        """
+        served = self.served(self.offered_tps(load, load_type))
+        utilization = min(served / self.capacity, 0.99)
+        error_rate = self.error_rate(utilization)
+        tps = self.jitter(served * (1 - error_rate))
+        ttfb = self.jitter(self.latency_ms / (1 - utilization))
+        cps = tps / self.txns_per_conn
+        return {
+            "tps": tps,
+            "failed_tps": served * error_rate,
+            "cps": cps,
+            # connections open for the transactions of a connection
+            "conns": cps * self.txns_per_conn * ttfb / 1000,
+            "ttfb": ttfb,
+            "utilization": utilization,
+            "bandwidth": tps * self.object_bytes * 8 / 1000,  # kbps
+            "seconds": seconds,
+        }
+
+
+def stats_payload(side_stats):
+    """fetch_test_run_statistics payload from nested counters
+
+    :param side_stats: dict of client and server to dict of type to sub type values,
+     or to a value for counters without sub type, e.g. {"client": {"timeElapsed": 4}}
+    :return: dict of client and server to lists of type, subType, value dicts
+    """
+    payload = {}
+    for side, stats in side_stats.items():
+        payload[side] = []
+        for stat_type, value in stats.items():
+            if isinstance(value, dict):
+                for sub_type, sub_value in value.items():
+                    payload[side].append(
+                        {"type": stat_type, "subType": sub_type, "value": sub_value}
+                    )
+            else:
+                payload[side].append({"type": stat_type, "value": value})
+    return payload
+
+
+class SimulatedClient:
+    """CfClient stand in that runs tests on a DutModel with a clock
+
+    Tests wait queue_delay seconds in waiting status and start_delay seconds in
+    the starting sub status, then run for the load specification duration. The
+    load follows the start load and change_load requests.
+    """
+
+    def __init__(self, model=None, clock=None, queue_delay=8, start_delay=4,
+                 stop_delay=8, capacity=4, cores=8):
+        self.controller_ip = "simulator"
+        self.exception_state = True
+        self.model = DutModel() if model is None else model
+        self.clock = VirtualClock() if clock is None else clock
+        self.queue_delay = queue_delay
+        self.start_delay = start_delay
+        self.stop_delay = stop_delay
+        self.queue_info = {
+            "id": "simulator",
+            "capacity": capacity,
+            "computeGroups": [{"cores": cores}],
+        }
+        self.tests = {}
+        self.runs = {}
+
+    def get_test(self, test_type, test_id, outfile=None):
+        test = self.tests.setdefault(
+            test_id,
+            {
+                "id": test_id,
+                "name": test_id,
+                "type": test_type,
+                "config": {
+                    "queue": {"id": self.queue_info["id"]},
+                    "interfaces": {"client": [{"portSystemId": "c1"}],
+                                   "server": [{"portSystemId": "s1"}]},
+                    "loadSpecification": {"type": "SimUsers", "duration": 1800},
+                },
+            },
+        )
+        return test
+
+    def get_queue(self, queue_id):
+        return self.queue_info
+
+    def update_test(self, test_type, test_id, config):
+        test = self.get_test(test_type, test_id)
+        test["config"]["loadSpecification"].update(
+            config.get("config", {}).get("loadSpecification", {})
+        )
+        return test
+
+    def start_test(self, test_id):
+        test = self.tests[test_id]
+        load_spec = test["config"]["loadSpecification"]
+        load = 0
+        for key in ("bandwidth", "connectionsPerSecond", "connections"):
+            load = load_spec.get(key, load)
+        run_number = next(run_numbers)
+        run_id = f"run-{run_number}"
+        run = {
+            "id": run_id,
+            "runId": f"result-{run_number}",
+            "testId": test_id,
+            "queueId": self.queue_info["id"],
+            "status": "waiting",
+            "subStatus": None,
+            "test": {"name": test["name"], "type": test["type"]},
+            "timeElapsed": 0,
+            "timeRemaining": int(load_spec.get("duration", 1800)),
+        }
+        self.runs[run_id] = {
+            "run": run,
+            "load_spec": load_spec,
+            "created": self.clock.time(),
+            "stopped": None,
+            "desired_load": load,
+            "current_load": 0.0,
+            "last_sample": None,
+            "totals": {"successful": 0.0, "unsuccessful": 0.0, "conns": 0.0},
+        }
+        return dict(run)
+
+    def run_state(self, state):
+        """Updates status, elapsed and remaining time of a run from the clock"""
+        run = state["run"]
+        now = self.clock.time()
+        duration = int(state["load_spec"].get("duration", 1800))
+        running_at = state["created"] + self.queue_delay
+        traffic_at = running_at + self.start_delay
+        if state["stopped"] is not None:
+            run["status"] = "stopping"
+            if now >= state["stopped"] + self.stop_delay:
+                run["status"] = "stopped"
+            run["subStatus"] = None
+        elif now < running_at:
+            run["status"] = "waiting"
+        elif now < traffic_at:
+            run["status"] = "running"
+            run["subStatus"] = "starting"
+        else:
+            run["status"] = "running"
+            run["subStatus"] = None
+            elapsed = int(now - traffic_at)
+            run["timeElapsed"] = min(elapsed, duration)
+            run["timeRemaining"] = max(duration - elapsed, 0)
+            if elapsed >= duration:
+                run["status"] = "finished"
+        return run
+
+    def get_test_run(self, run_id):
+        return dict(self.run_state(self.runs[run_id]))
+
+    def list_test_runs(self):
+        return [dict(self.run_state(state)) for state in self.runs.values()]
+
+    def stop_test(self, run_id):
+        state = self.runs[run_id]
+        if state["stopped"] is None:
+            state["stopped"] = self.clock.time()
+        return {"id": run_id}
+
+    def change_load(self, run_id, load):
+        self.runs[run_id]["desired_load"] = load
+        return {"id": run_id, "load": load}
+
+    def fetch_test_run_statistics(self, run_id):
+        state = self.runs[run_id]
+        run = self.run_state(state)
+        now = self.clock.time()
+        seconds = 0 if state["last_sample"] is None else now - state["last_sample"]
+        state["last_sample"] = now
+        load_type = str(state["load_spec"].get("type", "SimUsers")).lower()
+        if run["status"] != "running" or run["subStatus"] is not None:
+            sample = self.model.sample(0, seconds)
+            desired = 0
+        else:
+            state["current_load"] = self.model.follow(
+                state["current_load"], state["desired_load"], seconds
+            )
+            sample = self.model.sample(state["current_load"], seconds, load_type)
+            desired = state["desired_load"]
+        totals = state["totals"]
+        totals["successful"] += sample["tps"] * seconds
+        totals["unsuccessful"] += sample["failed_tps"] * seconds
+        totals["conns"] += sample["cps"] * seconds
+
+        if load_type in rate_load_types:
+            # the achieved rate is the current load, a saturated DUT lags the desired load
+            key = {"bandwidth": "bandwidth", "connections": "conns"}.get(load_type, "cps")
+            current = int(min(state["current_load"], sample[key]))
+        else:
+            current = int(round(state["current_load"]))
+        bandwidth = sample["bandwidth"]
+        cpu = round(100 * sample["utilization"], 1)
+        return stats_payload(
+            {
+                "client": {
+                    "driver": {
+                        "rxBandwidth": int(bandwidth * 0.95),
+                        "txBandwidth": int(bandwidth * 0.05),
+                        "rxPacketRate": int(sample["tps"] * 12),
+                        "txPacketRate": int(sample["tps"] * 8),
+                    },
+                    "sum": {
+                        "successfulTxns": int(totals["successful"]),
+                        "successfulTxnsPerSec": int(sample["tps"]),
+                        "unsuccessfulTxns": int(totals["unsuccessful"]),
+                        "unsuccessfulTxnsPerSec": int(sample["failed_tps"]),
+                        "attemptedTxns": int(totals["successful"] + totals["unsuccessful"]),
+                        "attemptedTxnsPerSec": int(sample["tps"] + sample["failed_tps"]),
+                        "currentLoadSpecCount": current,
+                        "desiredLoadSpecCount": desired,
+                        "establishedConnRate": int(sample["cps"]),
+                        "attemptedConnRate": int(sample["cps"]),
+                        "currentEstablishedConns": int(sample["conns"]),
+                        "attemptedConns": int(sample["conns"]),
+                    },
+                    "tcp": {
+                        "averageTimeToFirstByte": sample["ttfb"],
+                        "averageTimeToSynAck": sample["ttfb"] / 4,
+                        "cummulativeEstablishedConns": int(totals["conns"]),
+                        "cummulativeAttemptedConns": int(totals["conns"]),
+                    },
+                    "url": {"averageRespTimePerUrl": sample["ttfb"] * 1.2},
+                    "loadspec": {"cpuUtilized": cpu},
+                    "memory": {"mainPoolSize": 1000, "mainPoolUsed": int(10 * cpu)},
+                    "simusers": {"simUsersAlive": current, "simUsersAnimating": current},
+                    "timeElapsed": run["timeElapsed"],
+                    "timeRemaining": run["timeRemaining"],
+                },
+                "server": {
+                    "driver": {
+                        "rxBandwidth": int(bandwidth * 0.05),
+                        "txBandwidth": int(bandwidth * 0.95),
+                    },
+                    "memory": {"cpuUtilized": cpu},
+                    "sum": {"closedWithNoError": int(totals["conns"])},
+                },
+            }
+        )
+
+
+def simulate_test(test_details, result_file, model=None, quiet=True):
+    """Runs CfRunTest on a simulated DUT with a virtual clock
+
+    :param test_details: run_tests.csv row
+    :param result_file: DetailedCsvReport or ReplayResults for the samples
+    :param model: DutModel, None for the default model
+    :param quiet: do not print the test progress
+    :return: CfRunTest instance after the test
+    """
+    from cf_common.CfRunTest import CfRunTest
+
+    clock = VirtualClock()
+    cf = SimulatedClient(model, clock)
+    cf.get_test(test_details["type"], test_details["id"])["name"] = test_details["name"]
+    progress = contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext()
+    with progress:
+        rt = CfRunTest(cf, test_details, result_file, None, clock=clock)
+        rt.control_test()
+    log.info(
+        f"simulated {rt.name}: load {rt.c_current_load}, tps {rt.rolling_tps.avg_val}, "
+        f"phase {rt.phase}, {clock.time():.0f} virtual seconds"
+    )
+    return rt
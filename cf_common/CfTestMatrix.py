@@ -0,0 +1,84 @@
+import itertools
+import json
+
+
+class TestMatrix:
+    """Create tests rows expanded from a matrix of axes
+
+    The matrix file is JSON with:
+    - defaults: create tests CSV columns used by every row
+    - name: test name format with the row columns, e.g. "T-{type}-{object_size}"
+    - axes: column name to list of values, a value can also be a dict of columns that
+      change together, e.g. "tls": [{"sslTls": "TRUE", "tls_version": "tlsv12"}]
+    - exclude: list of dicts of column to value or list of values, rows matching all
+      columns of an exclusion are skipped
+    - overrides: list of {"when": columns to match like exclude, "set": columns to set}
+
+    Rows are generated one at a time, the expanded matrix is never kept in memory.
+    """
+
+    def __init__(self, matrix_file):
+        self.matrix_file = matrix_file
+        with open(matrix_file, "r") as f:
+            matrix = json.load(f)
+        self.defaults = matrix.get("defaults", {})
+        self.name = matrix["name"]
+        self.axes = list(matrix.get("axes", {}).items())
+        self.exclude = [
+            {k: self.value_set(v) for k, v in exclusion.items()}
+            for exclusion in matrix.get("exclude", [])
+        ]
+        self.overrides = [
+            (
+                {k: self.value_set(v) for k, v in override["when"].items()},
+                {k: str(v) for k, v in override["set"].items()},
+            )
+            for override in matrix.get("overrides", [])
+        ]
+
+    @staticmethod
+    def value_set(values):
+        if not isinstance(values, list):
+            values = [values]
+        return {str(v) for v in values}
+
+    def __len__(self):
+        """Number of combinations before exclusions"""
+        count = 1
+        for axis, values in self.axes:
+            count *= len(values)
+        return count
+
+    @staticmethod
+    def matches(row, columns):
+        return all(row.get(k) in values for k, values in columns.items())
+
+    def excluded(self, row):
+        return any(self.matches(row, exclusion) for exclusion in self.exclude)
+
+    def rows(self):
+        """Generates create tests rows, the same columns as the create tests CSV
+
+        :return: generator of dicts
+        """
+        axis_values = [values for axis, values in self.axes]
+        for combination in itertools.product(*axis_values):
+            row = {"include": "Y", "name_suffix": "auto"}
+            row.update(self.defaults)
+            for (axis, values), value in zip(self.axes, combination):
+                if isinstance(value, dict):
+                    row.update(value)
+                else:
+                    row[axis] = value
+            # same as values read from the CSV file
+            row = {k: str(v) for k, v in row.items()}
+            if self.excluded(row):
+                continue
+            for when, values in self.overrides:
+                if self.matches(row, when):
+                    row.update(values)
+            row["name"] = self.name.format_map(row)
+            yield row
+
+    def __iter__(self):
+        return self.rows()
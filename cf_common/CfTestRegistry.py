@@ -0,0 +1,89 @@
+import hashlib
+import json
+import pathlib
+import time
+
+
+def config_hash(test_type, config):
+    """Canonical hash of a generated test config
+
+    The test name is left out, a test renamed with a new name suffix has the same hash.
+
+    :param test_type: test type, e.g. http_throughput
+    :param config: complete test config, e.g. CfCreateTest.complete_test()
+    :return: sha256 hex digest
+    """
+    canonical = {k: v for k, v in config.items() if k != "name"}
+    canonical_json = json.dumps(
+        [test_type, canonical], sort_keys=True, separators=(",", ":"), default=str
+    )
+    return hashlib.sha256(canonical_json.encode("utf-8")).hexdigest()
+
+
+class TestRegistry:
+    """Local registry of tests created on the controller
+
+    Keyed by the create tests CSV test name (without name suffix). Each entry keeps the
+    controller test id, the full test name, name suffix and the hash of the config the
+    test was created or last updated with, so unchanged rows can reuse the test.
+    """
+
+    def __init__(self, registry_file, controller=None):
+        self.registry_file = pathlib.Path(registry_file)
+        self.controller = controller  # tests of other controllers are kept but not used
+        self.entries = {}
+        if self.registry_file.is_file():
+            try:
+                with open(self.registry_file, "r") as f:
+                    self.entries = json.load(f)
+            except ValueError as e:
+                print(f"\nUnable to read test registry {self.registry_file}\n{e}")
+
+    def key(self, test_name):
+        if self.controller is None:
+            return test_name
+        return f"{self.controller}/{test_name}"
+
+    def get(self, test_name):
+        return self.entries.get(self.key(test_name))
+
+    def name_suffix(self, test_name, default):
+        """Name suffix of the registered test, default if the test is not registered"""
+        entry = self.get(test_name)
+        if entry is None:
+            return default
+        return entry["name_suffix"]
+
+    def add(self, test, response, config_hash_value):
+        """Registers a created or updated test
+
+        :param test: create tests CSV row
+        :param response: controller response with id and name
+        :param config_hash_value: config_hash of the posted config
+        :return: None
+        """
+        self.entries[self.key(test["name"])] = {
+            "id": response["id"],
+            "type": test["type"],
+            "name": response.get("name", f"{test['name']}_{test['name_suffix']}"),
+            "name_suffix": test["name_suffix"],
+            "hash": config_hash_value,
+            "updated": time.time(),
+        }
+
+    def remove_ids(self, test_ids):
+        """Removes tests deleted from the controller
+
+        :return: number of removed entries
+        """
+        test_ids = set(test_ids)
+        removed = [k for k, v in self.entries.items() if v["id"] in test_ids]
+        for k in removed:
+            del self.entries[k]
+        return len(removed)
+
+    def save(self):
+        tmp_file = self.registry_file.with_suffix(self.registry_file.suffix + ".tmp")
+        with open(tmp_file, "w") as f:
+            json.dump(self.entries, f, indent=4)
+        tmp_file.replace(self.registry_file)
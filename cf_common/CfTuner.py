@@ -0,0 +1,289 @@
+import csv
+import itertools
+import logging
+import os
+import random
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+
+from cf_common.CfSimulator import DutModel, simulate_test
+
+log = logging.getLogger(__name__)
+
+# run_tests.csv columns of the goal seek settings
+goal_seek_columns = [
+    "incr_low",
+    "incr_med",
+    "incr_high",
+    "low_threshold",
+    "med_threshold",
+    "high_threshold",
+    "variance_sample_size",
+    "max_variance",
+]
+
+
+class TrialResults:
+    """Result file of tuning trials, only the tps of each sample and phase is kept"""
+
+    def __init__(self):
+        self.samples = []
+
+    def append_file(self, csv_list):
+        # state and tps columns of detailed_report_schema
+        self.samples.append((csv_list[2], csv_list[6]))
+
+    def settled_tps(self, last_samples=5):
+        """Mean tps of the sustain period, of the last samples if it was not reached"""
+        values = [tps for state, tps in self.samples if state == "steady"]
+        if not values:
+            values = [tps for state, tps in self.samples if state != "stopping"][-last_samples:]
+        return statistics.mean(values) if values else 0
+
+    def add_raw(self, kind, test_id, run_id, name, data):
+        pass
+
+    def end_test(self):
+        pass
+
+
+def init_worker():
+    # trial processes do not log, a forked queue handler would never be emptied
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    logging.disable(logging.WARNING)
+
+
+def run_trial(task):
+    """Runs one test on one DUT profile
+
+    The tps of a trial is the throughput the goal seek settled at, a short peak above
+    the settled load does not count.
+
+    :param task: tuple of run_tests.csv row, settings and DutModel settings
+    :return: dict with seconds, tps, capacity and reached keys
+    """
+    test_details, settings, profile = task
+    test_details = dict(test_details)
+    test_details.update({k: str(v) for k, v in settings.items()})
+    model = DutModel(**profile)
+    capacity = model.peak_tps()
+    results = TrialResults()
+    rt = simulate_test(test_details, results, model)
+    tps = results.settled_tps()
+    return {
+        "seconds": rt.time_elapsed,
+        "tps": tps,
+        "capacity": capacity,
+        "reached": tps / capacity if capacity else 0,
+    }
+
+
+def start_reached(test_details, profile):
+    """Fraction of the capacity of a DUT profile served at the start load of a test"""
+    model = DutModel(**profile)
+    offered = model.offered_tps(
+        float(test_details.get("start_load") or 0), test_details.get("load_type", "simusers")
+    )
+    return model.served(offered) / model.peak_tps()
+
+
+def profile_from_archive(reader, run_id):
+    """DutModel settings fitted to an archived test run
+
+    Capacity is the highest rolling tps of the run, txns_per_load the median tps
+    per unit of load below half the capacity, noise the median relative change
+    between samples at the same desired load.
+
+    :param reader: RawArchiveReader
+    :param run_id: test run id, see RawArchiveReader.runs()
+    :return: dict of DutModel settings or None if the run has no traffic
+    """
+    from cf_common.CfReplay import stat_value
+
+    samples = []
+    for record in reader.records(kind="statistics", run_id=run_id):
+        stats = record["data"]
+        tps = stat_value(stats, "sum", "successfulTxnsPerSec") or 0
+        load = stat_value(stats, "sum", "currentLoadSpecCount") or 0
+        desired = stat_value(stats, "sum", "desiredLoadSpecCount") or 0
+        ttfb = stat_value(stats, "tcp", "averageTimeToFirstByte") or 0
+        samples.append((tps, load, desired, ttfb))
+    tps_values = [s[0] for s in samples]
+    if not any(tps_values):
+        return None
+    window = 3
+    capacity = max(
+        sum(tps_values[i:i + window]) / len(tps_values[i:i + window])
+        for i in range(len(tps_values))
+    )
+    per_load = [tps / load for tps, load, _, _ in samples if load > 0 and 0 < tps < capacity / 2]
+    if not per_load:
+        per_load = [tps / load for tps, load, _, _ in samples if load > 0 and tps > 0]
+    changes = [
+        abs(b[0] - a[0]) / a[0]
+        for a, b in zip(samples, samples[1:])
+        if a[2] == b[2] and a[0] > 0 and b[0] > 0
+    ]
+    latencies = [s[3] for s in samples if s[3] > 0]
+    return {
+        "capacity": capacity,
+        "txns_per_load": statistics.median(per_load),
+        "noise": statistics.median(changes) if changes else 0.01,
+        "latency_ms": min(latencies) if latencies else 1.0,
+        "seed": 0,
+    }
+
+
+def settings_grid(space, max_trials=None, seed=0):
+    """Settings to try, all combinations of space or a random sample of them
+
+    :param space: dict of run_tests.csv column to list of values
+    :param max_trials: number of settings, None for all combinations
+    :return: list of dicts of column to value
+    """
+    columns = list(space)
+    count = 1
+    for column in columns:
+        count *= len(space[column])
+    if max_trials is None or count <= max_trials:
+        return [dict(zip(columns, values)) for values in itertools.product(*space.values())]
+    # sample indexes of the product, the grid is not expanded
+    indexes = random.Random(seed).sample(range(count), max_trials)
+    grid = []
+    for index in sorted(indexes):
+        settings = {}
+        for column in reversed(columns):
+            index, i = divmod(index, len(space[column]))
+            settings[column] = space[column][i]
+        grid.append({column: settings[column] for column in columns})
+    return grid
+
+
+class GoalSeekTuner:
+    """Searches goal seek settings on simulated DUT profiles in a process pool
+
+    Every setting is run on every profile. A setting qualifies if the tps it settled
+    at, see TrialResults.settled_tps, is within capacity_margin of the true capacity
+    on all profiles, the best is the qualified setting with the least mean test time.
+    If none qualifies the setting reaching the most capacity is returned unqualified
+    and tune_reference keeps the reference settings of the group.
+    """
+
+    def __init__(self, space, profiles, capacity_margin=0.05, max_trials=200,
+                 workers=None, seed=0):
+        unknown = set(space) - set(goal_seek_columns)
+        if unknown:
+            raise ValueError(f"not goal seek settings: {', '.join(sorted(unknown))}")
+        self.space = space
+        self.profiles = profiles
+        self.capacity_margin = capacity_margin
+        self.max_trials = max_trials
+        self.workers = workers or os.cpu_count()
+        self.seed = seed
+
+    def tune(self, test_details, pool):
+        """Best settings of a run_tests.csv row
+
+        :param test_details: run_tests.csv row, the base of every trial
+        :param pool: ProcessPoolExecutor
+        :return: dict with settings, seconds, reached, qualified and skipped keys
+        """
+        if all(
+            start_reached(test_details, profile) >= 1 - self.capacity_margin
+            for profile in self.profiles
+        ):
+            # the goal seek has nothing to find
+            return {
+                "settings": None,
+                "seconds": None,
+                "reached": None,
+                "qualified": False,
+                "skipped": "the start load saturates every profile",
+            }
+        grid = settings_grid(self.space, self.max_trials, self.seed)
+        tasks = [
+            (test_details, settings, profile)
+            for settings in grid
+            for profile in self.profiles
+        ]
+        chunksize = max(len(tasks) // (self.workers * 4), 1)
+        trials = list(pool.map(run_trial, tasks, chunksize=chunksize))
+        best = None
+        reached = []
+        for i, settings in enumerate(grid):
+            outcomes = trials[i * len(self.profiles):(i + 1) * len(self.profiles)]
+            result = {
+                "settings": settings,
+                "seconds": statistics.mean(o["seconds"] for o in outcomes),
+                "reached": min(o["reached"] for o in outcomes),
+                "skipped": None,
+            }
+            result["qualified"] = result["reached"] >= 1 - self.capacity_margin
+            reached.append(result["reached"])
+            if best is None or self.better(result, best):
+                best = result
+        if len(grid) > 1 and max(reached) - min(reached) < 0.001:
+            # the trials are deterministic, settings driving the goal seek change the outcome
+            best["qualified"] = False
+            best["skipped"] = "the capacity reached does not depend on the settings"
+        return best
+
+    @staticmethod
+    def better(result, best):
+        if result["qualified"] != best["qualified"]:
+            return result["qualified"]
+        if result["qualified"]:
+            return result["seconds"] < best["seconds"]
+        return result["reached"] > best["reached"]
+
+    def tune_reference(self, reference_csv_file, tuned_csv_file):
+        """Tunes the goal seek tests of a run_tests_reference.csv file
+
+        Rows are grouped by type and load type, the first goal seek row of a group
+        is tuned and the best settings are written to every row of the group. Groups
+        without settings within the capacity margin keep their reference settings.
+
+        :return: dict of (type, load_type) to best result
+        """
+        with open(reference_csv_file, "r") as f:
+            reader = csv.DictReader(f)
+            header = reader.fieldnames
+            rows = list(reader)
+        groups = {}
+        for row in rows:
+            if row.get("goal_seek", "").lower() in {"true", "y", "yes"}:
+                groups.setdefault((row["type"], row["load_type"]), row)
+        best_results = {}
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker) as pool:
+            for (test_type, load_type), row in groups.items():
+                test_details = dict(row, id=f"tune-{row['name']}")
+                best = self.tune(test_details, pool)
+                best_results[(test_type, load_type)] = best
+                log.info(f"tuned {test_type} {load_type}: {best}")
+        for (test_type, load_type), best in best_results.items():
+            if best["skipped"] is not None:
+                report_error = (
+                    f"{test_type} {load_type} not tuned, {best['skipped']}, "
+                    f"reference settings kept"
+                )
+                print(f"\nWarning: {report_error}")
+                log.warning(report_error)
+            elif not best["qualified"]:
+                report_error = (
+                    f"No settings of {test_type} {load_type} within "
+                    f"{self.capacity_margin * 100:.0f}% of capacity, "
+                    f"best {best['reached'] * 100:.1f}%, reference settings kept"
+                )
+                print(f"\nWarning: {report_error}")
+                log.warning(report_error)
+        for row in rows:
+            best = best_results.get((row["type"], row["load_type"]))
+            if best is not None and best["qualified"]:
+                row.update({k: str(v) for k, v in best["settings"].items()})
+        with open(tuned_csv_file, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=header, lineterminator="\n")
+            writer.writeheader()
+            writer.writerows(rows)
+        return best_results
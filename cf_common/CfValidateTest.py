@@ -0,0 +1,242 @@
+"""Local validation of generated test configs
+
+Checks a test config against the test template of its type and the controller
+validation rules below, so invalid settings are found before any test is posted.
+"""
+import re
+
+tls_path = ("config", "protocol", "supplemental", "sslTls")
+response_body_path = ("config", "protocol", "responseBodyType")
+
+# sslTls keys that enable a protocol version, e.g. tlsv12
+tls_version_key = re.compile(r"^(sslv\d+|tlsv\d+)$")
+
+# cipher suites accepted by the controller, OpenSSL names, the ciphers of the
+# template and create_tests_ciphers in cf_config.py are accepted too
+valid_ciphers = {
+    "AES128-GCM-SHA256",
+    "AES128-SHA",
+    "AES128-SHA256",
+    "AES256-GCM-SHA384",
+    "AES256-SHA",
+    "AES256-SHA256",
+    "DES-CBC3-SHA",
+    "DHE-RSA-AES128-GCM-SHA256",
+    "DHE-RSA-AES128-SHA",
+    "DHE-RSA-AES128-SHA256",
+    "DHE-RSA-AES256-GCM-SHA384",
+    "DHE-RSA-AES256-SHA",
+    "DHE-RSA-AES256-SHA256",
+    "DHE-RSA-CHACHA20-POLY1305",
+    "ECDHE-ECDSA-AES128-GCM-SHA256",
+    "ECDHE-ECDSA-AES128-SHA",
+    "ECDHE-ECDSA-AES128-SHA256",
+    "ECDHE-ECDSA-AES256-GCM-SHA384",
+    "ECDHE-ECDSA-AES256-SHA",
+    "ECDHE-ECDSA-AES256-SHA384",
+    "ECDHE-ECDSA-CHACHA20-POLY1305",
+    "ECDHE-RSA-AES128-GCM-SHA256",
+    "ECDHE-RSA-AES128-SHA",
+    "ECDHE-RSA-AES128-SHA256",
+    "ECDHE-RSA-AES256-GCM-SHA384",
+    "ECDHE-RSA-AES256-SHA",
+    "ECDHE-RSA-AES256-SHA384",
+    "ECDHE-RSA-CHACHA20-POLY1305",
+    "RC4-MD5",
+    "RC4-SHA",
+    "TLS_AES_128_CCM_8_SHA256",
+    "TLS_AES_128_CCM_SHA256",
+    "TLS_AES_128_GCM_SHA256",
+    "TLS_AES_256_GCM_SHA384",
+    "TLS_CHACHA20_POLY1305_SHA256",
+}
+
+# signature hash algorithms accepted by the controller, with the template's and
+# create_tests_signature_hashes in cf_config.py
+valid_signature_hashes = {
+    "ECDSA_SECP256R1_SHA256",
+    "ECDSA_SECP384R1_SHA384",
+    "ECDSA_SECP521R1_SHA512",
+    "ECDSA_SHA1",
+    "ED25519",
+    "ED448",
+    "RSA_PKCS1_SHA1",
+    "RSA_PKCS1_SHA256",
+    "RSA_PKCS1_SHA384",
+    "RSA_PKCS1_SHA512",
+    "RSA_PSS_PSS_SHA256",
+    "RSA_PSS_PSS_SHA384",
+    "RSA_PSS_PSS_SHA512",
+    "RSA_PSS_RSAE_SHA256",
+    "RSA_PSS_RSAE_SHA384",
+    "RSA_PSS_RSAE_SHA512",
+}
+
+# (path, lowest, highest) of integer settings, highest None for no limit
+int_ranges = [
+    (("config", "protocol", "port"), 1, 65535),
+    (("config", "protocol", "bodySizeInBytes"), 0, None),
+    (("config", "protocol", "keepAlive", "count"), 1, None),
+    (("config", "protocol", "keepAlive", "delayTime"), 0, None),
+    (response_body_path + ("config", "bytes"), 1, None),
+    (response_body_path + ("config", "length"), 1, 16000),
+    (tls_path + ("bytes",), 1, 16384),
+]
+for side in ("client", "server"):
+    for key in (
+        "initialCongestionWindow",
+        "receiveWindow",
+        "retries",
+        "ipV4SegmentSize",
+        "ipV6SegmentSize",
+    ):
+        int_ranges.append((("config", "networks", side, key), 0, None))
+    int_ranges.append((("config", "networks", side, "delayedAcks", "bytes"), 0, None))
+
+object_body_types = {"fixed", "mixed"}
+
+
+def get_path(doc, path):
+    for key in path:
+        if not isinstance(doc, dict) or key not in doc:
+            return None
+        doc = doc[key]
+    return doc
+
+
+def type_name(value):
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return "str"
+    if isinstance(value, list):
+        return "list"
+    if isinstance(value, dict):
+        return "dict"
+    return None
+
+
+class TestValidator:
+    """Validates test configs of one test type
+
+    :param template: test template of the test type, from TemplateCache
+    :param ciphers: accepted cipher suites, None for valid_ciphers
+    :param signature_hashes: accepted signature hashes, None for valid_signature_hashes
+    """
+
+    def __init__(self, template, ciphers=None, signature_hashes=None):
+        self.template = template
+        tls = get_path(template, tls_path) or {}
+        # the controller accepts the values of its own template
+        self.ciphers = set(valid_ciphers if ciphers is None else ciphers)
+        self.ciphers.update(tls.get("ciphers") or [])
+        self.signature_hashes = set(
+            valid_signature_hashes if signature_hashes is None else signature_hashes
+        )
+        self.signature_hashes.update(tls.get("signatureHashAlgorithmsList") or [])
+        self.tls_keys = set(tls)
+        self.tls_versions = {k for k in tls if tls_version_key.match(k)}
+        self.supported_groups = set(tls.get("supportedGroups") or {})
+
+    def validate(self, test):
+        """Checks a complete test config
+
+        :param test: complete test config, e.g. CfCreateTest.complete_test()
+        :return: list of error messages, empty if the config is valid
+        """
+        errors = []
+        self.check_types(
+            get_path(test, ("config", "protocol")),
+            get_path(self.template, ("config", "protocol")),
+            "/config/protocol",
+            errors,
+        )
+        self.check_tls(test, errors)
+        self.check_response_body(test, errors)
+        self.check_int_ranges(test, errors)
+        return errors
+
+    def check_types(self, value, template_value, path, errors):
+        """Values must keep the type of the template value with the same path"""
+        if template_value is None or value is None:
+            return
+        if isinstance(template_value, dict) and isinstance(value, dict):
+            for k, v in value.items():
+                if path == "/config/protocol" and k == "responseBodyType":
+                    # replaced as a whole by the object type, checked separately
+                    continue
+                self.check_types(v, template_value.get(k), f"{path}/{k}", errors)
+        elif type_name(value) != type_name(template_value):
+            errors.append(
+                f"{path}: {value!r} is {type_name(value)}, expected {type_name(template_value)}"
+            )
+
+    def check_tls(self, test, errors):
+        tls = get_path(test, tls_path)
+        if not isinstance(tls, dict):
+            return
+        path = "/" + "/".join(tls_path)
+        # tls_version is set as a key of sslTls, an unknown version adds a new key
+        unknown = {
+            k for k, v in tls.items()
+            if k not in self.tls_keys and (v is True or tls_version_key.match(k))
+        }
+        for k in sorted(unknown):
+            errors.append(
+                f"{path}/{k}: unknown tls_version, expected one of {sorted(self.tls_versions)}"
+            )
+        enabled_versions = [k for k in self.tls_versions if tls.get(k) is True]
+        if tls.get("enabled") is True and self.tls_versions and not enabled_versions:
+            errors.append(f"{path}: sslTls enabled without a tls_version")
+        groups = tls.get("supportedGroups")
+        if isinstance(groups, dict) and self.supported_groups:
+            for k in sorted(set(groups) - self.supported_groups):
+                errors.append(
+                    f"{path}/supportedGroups/{k}: unknown supportedGroups, "
+                    f"expected one of {sorted(self.supported_groups)}"
+                )
+        if tls.get("enabled") is not True:
+            return
+        for cipher in tls.get("ciphers") or []:
+            if cipher not in self.ciphers:
+                errors.append(f"{path}/ciphers: unknown cipher {cipher!r}")
+        for signature_hash in tls.get("signatureHashAlgorithmsList") or []:
+            if signature_hash not in self.signature_hashes:
+                errors.append(
+                    f"{path}/signatureHashAlgorithmsList: unknown signature hash {signature_hash!r}"
+                )
+
+    def check_response_body(self, test, errors):
+        body = get_path(test, response_body_path)
+        if not isinstance(body, dict):
+            return
+        path = "/" + "/".join(response_body_path)
+        if body.get("type") not in object_body_types:
+            errors.append(
+                f"{path}/type: {body.get('type')!r}, expected one of {sorted(object_body_types)}"
+            )
+        config = body.get("config") or {}
+        if body.get("type") == "mixed":
+            distributions = config.get("distributions")
+            if not distributions or not all(
+                type_name(d) == "number" and d > 0 for d in distributions
+            ):
+                errors.append(
+                    f"{path}/config/distributions: {distributions!r}, expected object sizes"
+                )
+        elif "bytes" not in config:
+            errors.append(f"{path}/config/bytes: object size missing")
+
+    @staticmethod
+    def check_int_ranges(test, errors):
+        for path, lowest, highest in int_ranges:
+            value = get_path(test, path)
+            if value is None:
+                continue
+            if type_name(value) != "number" or int(value) != value:
+                errors.append(f"/{'/'.join(path)}: {value!r}, expected an integer")
+            elif value < lowest or (highest is not None and value > highest):
+                limit = f"{lowest} to {highest}" if highest is not None else f">= {lowest}"
+                errors.append(f"/{'/'.join(path)}: {value} out of range, expected {limit}")
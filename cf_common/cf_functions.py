@@ -1,5 +1,12 @@
+import hashlib
+import json
+import logging
 import pathlib
 
+from cf_common.CfLogging import LazyJson, setup_logging
+
+log = logging.getLogger(__name__)
+
 
 def verify_directory_structure(bool_project_dir, input_dir, output_dir, report_dir):
     # parent.parent assumes this function is in a sub directory of the main project
@@ -27,27 +34,22 @@ def verify_directory_structure(bool_project_dir, input_dir, output_dir, report_d
 
 def html_report(df_table, sub_report_tables, html_report_file, filter_columns,
                 script_version):
-    html = ""
-    for sub_table in sub_report_tables:
-        df_table.reset_df_filter()
-        df_table.filter_rows_containing(sub_table)
-        df_table.filter_columns(filter_columns)
-        # check if there are results in a table before adding it to the html file
-        if not len(df_table.df_filter.index) == 0:
-            if sub_table is None:
-                table_filter = f"<h3>ALL TESTS - including above tests</h3>"
-            else:
-                table_filter = f"<h3>{sub_table}</h3>"
-            html = html + table_filter + df_table.html_table(df_table.style_a())
+    html_reports(df_table, sub_report_tables, {html_report_file: filter_columns},
+                 script_version)
+
 
-    script_version_html = f"\n<body>" \
-                          f"\n<p>Script version: {script_version}</p>" \
-                          f"\n</body>"
+def html_reports(df_table, sub_report_tables, report_files, script_version):
+    """Writes several html reports of the same summary in a single pass
 
-    html = html + script_version_html
+    :param df_table: Report instance
+    :param sub_report_tables: test name filters, one table per filter
+    :param report_files: dict of html file path to list of columns
+    :param script_version: script version shown at the end of the report
+    :return: None
+    """
+    from cf_common.CfHtmlReport import HtmlReport
 
-    with open(html_report_file, "w") as f:
-        f.write(html)
+    HtmlReport(df_table).write(sub_report_tables, report_files, script_version)
 
 
 def csv_report(df_table, csv_report_file):
@@ -55,6 +57,217 @@ def csv_report(df_table, csv_report_file):
     df_table.df_filter.to_csv(csv_report_file, index=False)
 
 
+def summary_reports(report_csv_file, table, sub_report_tables, additional_reports,
+                    script_version):
+    """Writes the summary csv and html reports next to a detailed csv file
+
+    :param report_csv_file: pathlib.Path of the detailed csv file
+    :param table: Report instance of the detailed csv file
+    :param sub_report_tables: test name filters, one table per filter
+    :param additional_reports: dict of html report name to list of columns
+    :param script_version: script version shown at the end of the report
+    :return: list of report files written
+    """
+    report_csv_file = pathlib.Path(report_csv_file)
+    file_name = report_csv_file.stem
+    file_path = report_csv_file.parent
+    if file_name.endswith("_Detailed"):
+        file_name = file_name[: -len("_Detailed")]
+    # create summary csv report with all columns
+    csv_report_file = pathlib.Path(file_path / f"{file_name}_all").with_suffix(".csv")
+    csv_report(table, csv_report_file)
+
+    # create multiple html reports
+    report_files = {}
+    for k, v in additional_reports.items():
+        report_file = pathlib.Path(file_path / f"{file_name}_{k}").with_suffix(".html")
+        report_files[report_file] = v
+    html_reports(table, sub_report_tables, report_files, script_version)
+    return [csv_report_file] + list(report_files)
+
+
+def connect_client(controller_address, username, password, verify_ssl,
+                   agent_socket=None, pool_size=10, scheme="https"):
+    """Returns a client of the local agent if it is running, or a connected CfClient
+
+    :param agent_socket: Unix socket path of cf_agent.py, None to always connect
+    :param scheme: "http" for a local stand in controller, see CfMockController
+    :return: AgentClient or CfClient instance
+    """
+    if agent_socket is not None and pathlib.Path(agent_socket).exists():
+        from cf_common.CfAgent import AgentClient
+
+        try:
+            cf = AgentClient(agent_socket)
+            print(f"Using agent: {agent_socket}")
+            return cf
+        except OSError as detailed_exception:
+            print(f"Agent not available, connecting to controller: {detailed_exception}")
+            log.info(f"Agent {agent_socket} not available: {detailed_exception}")
+    from cf_common.CfClient import CfClient
+
+    cf = CfClient(controller_address, username, password, verify_ssl, pool_size, scheme)
+    cf.connect()
+    return cf
+
+
+def file_fingerprint(file, content_hash=True):
+    """Size, modification time and optionally sha256 of a file
+
+    :param file: pathlib.Path of the file
+    :param content_hash: include sha256 of the file content
+    :return: dict with size, mtime and sha256 keys
+    """
+    stat = file.stat()
+    fingerprint = {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+    if content_hash:
+        sha = hashlib.sha256()
+        with open(file, "rb") as f:
+            for block in iter(lambda: f.read(1048576), b""):
+                sha.update(block)
+        fingerprint["sha256"] = sha.hexdigest()
+    return fingerprint
+
+
+def summary_cache_file(report_csv_file):
+    return report_csv_file.with_suffix(".summary.json")
+
+
+def load_report(report_csv_file, column_order, memory_budget=256000000,
+                steady_states=None):
+    """Returns Report for a detailed csv file, using the cached summary if unchanged
+
+    The summary is cached next to the detailed file and keyed by file size,
+    modification time and content hash. The report index is updated as well.
+
+    :param report_csv_file: pathlib.Path of the detailed csv file
+    :param column_order: report columns
+    :param memory_budget: Report memory budget in bytes
+    :param steady_states: states averaged as the steady state, None for the default
+    :return: Report instance
+    """
+    from cf_common.CfReport import Report, default_steady_states
+
+    steady_states = list(steady_states or default_steady_states)
+
+    report_csv_file = pathlib.Path(report_csv_file)
+    cache_file = summary_cache_file(report_csv_file)
+    fingerprint = file_fingerprint(report_csv_file, content_hash=False)
+    if cache_file.is_file():
+        try:
+            with open(cache_file) as f:
+                cache = json.load(f)
+            cached = cache["fingerprint"]
+            if (
+                cached["size"] == fingerprint["size"]
+                and cached["mtime"] == fingerprint["mtime"]
+                and cache.get("steady_states", default_steady_states) == steady_states
+                and cached["sha256"] == file_fingerprint(report_csv_file)["sha256"]
+            ):
+                log.debug(f"Using cached summary: {cache_file}")
+                update_report_index(report_csv_file.parent, report_csv_file, cached)
+                return Report(
+                    report_csv_file,
+                    column_order,
+                    memory_budget,
+                    results=cache["results"],
+                    steady_states=steady_states,
+                )
+        except (ValueError, KeyError) as detailed_exception:
+            log.error(
+                f"Ignoring summary cache {cache_file}: \n<{detailed_exception}>"
+            )
+
+    fingerprint = file_fingerprint(report_csv_file)
+    table = Report(
+        report_csv_file, column_order, memory_budget, steady_states=steady_states
+    )
+    cache = {
+        "fingerprint": fingerprint,
+        "steady_states": steady_states,
+        "results": table.results,
+    }
+    with open(cache_file, "w") as f:
+        json.dump(cache, f, default=json_default)
+    update_report_index(report_csv_file.parent, report_csv_file, fingerprint)
+    return table
+
+
+def json_default(value):
+    # numpy scalars
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def report_index_file(report_dir):
+    return pathlib.Path(report_dir) / "report_index.json"
+
+
+def read_report_index(report_dir):
+    index_file = report_index_file(report_dir)
+    if not index_file.is_file():
+        return {}
+    try:
+        with open(index_file) as f:
+            return json.load(f)
+    except ValueError:
+        return {}
+
+
+def update_report_index(report_dir, report_csv_file, fingerprint=None):
+    """Adds or updates a detailed csv file in the report index
+
+    :param report_dir: report directory holding the index
+    :param report_csv_file: pathlib.Path of the detailed csv file
+    :param fingerprint: file_fingerprint result, taken from the file if None
+    :return: None
+    """
+    if fingerprint is None:
+        fingerprint = file_fingerprint(report_csv_file, content_hash=False)
+    index = read_report_index(report_dir)
+    index[report_csv_file.name] = {
+        "size": fingerprint["size"],
+        "mtime": fingerprint["mtime"],
+    }
+    write_report_index(report_dir, index)
+
+
+def write_report_index(report_dir, index):
+    index_file = report_index_file(report_dir)
+    temp_file = index_file.with_suffix(".tmp")
+    with open(temp_file, "w") as f:
+        json.dump(index, f, indent=4)
+    temp_file.replace(index_file)
+
+
+def latest_report_csv(report_dir):
+    """Returns the newest detailed csv file from the report index
+
+    run_tests.py indexes its detailed csv file when the run starts. The report
+    directory is scanned, and the files found indexed, only when the index is
+    missing, unreadable or lists no existing file.
+
+    :param report_dir: report directory
+    :return: pathlib.Path of the newest *Detailed.csv file or None
+    """
+    report_dir = pathlib.Path(report_dir)
+    index = read_report_index(report_dir)
+    for name, info in sorted(
+        index.items(), key=lambda item: item[1]["mtime"], reverse=True
+    ):
+        if (report_dir / name).is_file():
+            return report_dir / name
+    csv_files = list(report_dir.glob("*Detailed.csv"))
+    if not csv_files:
+        return None
+    for csv_file in csv_files:
+        fingerprint = file_fingerprint(csv_file, content_hash=False)
+        index[csv_file.name] = {"size": fingerprint["size"], "mtime": fingerprint["mtime"]}
+    write_report_index(report_dir, index)
+    return max(csv_files, key=lambda p: index[p.name]["mtime"])
+
+
 # def dut_refresh()
 #     # A test run has ended at this point, either successfully or not.
 #     # Perform DUT refresh and/or file transfers, if required.
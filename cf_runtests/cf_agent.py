@@ -0,0 +1,46 @@
+import pathlib
+import sys
+
+project_dir = pathlib.Path().absolute().parent
+sys.path.append(str(project_dir))
+
+from cf_common.CfClient import *
+from cf_runtests.input.cf_config import *
+from cf_runtests.input.credentials import *
+from cf_common.cf_functions import *
+from cf_common.CfAgent import CfAgent
+
+if (pathlib.Path.cwd() / "dev_settings.py").is_file():
+    from cf_runtests.dev_settings import *
+
+
+def main():
+    input_dir, output_dir, report_dir = verify_directory_structure(
+        in_project_dir, input_location, output_location, report_location
+    )
+    setup_logging(
+        log_file, log_level, log_per_run, log_max_bytes, log_backup_count, output_dir
+    )
+
+    if cf_agent_socket is None:
+        print("cf_agent_socket is not set in cf_config.py")
+        sys.exit(1)
+
+    cf = CfClient(cf_controller_address, username, password, verify_ssl, cf_agent_pool_size)
+    cf.connect()
+    log.info("Connected to controller")
+
+    # import pandas and the report modules once, they are used by the summary_reports
+    # requests
+    import cf_common.CfReport
+    import cf_common.CfHtmlReport
+
+    # stop with ctrl-c or the shutdown request
+    try:
+        CfAgent(cf, output_dir / cf_agent_socket).serve()
+    except KeyboardInterrupt:
+        print("\nAgent stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import pathlib
+import subprocess
+import sys
+
+project_dir = pathlib.Path().absolute().parent
+sys.path.append(str(project_dir))
+
+from cf_runtests.input.cf_config import *
+from cf_common.cf_functions import *
+
+if (pathlib.Path.cwd() / "dev_settings.py").is_file():
+    from cf_runtests.dev_settings import *
+
+# modules only reporting may load
+heavy_modules = ["pandas", "numpy", "jinja2"]
+library_modules = [
+    "cf_common.CfClient",
+    "cf_common.CfRunTest",
+    "cf_common.cf_functions",
+    "cf_common.CfCreateTest",
+]
+script_modules = [
+    "run_tests",
+    "create_tests",
+    "get_test",
+    "delete_created_tests",
+    "html_report",
+    "cf_agent",
+]
+
+
+def import_check(module, cwd):
+    """Imports module in a new interpreter
+
+    :param cwd: directory the interpreter runs in, scripts import from cf_runtests
+    :return: tuple of import seconds and list of heavy modules loaded
+    """
+    code = (
+        "import sys, time\n"
+        f"sys.path.append({str(project_dir)!r})\n"
+        "start = time.perf_counter()\n"
+        f"import {module}\n"
+        "seconds = time.perf_counter() - start\n"
+        f"print(seconds, *[m for m in {heavy_modules!r} if m in sys.modules])\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True, check=True
+    ).stdout.split()
+    return float(output[0]), output[1:]
+
+
+def main():
+    input_dir, output_dir, report_dir = verify_directory_structure(
+        in_project_dir, input_location, output_location, report_location
+    )
+    setup_logging(
+        log_file, log_level, log_per_run, log_max_bytes, log_backup_count, output_dir
+    )
+
+    failed = []
+    modules = [(m, project_dir) for m in library_modules]
+    modules += [(m, pathlib.Path.cwd()) for m in script_modules]
+    for module, cwd in modules:
+        seconds, loaded = import_check(module, cwd)
+        status = "ok" if not loaded else f"loads {', '.join(loaded)}"
+        print(f"{module:<28} {seconds * 1000:>8.1f} ms {status}")
+        log.info(f"import {module}: {seconds * 1000:.1f} ms, heavy modules {loaded}")
+        if loaded:
+            failed.append(module)
+    if failed:
+        report_error = f"Imports load {', '.join(heavy_modules)}: {', '.join(failed)}"
+        print(report_error)
+        log.error(report_error)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
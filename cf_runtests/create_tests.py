@@ -1,3 +1,4 @@
+import collections
 import pathlib
 import sys
 import random
@@ -11,80 +12,155 @@ from cf_runtests.input.cf_config import *
 from cf_runtests.input.credentials import *
 from cf_common.cf_functions import *
 from cf_common.CfCreateTest import *
+from cf_common.CfTestMatrix import TestMatrix
+from cf_common.CfTestRegistry import TestRegistry
 
 if (pathlib.Path.cwd() / "dev_settings.py").is_file():
     from cf_runtests.dev_settings import *
 
-input_dir, output_dir, report_dir = verify_directory_structure(
-    in_project_dir, input_location, output_location, report_location
-)
-
-cf = CfClient(cf_controller_address, username, password, verify_ssl)
-cf.connect()
-log.info("Connected to controller")
-
-create_tests_base_file = output_dir / create_tests_base_file
-
-# get base test from controller and save to file
-cf.get_test(create_tests_base_type, create_tests_base_test_id, create_tests_base_file)
-
-# load base test from file
-with open(create_tests_base_file) as infile:
-    base = json.load(infile)
-# bt = base test class instance
-bt = BaseTest(base)
-
-create_test_source_csv = input_dir / create_test_source_csv
-with open(create_test_source_csv, "r") as f:
-    reader = csv.DictReader(f)
-    test_list = list(reader)
-# print(f'\ntest_list\n{json.dumps(test_list, indent=4)}')
-
-# create tests to run csv file
-reference_to_run_csv_file = input_dir / reference_to_run_csv_file
-test_to_run_csv_file = input_dir / test_to_run_csv_file
-run_tests = TestsToRun(reference_to_run_csv_file, test_to_run_csv_file)
-
-create_tests_output_list_csv = output_dir / create_tests_output_list_csv
-with open(create_tests_output_list_csv, "w") as f:
-    created_tests = f"id,type,name"
-    f.write(created_tests)
-
-# check CyberFlood version
-cf_ver = cf.get_system_version()
-print(f"CyberFlood controller version: {cf_ver['version']}")
-log.debug(f"\nCyberFlood version response\n{json.dumps(cf_ver, indent=4)}")
-log.debug(f"CyberFlood controller version: {cf_ver['version']}")
-
-# set test name suffix to be used if input sheet is not set to "auto"
-chars = 3
-suffix = "".join(random.choices(string.ascii_lowercase + string.digits, k=chars))
-
-
-for test in test_list:
-    if test["include"].lower() in {"y", "yes"}:
-        print(f"creating test: {json.dumps(test, indent=4)}")
-        # load test template from controller
-        test_template = cf.fetch_test_template(
-            test["type"], output_dir / "template_last_created.json"
-        )
-        log.debug(f"\nTemplate response\n{json.dumps(test_template, indent=4)}")
-        # instantiate new test
-        if test["name_suffix"] == "auto":
-            test["name_suffix"] = suffix
-        new = CfCreateTest(base, test, test_template, cf_ver["version"])
-        new.update_config_changes()
-        last_created_test = output_dir / "last_created_test.json"
-        new.save_test(last_created_test)
-
-        response = cf.post_test(test["type"], last_created_test)
-        log.debug(f"\nPost response\n{json.dumps(response, indent=4)}")
-        if "type" in response:
-            if response["type"] == "validation":
-                print(json.dumps(response, indent=4))
-                sys.exit(1)
-        run_tests.add_test(response, test["type"])
-        test_info = f"\n{response['id']},{test['type']},{response['name']}"
-        print(f"test info: {test_info}")
-        with open(create_tests_output_list_csv, "a") as f:
-            f.write(test_info)
+
+def main():
+    input_dir, output_dir, report_dir = verify_directory_structure(
+        in_project_dir, input_location, output_location, report_location
+    )
+    setup_logging(
+        log_file, log_level, log_per_run, log_max_bytes, log_backup_count, output_dir
+    )
+
+    cf = connect_client(
+        cf_controller_address,
+        username,
+        password,
+        verify_ssl,
+        None if cf_agent_socket is None else output_dir / cf_agent_socket,
+    )
+    log.info("Connected to controller")
+
+    base_file = output_dir / create_tests_base_file
+
+    # get base test from controller and save to file
+    base = cf.get_test(create_tests_base_type, create_tests_base_test_id, base_file)
+    # bt = base test class instance
+    bt = BaseTest(base)
+
+    # tests to create from a matrix of axes or from the create tests CSV file
+    if create_test_source_matrix is not None:
+        test_matrix = TestMatrix(input_dir / create_test_source_matrix)
+        print(f"test matrix: {len(test_matrix)} combinations before exclusions")
+    else:
+        with open(input_dir / create_test_source_csv, "r") as f:
+            reader = csv.DictReader(f)
+            test_list_csv = list(reader)
+        # print(f'\ntest_list\n{json.dumps(test_list, indent=4)}')
+
+    # create tests to run csv file
+    run_tests = TestsToRun(
+        input_dir / reference_to_run_csv_file, input_dir / test_to_run_csv_file
+    )
+
+    # check CyberFlood version
+    cf_ver = cf.get_system_version()
+    print(f"CyberFlood controller version: {cf_ver['version']}")
+    log.debug("\nCyberFlood version response\n%s", LazyJson(cf_ver))
+    log.debug(f"CyberFlood controller version: {cf_ver['version']}")
+
+    # test templates, fetched once per test type and controller version
+    template_cache_file = None
+    if create_tests_template_cache is not None:
+        template_cache_file = output_dir / create_tests_template_cache
+    templates = TemplateCache(
+        cf,
+        cf_ver["version"],
+        template_cache_file,
+        create_tests_ciphers,
+        create_tests_signature_hashes,
+    )
+
+    # set test name suffix to be used if input sheet is not set to "auto"
+    chars = 3
+    suffix = "".join(random.choices(string.ascii_lowercase + string.digits, k=chars))
+
+    # registry of created tests, unchanged tests are reused and changed tests updated
+    registry = None
+    if create_tests_registry is not None:
+        registry = TestRegistry(output_dir / create_tests_registry, cf.controller_ip)
+
+    def included_tests():
+        # the matrix is expanded again for each pass, rows are not kept in memory
+        if create_test_source_matrix is not None:
+            test_list = test_matrix.rows()
+        else:
+            test_list = test_list_csv
+        for test in test_list:
+            if test["include"].lower() in {"y", "yes"}:
+                if test["name_suffix"] == "auto":
+                    # registered tests keep their name
+                    if registry is not None:
+                        test["name_suffix"] = registry.name_suffix(test["name"], suffix)
+                    else:
+                        test["name_suffix"] = suffix
+                yield test
+
+    def tests_to_create():
+        for test in included_tests():
+            print(f"creating test: {json.dumps(test, indent=4)}")
+            yield test
+
+    bulk = BulkCreate(
+        cf,
+        base,
+        templates,
+        cf_ver["version"],
+        output_dir if debug_config_files else None,
+        create_tests_workers,
+        registry,
+    )
+
+    # validate all test configs before any test is created on the controller
+    if create_tests_prevalidate:
+        invalid_tests = bulk.check(included_tests())
+        if invalid_tests:
+            for result in invalid_tests:
+                print(f"invalid: row {result['row']} {result['test']['name']}: {result['error']}")
+                log.error(f"invalid test config {result['test']['name']}: {result['error']}")
+            print(f"\n{len(invalid_tests)} invalid tests, no tests created")
+            sys.exit(1)
+
+    # created tests are written as results arrive, tests to run once all are added
+    actions = collections.Counter()
+    failed_tests = []
+    with open(output_dir / create_tests_output_list_csv, "w") as f:
+        f.write(f"id,type,name")
+        for result in bulk.run(tests_to_create()):
+            test = result["test"]
+            if result["error"] is not None:
+                print(f"\nunable to create test: {test['name']}\n{result['error']}")
+                failed_tests.append(result)
+                continue
+            response = result["response"]
+            print(f"test {result['action']}: {response['id']},{test['type']},{response['name']}")
+            actions[result["action"]] += 1
+            f.write(f"\n{response['id']},{test['type']},{response['name']}")
+            if registry is not None:
+                # saved per test, an interrupted run keeps its registrations
+                if result["action"] != "reused":
+                    registry.save()
+                # regenerate tests to run from the registry
+                entry = registry.get(test["name"])
+                run_tests.add_test(entry, entry["type"])
+            else:
+                run_tests.add_test(response, test["type"])
+    run_tests.write()
+
+    print(
+        f"\ncreated {actions['created']}, updated {actions['updated']}, "
+        f"reused {actions['reused']} tests, {len(failed_tests)} failed"
+    )
+    for result in failed_tests:
+        print(f"failed: row {result['row']} {result['test']['name']}: {result['error']}")
+    if failed_tests:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,36 +9,98 @@ from cf_common.CfClient import *
 from cf_runtests.input.cf_config import *
 from cf_runtests.input.credentials import *
 from cf_common.cf_functions import *
+from cf_common.CfDeleteTest import BulkDelete, StaleTests
+from cf_common.CfTestRegistry import TestRegistry
 
 
 if (pathlib.Path.cwd() / "dev_settings.py").is_file():
     from cf_runtests.dev_settings import *
 
-input_dir, output_dir, report_dir = verify_directory_structure(
-    in_project_dir, input_location, output_location, report_location
-)
-
-cf = CfClient(cf_controller_address, username, password, verify_ssl)
-cf.connect()
-
-delete_test_list_csv = output_dir / delete_tests_csv
-
-with open(delete_test_list_csv, "r") as f:
-    reader = csv.DictReader(f)
-    test_list = list(reader)
-print(f"\ntest_list\n{json.dumps(test_list, indent=4)}")
-
-for test in test_list:
-    last_deleted_test = output_dir / "last_deleted_test.json"
-    print(f"checking if test exists: {test['id']}  {test['name']}")
-    response = cf.get_test(test["type"], test["id"], last_deleted_test)
-    if "id" in response:
-        print(f"test exists, attempting to delete: {test['id']}  {test['name']}")
-        # print(f'\nTest to delete:\n{json.dumps(response, indent=4)}')
-        response = cf.delete_test(test["type"], test["id"])
-        if response.status_code == 204:
-            print(f"test successfully deleted: {test['id']}  {test['name']}")
-        else:
-            print(f"Test may not have been deleted: {response}")
+
+def csv_test_ids(csv_file):
+    """Test ids of a csv file with an id column, empty if the file does not exist"""
+    if not csv_file.is_file():
+        return set()
+    with open(csv_file, "r") as f:
+        return {row["id"] for row in csv.DictReader(f) if row.get("id")}
+
+
+def main():
+    input_dir, output_dir, report_dir = verify_directory_structure(
+        in_project_dir, input_location, output_location, report_location
+    )
+    setup_logging(
+        log_file, log_level, log_per_run, log_max_bytes, log_backup_count, output_dir
+    )
+
+    cf = connect_client(
+        cf_controller_address,
+        username,
+        password,
+        verify_ssl,
+        None if cf_agent_socket is None else output_dir / cf_agent_socket,
+        max(10, delete_tests_workers),
+    )
+
+    if delete_tests_mode == "gc":
+        # garbage collection of generated tests left on the controller
+        # tests of the run tests csv files are kept
+        keep_ids = {create_tests_base_test_id, get_test_id}
+        for csv_file in {run_tests_from_csv, test_to_run_csv_file, reference_to_run_csv_file}:
+            keep_ids |= csv_test_ids(input_dir / csv_file)
+        # tests created by create_tests, the only ones selected by age alone
+        created_ids = csv_test_ids(output_dir / create_tests_output_list_csv)
+        if create_tests_registry is not None:
+            registry = TestRegistry(output_dir / create_tests_registry, cf.controller_ip)
+            created_ids |= {entry["id"] for entry in registry.entries.values()}
+        try:
+            stale_tests = StaleTests(
+                delete_tests_gc_name_suffixes,
+                delete_tests_gc_older_than_days,
+                keep_ids=keep_ids,
+                created_ids=created_ids,
+            )
+        except ValueError as e:
+            print(f"\nUnable to select stale tests: {e}")
+            sys.exit(1)
+        test_list = []
+        for test_type in delete_tests_gc_types:
+            test_list.extend(stale_tests.select(cf.list_tests(test_type), test_type))
+        print(f"\n{len(test_list)} stale tests on the controller")
+        if delete_tests_gc_dry_run:
+            for test in test_list:
+                print(f"stale test: {test['id']}  {test['type']}  {test['name']}")
+            print("dry run, set delete_tests_gc_dry_run to False to delete them")
+            return
     else:
-        print(f"\nunable to delete test: {test['id']}  {test['name']}\n")
+        delete_test_list_csv = output_dir / delete_tests_csv
+        with open(delete_test_list_csv, "r") as f:
+            reader = csv.DictReader(f)
+            test_list = list(reader)
+        print(f"\ntest_list\n{json.dumps(test_list, indent=4)}")
+
+    deleted_ids = []
+    failed = 0
+    for result in BulkDelete(cf, delete_tests_workers).run(test_list):
+        test = result["test"]
+        if result["deleted"]:
+            if result["error"] is None:
+                print(f"test successfully deleted: {test['id']}  {test['name']}")
+            else:
+                print(f"test already deleted: {test['id']}  {test['name']}")
+            deleted_ids.append(test["id"])
+        else:
+            failed += 1
+            print(f"\nunable to delete test: {test['id']}  {test['name']}\n{result['error']}")
+            log.error(f"unable to delete test {test['id']} {test['name']}: {result['error']}")
+    print(f"\ndeleted {len(deleted_ids)} tests, {failed} failed")
+
+    # deleted tests are created again by the next create_tests.py run
+    if create_tests_registry is not None:
+        registry = TestRegistry(output_dir / create_tests_registry, cf.controller_ip)
+        if registry.remove_ids(deleted_ids):
+            registry.save()
+
+
+if __name__ == "__main__":
+    main()
@@ -12,15 +12,29 @@ from cf_common.cf_functions import *
 if (pathlib.Path.cwd() / "dev_settings.py").is_file():
     from cf_runtests.dev_settings import *
 
-input_dir, output_dir, report_dir = verify_directory_structure(
-    in_project_dir, input_location, output_location, report_location
-)
-
-cf = CfClient(cf_controller_address, username, password, verify_ssl)
-cf.connect()
-
-response = cf.get_test(get_test_type, get_test_id, output_dir / get_test_to_file)
-if cf.exception_state:
-    print(f"\nSaved to file: {get_test_to_file} \n{json.dumps(response, indent=4)}")
-else:
-    print(f"Unable to save test id: {get_test_id} with test type: {get_test_type}")
+
+def main():
+    input_dir, output_dir, report_dir = verify_directory_structure(
+        in_project_dir, input_location, output_location, report_location
+    )
+    setup_logging(
+        log_file, log_level, log_per_run, log_max_bytes, log_backup_count, output_dir
+    )
+
+    cf = connect_client(
+        cf_controller_address,
+        username,
+        password,
+        verify_ssl,
+        None if cf_agent_socket is None else output_dir / cf_agent_socket,
+    )
+
+    response = cf.get_test(get_test_type, get_test_id, output_dir / get_test_to_file)
+    if cf.exception_state:
+        print(f"\nSaved to file: {get_test_to_file} \n{json.dumps(response, indent=4)}")
+    else:
+        print(f"Unable to save test id: {get_test_id} with test type: {get_test_type}")
+
+
+if __name__ == "__main__":
+    main()
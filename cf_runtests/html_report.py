@@ -1,5 +1,3 @@
-import numpy as np
-import pandas as pd
 import pathlib
 import sys
 
@@ -8,36 +6,82 @@ sys.path.append(str(project_dir))
 
 from cf_runtests.input.cf_config import *
 from cf_common.cf_functions import *
-from cf_common.CfRunTest import *
+from cf_common.CfRunTest import script_version
 
 if (pathlib.Path.cwd() / "dev_settings.py").is_file():
     from cf_runtests.dev_settings import *
 
-input_dir, output_dir, report_dir = verify_directory_structure(
-    in_project_dir, input_location, output_location, report_location
-)
-
-if html_report_csv is None:
-    csv_files = report_dir.glob("*Detailed.csv")
-    latest_csv_file = max(csv_files, key=lambda p: p.stat().st_mtime)
-    print(latest_csv_file)
-
-# v2
-table = Report(latest_csv_file, col_order)
-file_name = latest_csv_file.stem
-file_path = latest_csv_file.parent
-if file_name.endswith("_Detailed"):
-    file_name = file_name[: -len("_Detailed")]
-# create summary csv report with all columns
-csv_name = file_name + "_all"
-csv_report_file = pathlib.Path(file_path / csv_name).with_suffix(".csv")
-print(csv_report_file)
-csv_report(table, csv_report_file)
-
-# create multiple html reports
-for k, v in html_additional_reports.items():
-    new_name = file_name + "_" + k
-    report_file = pathlib.Path(file_path / new_name).with_suffix(".html")
-    print(report_file)
-    print(v)
-    html_report(table, report_tables, report_file, v, script_version)
+
+def main():
+    input_dir, output_dir, report_dir = verify_directory_structure(
+        in_project_dir, input_location, output_location, report_location
+    )
+    setup_logging(
+        log_file, log_level, log_per_run, log_max_bytes, log_backup_count, output_dir
+    )
+
+    latest_run = None
+    if html_report_from_store:
+        if results_store_db is None:
+            print("html_report_from_store requires results_store_db, using the csv report")
+            log.error("html_report_from_store set without results_store_db")
+        else:
+            from cf_common.CfResultsStore import ResultsStore
+
+            results_store = ResultsStore(report_dir / results_store_db)
+            latest_run = results_store.latest_run()
+            if latest_run is None:
+                print(f"No runs in {results_store_db}, using the csv report")
+                log.error(f"no runs in {report_dir / results_store_db}")
+    if latest_run is not None:
+        from cf_common.CfReport import Report
+
+        latest_csv_file = pathlib.Path(latest_run["report_file"])
+        print(f"{latest_run['run_key']} from {results_store_db}")
+        table = Report(
+            latest_csv_file,
+            col_order,
+            chunks=results_store.detailed_frames(latest_run["run_key"]),
+            steady_states=report_steady_states,
+        )
+    else:
+        if html_report_csv is None:
+            latest_csv_file = latest_report_csv(report_dir)
+        else:
+            latest_csv_file = report_dir / html_report_csv
+        print(latest_csv_file)
+        table = None
+        agent = None
+        if cf_agent_socket is not None and (output_dir / cf_agent_socket).exists():
+            from cf_common.CfAgent import AgentClient
+
+            try:
+                agent = AgentClient(output_dir / cf_agent_socket)
+            except OSError as e:
+                print(f"Agent not available, creating reports locally: {e}")
+        if agent is not None:
+            # the agent has pandas loaded and renders the reports
+            report_files = agent.summary_reports(
+                latest_csv_file,
+                col_order,
+                report_memory_budget,
+                report_tables,
+                html_additional_reports,
+                script_version,
+                report_steady_states,
+            )
+        else:
+            # v2
+            table = load_report(
+                latest_csv_file, col_order, report_memory_budget, report_steady_states
+            )
+    if table is not None:
+        report_files = summary_reports(
+            latest_csv_file, table, report_tables, html_additional_reports, script_version
+        )
+    for report_file in report_files:
+        print(report_file)
+
+
+if __name__ == "__main__":
+    main()
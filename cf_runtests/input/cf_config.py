@@ -16,18 +16,38 @@ input_location = "input"
 output_location = "output"
 #  TLS certificate validation - False or True
 verify_ssl = False
+# save generated test configs and load updates as json files in output_location for debugging
+debug_config_files = False
+
+# local agent started with cf_agent.py, scripts use it instead of connecting to the controller
+cf_agent_socket = 'cf_agent.sock'  # located in output sub directory, None to always connect
+cf_agent_pool_size = 16  # connections to the controller kept by the agent
+
+# script logs, located in output sub directory, written by a background thread
+log_file = 'cf.log'
+log_per_run = True  # one file per run, e.g. cf_run_tests_20201120-153000.log, False to reuse log_file
+log_level = 'DEBUG'  # 'INFO' does not serialize controller responses to the log
+log_max_bytes = 50000000  # rotate the log file at this size, 0 to never rotate
+log_backup_count = 5  # number of rotated log files kept
 
 
 # create_tests.py base test ID - use working HTTP Throughput test from controller.
 # create_tests will use this ID to copy port group, subnets and other settings from.
 create_tests_base_test_id = '30cb822c541ad0b3aadbde98b915f471'
 create_test_source_csv = 'create_tests_nso.csv'  # located in input sub directory, do not put subdir in var
+create_test_source_matrix = None  # e.g. 'create_tests_matrix.json', used instead of create_test_source_csv
 reference_to_run_csv_file = 'run_tests_reference.csv'
 test_to_run_csv_file = 'run_tests.csv'
 # Files for logging purposes:
 create_tests_output_list_csv = 'created_tests.csv'  # located in output sub directory
 create_tests_base_type = 'http_throughput'  # 'http_throughput' or 'http_connections_per_second'
 create_tests_base_file = 'base_test_config.json'  # located in output sub directory, do not put subdir in var
+create_tests_template_cache = 'template_cache.json'  # located in output sub directory, None to not save templates
+create_tests_workers = 4  # number of tests posted to the controller at the same time
+create_tests_prevalidate = True  # validate all generated tests before creating any
+create_tests_ciphers = []  # cipher suites the controller accepts in addition to the built in list, OpenSSL names
+create_tests_signature_hashes = []  # signature hash algorithms the controller accepts in addition to the built in list
+create_tests_registry = 'created_tests_registry.json'  # located in output sub directory, None to always create new tests
 
 # get_test.py - get copy of test ID
 get_test_id = 'c71c621a39bb9d10862bf30182d14796'
@@ -36,12 +56,86 @@ get_test_to_file = 'get_test_config.json'
 
 # delete_created_tests.py
 delete_tests_csv = create_tests_output_list_csv  # csv file with tests to delete - from Global_settings output_location
+delete_tests_mode = 'csv'  # 'csv' deletes the tests in delete_tests_csv, 'gc' purges stale tests on the controller
+delete_tests_workers = 8  # number of tests deleted at the same time
+delete_tests_gc_types = ['http_throughput', 'http_connections_per_second', 'open_connections']
+delete_tests_gc_name_suffixes = None  # e.g. ['j2'] for tests named <name>_j2, None for any name
+delete_tests_gc_older_than_days = None  # e.g. 30, None for any age, a suffix or an age is required
+# without suffixes only tests in created_tests.csv or the registry are deleted by age, tests in run tests csv files are kept
+delete_tests_gc_dry_run = True  # list stale tests without deleting them
 
 # run_tests.py
 run_tests_from_csv = 'run_tests.csv'  # from Global_settings input_location
+# detailed report flush: 'tick' (every interval), 'interval' (every N intervals) or 'phase' (on phase change)
+detailed_report_flush = 'tick'
+detailed_report_flush_interval = 10  # used with 'interval'
+detailed_report_sidecar = None  # None, 'parquet' or 'arrow' - typed copy of detailed report, requires pyarrow
+detailed_report_raw_archive = True  # raw controller payloads in <time stamp>_Raw.jsonl.gz, see CfRawArchive
+# profiles of each test phase and report step with cProfile and tracemalloc, slows the harness
+profile_phases = False  # True to write <time stamp>_Profile/<test>_<phase>.prof files in the report sub directory
+profile_top = 20  # functions and allocation sites per phase in <time stamp>_Profile/profile_summary.txt
+profile_allocations = True  # allocation growth per phase and test with tracemalloc
+# live metrics of the running test in Prometheus text format on http://<metrics_host>:<metrics_port>/metrics
+metrics_port = None  # None to disable, e.g. 9464
+metrics_host = '127.0.0.1'  # '0.0.0.0' to serve other hosts
+# SQLite results store across runs, located in report sub directory, None to disable
+results_store_db = 'results.db'
+results_store_label = None  # label stored with the run, e.g. DUT firmware build
+
+# replay_tests.py - replays archived runs through the test control logic, no controller needed
+replay_raw_archive = None  # e.g. '20201120-1530_Raw.jsonl.gz' located in report sub directory, None for the latest
+replay_test_names = None  # e.g. ['T06-TLS-CPS-EC-DSA256-A128-GCM-S2-1K_j2'], None for all tests of the archive
+replay_overrides = {}  # run_tests.csv columns to change, e.g. {'max_variance': '0.02', 'variance_sample_size': '5'}
+
+# simulate_tests.py - runs the tests of run_tests_from_csv on a simulated DUT, no controller needed
+# DutModel settings, the detailed report is written to the output sub directory
+simulate_dut = {'capacity': 50000, 'txns_per_load': 100, 'latency_ms': 1.0, 'noise': 0.01, 'error_onset': 0.9, 'seed': 0}
+
+# tune_goal_seek.py - searches goal seek settings on simulated DUT profiles in a process pool
+# the best settings per test type and load type of run_tests_reference.csv are written to tune_output_csv
+tune_space = {
+    'incr_low': [3, 5, 7, 10],
+    'incr_med': [2, 3, 5],
+    'incr_high': [1, 2],
+    'low_threshold': [10, 20, 40],
+    'med_threshold': [3, 5, 10],
+    'high_threshold': [0.5, 1, 2],
+    'variance_sample_size': [2, 3, 5],
+    'max_variance': [0.01, 0.03, 0.05],
+}
+tune_profiles = [  # DutModel settings, every setting is tried on every profile
+    {'capacity': 50000, 'txns_per_load': 100, 'noise': 0.01, 'seed': 0},
+    {'capacity': 8000, 'txns_per_load': 20, 'noise': 0.03, 'seed': 1},
+    {'capacity': 200000, 'txns_per_load': 400, 'noise': 0.02, 'knee': 4, 'seed': 2},
+]
+tune_raw_archives = []  # e.g. ['20201120-1530_Raw.jsonl.gz'] located in report sub directory, each run adds a fitted profile
+tune_capacity_margin = 0.05  # settings qualify when the settled tps is within 5% of the true capacity on all profiles
+tune_max_trials = 200  # settings sampled from tune_space, None for all combinations
+tune_workers = None  # processes, None for one per cpu
+tune_seed = 0
+tune_output_csv = 'run_tests_reference_tuned.csv'  # located in output sub directory
+
+# run_benchmarks.py - times the per tick and report hot paths on synthetic data, no controller needed
+# results are saved in the output/benchmarks sub directory and compared with the previous results
+benchmark_names = None  # e.g. ['rolling_stats', 'report'], None for all, see CfBenchmark.benchmarks
+benchmark_report_rows = [10000, 100000]  # detailed csv rows of the report benchmarks, e.g. add 1000000
+benchmark_matrix_rows = [1000, 10000]  # create tests rows of the update_config_changes benchmarks
+benchmark_repeat = 5  # best of repeat runs is kept
+benchmark_tolerance = 0.2  # slower by more than 20% vs. the baseline is a regression
+benchmark_baseline_runs = 5  # baseline is the median of the last runs without regressions or failures
+
+# run_overhead.py - runs the tests of run_tests_from_csv against a local stand in controller
+# and measures the harness overhead, results are saved in the output/overhead sub directory
+overhead_latency_ms = 20  # response latency of the stand in controller
+overhead_clock_scale = 60  # test time runs this many times faster, 1800 second tests take 30 seconds
+overhead_duration = None  # seconds, replaces the duration of the tests, None to keep it
+overhead_trace_allocations = True  # allocations per tick with tracemalloc, slows the harness
 
 # html_report.py and report portion of run_test.py
 html_report_csv = None  # If None take latest csv file from Report directory
+report_memory_budget = 256000000  # bytes, larger detailed csv files are summarized in chunks
+html_report_from_store = False  # True to report the latest run from results_store_db instead of a csv file
+report_steady_states = ['steady']  # states averaged as steady state, e.g. ['steady', 'goalseek']
 report_tables = ['HTTP-CPS', 'HTTP-TPUT', 'TLS-CPS', 'TLS-TPUT', 'HTTP-LAT', 'TLS-LAT', 'HTTP-CON', 'TLS-CON', None]
 col_order = ['test_name', 'cps', 'tps', 'total_bandwidth', 'open_conns',
              'tcp_avg_tt_synack', 'tcp_avg_ttfb', 'url_response_time',
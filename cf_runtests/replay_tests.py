@@ -0,0 +1,78 @@
+import pathlib
+import sys
+
+project_dir = pathlib.Path().absolute().parent
+sys.path.append(str(project_dir))
+
+from cf_runtests.input.cf_config import *
+from cf_common.cf_functions import *
+from cf_common.CfRawArchive import RawArchiveReader
+from cf_common.CfReplay import ReplayResults, replay_run
+
+if (pathlib.Path.cwd() / "dev_settings.py").is_file():
+    from cf_runtests.dev_settings import *
+
+
+def main():
+    input_dir, output_dir, report_dir = verify_directory_structure(
+        in_project_dir, input_location, output_location, report_location
+    )
+    setup_logging(
+        log_file, log_level, log_per_run, log_max_bytes, log_backup_count, output_dir
+    )
+
+    if replay_raw_archive is None:
+        archives = sorted(report_dir.glob("*_Raw.jsonl.gz"))
+        if not archives:
+            print(f"No raw archive in {report_dir}")
+            sys.exit(1)
+        archive_file = archives[-1]
+    else:
+        archive_file = report_dir / replay_raw_archive
+    print(f"Replaying {archive_file}")
+    if replay_overrides:
+        print(f"overrides: {replay_overrides}")
+
+    reader = RawArchiveReader(archive_file)
+    results = ReplayResults()
+    for run in reader.runs():
+        if replay_test_names is not None and run["name"] not in replay_test_names:
+            continue
+        try:
+            replay = replay_run(reader, run["run_id"], replay_overrides, results)
+        except ValueError as e:
+            print(f"\nUnable to replay {run['name']}: {e}")
+            log.error(f"Unable to replay {run['name']}: {e}")
+            continue
+        original = replay["original"]
+        changed = replay["replay"]
+        print(
+            f"\n{replay['name']} {replay['run_id']}"
+            f"\n  original: {len(original)} load changes, "
+            f"last load {original[-1]['load'] if original else None}"
+            f"\n  replay:   {len(changed)} load changes, "
+            f"last load {changed[-1]['load'] if changed else None}, "
+            f"stopped at {replay['stopped_at']}s in phase {replay['phase']}"
+        )
+
+    # summary of the replayed samples with the report steady state rules
+    file_name = archive_file.name[: -len("_Raw.jsonl.gz")]
+    replay_csv_file = report_dir / f"{file_name}_Replay.csv"
+    results.write(replay_csv_file)
+    print(f"\n{replay_csv_file}")
+    if results.rows:
+        from cf_common.CfReport import Report
+
+        table = Report(
+            replay_csv_file,
+            col_order,
+            report_memory_budget,
+            steady_states=report_steady_states,
+        )
+        csv_report_file = report_dir / f"{file_name}_Replay_all.csv"
+        csv_report(table, csv_report_file)
+        print(csv_report_file)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+import pathlib
+import sys
+
+project_dir = pathlib.Path().absolute().parent
+sys.path.append(str(project_dir))
+
+from cf_runtests.input.cf_config import *
+from cf_common.cf_functions import *
+from cf_common.CfBenchmark import (
+    BenchmarkContext,
+    compare_results,
+    previous_results,
+    run_benchmarks,
+    save_results,
+)
+
+if (pathlib.Path.cwd() / "dev_settings.py").is_file():
+    from cf_runtests.dev_settings import *
+
+
+def main():
+    input_dir, output_dir, report_dir = verify_directory_structure(
+        in_project_dir, input_location, output_location, report_location
+    )
+    setup_logging(
+        log_file, log_level, log_per_run, log_max_bytes, log_backup_count, output_dir
+    )
+
+    benchmark_dir = output_dir / "benchmarks"
+    benchmark_dir.mkdir(exist_ok=True)
+    context = BenchmarkContext(
+        col_order,
+        benchmark_report_rows,
+        benchmark_matrix_rows,
+        benchmark_repeat,
+        report_memory_budget,
+        report_tables,
+    )
+    try:
+        results = run_benchmarks(context, benchmark_names)
+    finally:
+        context.close()
+
+    regressions = compare_results(
+        results, previous_results(benchmark_dir, benchmark_baseline_runs), benchmark_tolerance
+    )
+    for result in results:
+        change = ""
+        if result["change"] is not None:
+            change = f"{result['change'] * 100:+.1f}%"
+        if result["failed"]:
+            change += f" failed: {result['failed']}"
+        print(
+            f"{result['name']:<24} {result['seconds'] * 1e6:>14,.1f} us "
+            f"(median {result['median'] * 1e6:,.1f} us) {change}"
+        )
+    results_file = save_results(results, benchmark_dir, regressions)
+    print(f"\n{results_file}")
+    if regressions:
+        report_error = (
+            f"Slower by more than {benchmark_tolerance * 100:.0f}% or failed: "
+            f"{', '.join(regressions)}"
+        )
+        print(report_error)
+        log.error(report_error)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
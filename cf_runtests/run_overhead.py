@@ -0,0 +1,110 @@
+import csv
+import json
+import pathlib
+import sys
+import time
+
+project_dir = pathlib.Path().absolute().parent
+sys.path.append(str(project_dir))
+
+from cf_runtests.input.cf_config import *
+from cf_common.cf_functions import *
+from cf_common.CfClock import ScaledClock
+from cf_common.CfMockController import MockController
+from cf_common.CfOverhead import MeasuredClient, OverheadMonitor
+from cf_common.CfRunTest import DetailedCsvReport
+from cf_runtests.run_tests import run_test_list
+
+if (pathlib.Path.cwd() / "dev_settings.py").is_file():
+    from cf_runtests.dev_settings import *
+
+
+def main():
+    input_dir, output_dir, report_dir = verify_directory_structure(
+        in_project_dir, input_location, output_location, report_location
+    )
+    setup_logging(
+        log_file, log_level, log_per_run, log_max_bytes, log_backup_count, output_dir
+    )
+
+    with open(input_dir / run_tests_from_csv, "r") as f:
+        reader = csv.DictReader(f)
+        test_list = list(reader)
+    test_list = sorted(test_list, key=lambda k: k["run_order"])
+    if overhead_duration is not None:
+        for test in test_list:
+            test["duration"] = str(overhead_duration)
+    tests = [
+        (test["type"], test["id"], test["name"])
+        for test in test_list
+        if test["run"].lower() in {"y", "yes", "true"}
+    ]
+
+    clock = ScaledClock(overhead_clock_scale)
+    controller = MockController(
+        simulate_dut, tests, clock.scale, clock.origin, overhead_latency_ms / 1000
+    )
+    address = controller.start()
+    print(
+        f"Stand in controller {address}: latency {overhead_latency_ms} ms, "
+        f"clock scale {overhead_clock_scale}, {len(tests)} tests"
+    )
+    # reports of the stand in controller are kept out of the report directory
+    overhead_dir = output_dir / "overhead"
+    overhead_dir.mkdir(exist_ok=True)
+    monitor = OverheadMonitor(clock, overhead_trace_allocations)
+    try:
+        cf = connect_client(address, "overhead", "overhead", False, scheme="http")
+        detailed_report = DetailedCsvReport(
+            overhead_dir,
+            detailed_report_flush,
+            detailed_report_flush_interval,
+            detailed_report_sidecar,
+            None,
+            detailed_report_raw_archive,
+        )
+        detailed_report.append_columns()
+        monitor.start()
+        run_test_list(MeasuredClient(cf, monitor), test_list, detailed_report, overhead_dir, monitor)
+        monitor.stop()
+        detailed_report.close()
+    finally:
+        controller.stop()
+
+    summary = monitor.summary()
+    summary["latency_ms"] = overhead_latency_ms
+    summary_file = overhead_dir / f"{time.strftime('%Y%m%d-%H%M%S')}_Overhead.json"
+    with open(summary_file, "w") as f:
+        json.dump(summary, f, indent=4)
+    log.info(f"overhead: {summary}")
+
+    def ms(values):
+        return ", ".join(
+            f"{k} {v:,.2f}" if v is not None else f"{k} -" for k, v in values.items()
+        )
+
+    print(
+        f"\n{summary['tests']} tests, {summary['ticks']} ticks, {summary['requests']} requests"
+        f"\ntick cpu ms:        {ms(summary['tick_cpu_ms'])}"
+        f"\ntick harness ms:    {ms(summary['tick_harness_ms'])}"
+        f"\ntick requests ms:   {ms(summary['tick_requests_ms'])}"
+        f"\ntick overrun ms:    {ms(summary['tick_period_overrun_ms'])}"
+        f"\ntick jitter ms:     {ms(summary['tick_jitter_ms'])}"
+    )
+    if overhead_trace_allocations:
+        print(
+            f"tick allocated KiB: {ms(summary['tick_allocated_kib'])}"
+            f"\nmemory growth KiB:  {summary['memory_growth_kib']:,.1f}"
+        )
+    print(
+        f"between tests s:    {ms(summary['between_tests_s'])}"
+        f"\nsuite {summary['suite_seconds']:,.1f}s, traffic {summary['traffic_seconds']:,.1f}s, "
+        f"overhead {summary['overhead_seconds']:,.1f}s "
+        f"({summary['overhead_fraction'] * 100:.1f}% of the suite at clock scale "
+        f"{summary['scale']:g}, {summary['real_time_overhead_fraction'] * 100:.1f}% in real time)"
+        f"\n\n{summary_file}"
+    )
+
+
+if __name__ == "__main__":
+    main()
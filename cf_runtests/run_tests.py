@@ -11,50 +11,151 @@ from cf_runtests.input.credentials import *
 from cf_common.cf_functions import *
 from cf_common.CfClient import *
 from cf_common.CfRunTest import *
+from cf_common.CfProfile import NullProfiler, PhaseProfiler
 
 if (pathlib.Path.cwd() / "dev_settings.py").is_file():
     from cf_runtests.dev_settings import *
 
-input_dir, output_dir, report_dir = verify_directory_structure(
-    in_project_dir, input_location, output_location, report_location
-)
-
-cf = CfClient(cf_controller_address, username, password, verify_ssl)
-cf.connect()
-
-tests_to_run = input_dir / run_tests_from_csv
-with open(tests_to_run, "r") as f:
-    reader = csv.DictReader(f)
-    test_list = list(reader)
-# sort tests by run_order column
-test_list = sorted(test_list, key=lambda k: k["run_order"])
-log.debug(f"test list:\n{test_list}")
-
-detailed_report = DetailedCsvReport(report_dir)
-detailed_report.append_columns()
-html_report_file = detailed_report.report_csv_file.with_suffix(".html")
-print(f"Report location: {html_report_file}")
-
-for test in test_list:
-    if test["run"].lower() in {"y", "yes", "true"}:
-        print(f"\ntest details:\n{json.dumps(test, indent=4)}")
-        rt = CfRunTest(cf, test, detailed_report, output_dir)
-        if rt is not False:
-            rt.control_test()
-        # create reports
-        table = Report(detailed_report.report_csv_file, col_order)
-        file_name = detailed_report.report_csv_file.stem
-        file_path = detailed_report.report_csv_file.parent
-        if file_name.endswith("_Detailed"):
-            file_name = file_name[: -len("_Detailed")]
-        # create summary csv report with all columns
-        csv_name = file_name + "_all"
-        csv_report_file = pathlib.Path(file_path / csv_name).with_suffix(".csv")
-        print(csv_report_file)
-        csv_report(table, csv_report_file)
-        # create html report files
-        for k, v in html_additional_reports.items():
-            new_name = file_name + "_" + k
-            report_file = pathlib.Path(file_path / new_name).with_suffix(".html")
-            print(report_file)
-            html_report(table, report_tables, report_file, v, script_version)
+
+def run_test_list(
+    cf, test_list, detailed_report, output_dir, clock=None, profiler=None, metrics=None
+):
+    """Runs the tests of test_list marked to run, reports are updated after each test
+
+    :param cf: CfClient or a stand in, e.g. AgentClient
+    :param test_list: run_tests.csv rows in run order
+    :param detailed_report: DetailedCsvReport instance
+    :param clock: CfRunTest clock, None for the wall clock
+    :param profiler: PhaseProfiler, None to not profile the tests
+    :param metrics: MetricsExporter, None to not export live metrics
+    :return: None
+    """
+    if profiler is None:
+        profiler = NullProfiler()
+    for test in test_list:
+        if test["run"].lower() in {"y", "yes", "true"}:
+            print(f"\ntest details:\n{json.dumps(test, indent=4)}")
+            rt = CfRunTest(
+                cf,
+                test,
+                detailed_report,
+                output_dir,
+                debug_config_files,
+                clock,
+                profiler,
+                metrics,
+            )
+            if rt is not False:
+                rt.control_test()
+            detailed_report.end_test()
+            if metrics is not None:
+                metrics.end_test()
+            # create reports
+            with profiler.phase("report_load"):
+                table = load_report(
+                    detailed_report.report_csv_file,
+                    col_order,
+                    report_memory_budget,
+                    report_steady_states,
+                )
+            file_name = detailed_report.report_csv_file.stem
+            file_path = detailed_report.report_csv_file.parent
+            if file_name.endswith("_Detailed"):
+                file_name = file_name[: -len("_Detailed")]
+            # create summary csv report with all columns
+            csv_name = file_name + "_all"
+            csv_report_file = pathlib.Path(file_path / csv_name).with_suffix(".csv")
+            print(csv_report_file)
+            with profiler.phase("report_csv"):
+                csv_report(table, csv_report_file)
+            # create html report files
+            report_files = {}
+            for k, v in html_additional_reports.items():
+                new_name = file_name + "_" + k
+                report_file = pathlib.Path(file_path / new_name).with_suffix(".html")
+                print(report_file)
+                report_files[report_file] = v
+            with profiler.phase("report_html"):
+                html_reports(table, report_tables, report_files, script_version)
+            profiler.end_test(test["name"])
+
+
+def main():
+    input_dir, output_dir, report_dir = verify_directory_structure(
+        in_project_dir, input_location, output_location, report_location
+    )
+    setup_logging(
+        log_file, log_level, log_per_run, log_max_bytes, log_backup_count, output_dir
+    )
+
+    cf = connect_client(
+        cf_controller_address,
+        username,
+        password,
+        verify_ssl,
+        None if cf_agent_socket is None else output_dir / cf_agent_socket,
+    )
+
+    tests_to_run = input_dir / run_tests_from_csv
+    with open(tests_to_run, "r") as f:
+        reader = csv.DictReader(f)
+        test_list = list(reader)
+    # sort tests by run_order column
+    test_list = sorted(test_list, key=lambda k: k["run_order"])
+    log.debug(f"test list:\n{test_list}")
+
+    results_store = None
+    if results_store_db is not None:
+        from cf_common.CfResultsStore import ResultsStore
+
+        results_store = ResultsStore(report_dir / results_store_db)
+
+    detailed_report = DetailedCsvReport(
+        report_dir,
+        detailed_report_flush,
+        detailed_report_flush_interval,
+        detailed_report_sidecar,
+        results_store,
+        detailed_report_raw_archive,
+    )
+    detailed_report.append_columns()
+    if results_store is not None:
+        cf_ver = cf.get_system_version()
+        results_store.start_run(
+            detailed_report.time_stamp,
+            detailed_report.report_csv_file,
+            script_version,
+            cf_ver.get("version"),
+            results_store_label,
+        )
+    update_report_index(report_dir, detailed_report.report_csv_file)
+    html_report_file = detailed_report.report_csv_file.with_suffix(".html")
+    print(f"Report location: {html_report_file}")
+
+    profiler = None
+    if profile_phases:
+        profiler = PhaseProfiler(
+            report_dir / f"{detailed_report.time_stamp}_Profile",
+            profile_top,
+            profile_allocations,
+        )
+        print(f"Profiles location: {profiler.profile_dir}")
+    metrics = None
+    if metrics_port is not None:
+        from cf_common.CfMetrics import MetricsExporter
+
+        metrics = MetricsExporter(metrics_port, metrics_host)
+        print(f"Metrics location: http://{metrics.address}/metrics")
+    run_test_list(
+        cf, test_list, detailed_report, output_dir, profiler=profiler, metrics=metrics
+    )
+
+    detailed_report.close()
+    if profiler is not None:
+        profiler.close()
+    if metrics is not None:
+        metrics.close()
+
+
+if __name__ == "__main__":
+    main()
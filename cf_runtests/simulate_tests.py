@@ -0,0 +1,61 @@
+import csv
+import pathlib
+import sys
+
+project_dir = pathlib.Path().absolute().parent
+sys.path.append(str(project_dir))
+
+from cf_runtests.input.cf_config import *
+from cf_common.cf_functions import *
+from cf_common.CfRunTest import DetailedCsvReport
+from cf_common.CfSimulator import DutModel, simulate_test
+
+if (pathlib.Path.cwd() / "dev_settings.py").is_file():
+    from cf_runtests.dev_settings import *
+
+
+def main():
+    input_dir, output_dir, report_dir = verify_directory_structure(
+        in_project_dir, input_location, output_location, report_location
+    )
+    setup_logging(
+        log_file, log_level, log_per_run, log_max_bytes, log_backup_count, output_dir
+    )
+
+    with open(input_dir / run_tests_from_csv, "r") as f:
+        reader = csv.DictReader(f)
+        test_list = list(reader)
+    test_list = sorted(test_list, key=lambda k: k["run_order"])
+
+    # simulated results are kept out of the report directory
+    detailed_report = DetailedCsvReport(output_dir)
+    detailed_report.append_columns()
+    print(f"Simulated DUT: {simulate_dut}")
+    for test in test_list:
+        if test["run"].lower() in {"y", "yes", "true"}:
+            rt = simulate_test(test, detailed_report, DutModel(**simulate_dut))
+            print(
+                f"{test['name']}: load {rt.c_current_load}, tps {rt.rolling_tps.avg_val}, "
+                f"cps {rt.rolling_cps.avg_val}, stopped in phase {rt.phase} "
+                f"after {rt.time_elapsed}s"
+            )
+            detailed_report.end_test()
+    detailed_report.close()
+    print(f"\n{detailed_report.report_csv_file}")
+
+    from cf_common.CfReport import Report
+
+    table = Report(
+        detailed_report.report_csv_file,
+        col_order,
+        report_memory_budget,
+        steady_states=report_steady_states,
+    )
+    file_name = detailed_report.report_csv_file.stem[: -len("_Detailed")]
+    csv_report_file = output_dir / f"{file_name}_Simulated_all.csv"
+    csv_report(table, csv_report_file)
+    print(csv_report_file)
+
+
+if __name__ == "__main__":
+    main()
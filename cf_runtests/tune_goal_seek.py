@@ -0,0 +1,67 @@
+import pathlib
+import sys
+
+project_dir = pathlib.Path().absolute().parent
+sys.path.append(str(project_dir))
+
+from cf_runtests.input.cf_config import *
+from cf_common.cf_functions import *
+from cf_common.CfRawArchive import RawArchiveReader
+from cf_common.CfTuner import GoalSeekTuner, profile_from_archive
+
+if (pathlib.Path.cwd() / "dev_settings.py").is_file():
+    from cf_runtests.dev_settings import *
+
+
+def main():
+    input_dir, output_dir, report_dir = verify_directory_structure(
+        in_project_dir, input_location, output_location, report_location
+    )
+    setup_logging(
+        log_file, log_level, log_per_run, log_max_bytes, log_backup_count, output_dir
+    )
+
+    profiles = list(tune_profiles)
+    for archive in tune_raw_archives:
+        reader = RawArchiveReader(report_dir / archive)
+        for run in reader.runs():
+            profile = profile_from_archive(reader, run["run_id"])
+            if profile is None:
+                print(f"No traffic in {run['name']} of {archive}, not used")
+                log.error(f"No traffic in {run['name']} {run['run_id']} of {archive}")
+                continue
+            print(f"Profile of {run['name']}: {profile}")
+            profiles.append(profile)
+    if not profiles:
+        print("No DUT profiles, set tune_profiles or tune_raw_archives")
+        sys.exit(1)
+
+    tuner = GoalSeekTuner(
+        tune_space,
+        profiles,
+        tune_capacity_margin,
+        tune_max_trials,
+        tune_workers,
+        tune_seed,
+    )
+    print(
+        f"Tuning {reference_to_run_csv_file} on {len(profiles)} DUT profiles "
+        f"with {tuner.workers} processes"
+    )
+    tuned_csv_file = output_dir / tune_output_csv
+    best_results = tuner.tune_reference(input_dir / reference_to_run_csv_file, tuned_csv_file)
+    for (test_type, load_type), best in best_results.items():
+        if best["skipped"] is not None:
+            print(f"\n{test_type} {load_type}: not tuned, {best['skipped']}")
+            continue
+        qualified = "" if best["qualified"] else " (not within capacity margin, not written)"
+        print(
+            f"\n{test_type} {load_type}: {round(best['seconds'])}s mean test time, "
+            f"{round(best['reached'] * 100, 1)}% of capacity{qualified}"
+            f"\n  {best['settings']}"
+        )
+    print(f"\n{tuned_csv_file}")
+
+
+if __name__ == "__main__":
+    main()